@@ -0,0 +1,385 @@
+"""
+animexport.py
+Created: Sunday, 18th October 2026 10:31:40 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 10:31:44 pm
+Modified By: Matthew Riche
+"""
+
+# Compact animation files of the baked export skeleton, written without the FBX exporter so tools
+# and engines can read them without Maya.  Two layouts:
+#
+#   clip.glb      glTF 2.0 binary: one node per joint and one animation, every channel a tightly
+#                 packed float32 accessor.
+#   clip/         a folder of .npy files (times, translation, rotation, scale, all float32) and a
+#                 skeleton.json, each array opens with np.load(..., mmap_mode="r").
+#
+#   animexport.export_animation("D:/export/walk.glb", new_influences)
+#
+# Both files are sized up front and filled through a memory map one block of frames at a time, so
+# the whole animation is never held in memory.  Joints are written as their local translation,
+# rotation (a quaternion, x y z w) and scale; jointOrient and rotateAxis are folded into the
+# rotation since neither format has them.  Shear and negative scale aren't represented.
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from . import bake
+from . import profiling
+from . import tasks
+
+
+GLB = ".glb"
+
+# Frames sampled and written per block.
+BLOCK_FRAMES = 256
+
+# Maya time units to frames per second.
+TIME_UNITS = {
+    "game": 15.0,
+    "film": 24.0,
+    "pal": 25.0,
+    "ntsc": 30.0,
+    "show": 48.0,
+    "palf": 50.0,
+    "ntscf": 60.0,
+}
+
+_GLB_MAGIC = 0x46546C67
+_JSON_CHUNK = 0x4E4F534A
+_BIN_CHUNK = 0x004E4942
+_FLOAT = 5126
+
+
+def scene_fps() -> float:
+    """Frames per second of the scene's time unit."""
+    import maya.cmds as cmds
+
+    unit = cmds.currentUnit(query=True, time=True)
+    if unit in TIME_UNITS:
+        return TIME_UNITS[unit]
+    return float(unit.replace("fps", ""))
+
+
+def quaternions(rotation: np.ndarray) -> np.ndarray:
+    """Unit quaternions of row vector rotation matrices.
+
+    Args:
+        rotation (np.ndarray): (..., 3, 3) rotations, Maya's row vector convention.
+
+    Returns:
+        np.ndarray: (..., 4) quaternions as x, y, z, w.
+    """
+    # The transpose is the usual column vector matrix.
+    m = np.swapaxes(rotation, -1, -2)
+    trace = m[..., 0, 0] + m[..., 1, 1] + m[..., 2, 2]
+    # Each row is the quaternion scaled by one of its components, solved from the terms where
+    # that component dominates.  The row of the largest component is the best conditioned.
+    x_row = [1 + 2 * m[..., 0, 0] - trace, m[..., 0, 1] + m[..., 1, 0]]
+    x_row += [m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] - m[..., 1, 2]]
+    y_row = [m[..., 0, 1] + m[..., 1, 0], 1 + 2 * m[..., 1, 1] - trace]
+    y_row += [m[..., 1, 2] + m[..., 2, 1], m[..., 0, 2] - m[..., 2, 0]]
+    z_row = [m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1]]
+    z_row += [1 + 2 * m[..., 2, 2] - trace, m[..., 1, 0] - m[..., 0, 1]]
+    w_row = [m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0]]
+    w_row += [m[..., 1, 0] - m[..., 0, 1], 1 + trace]
+    rows = np.stack([np.stack(row, axis=-1) for row in (x_row, y_row, z_row, w_row)], axis=-2)
+
+    best = np.argmax(np.stack([m[..., 0, 0], m[..., 1, 1], m[..., 2, 2], trace], axis=-1), -1)
+    quats = np.take_along_axis(rows, best[..., None, None], axis=-2)[..., 0, :]
+    return quats / np.linalg.norm(quats, axis=-1, keepdims=True)
+
+
+def local_transforms(world: np.ndarray, parents: list) -> tuple:
+    """Local translation, rotation and scale of joints from their world matrices.
+
+    Args:
+        world (np.ndarray): (frames, joints, 4, 4) world matrices.
+        parents (list): Per joint the index of its parent in world, or -1 for roots, which are
+        written relative to the world.
+
+    Returns:
+        tuple: (translation (frames, joints, 3), quaternion (frames, joints, 4), scale (frames,
+        joints, 3)).
+    """
+    parents = np.asarray(parents, dtype=np.int64)
+    local = world.copy()
+    has_parent = parents >= 0
+    local[:, has_parent] = world[:, has_parent] @ np.linalg.inv(world[:, parents[has_parent]])
+
+    translation = local[..., 3, :3]
+    basis = local[..., :3, :3]
+    scale = np.linalg.norm(basis, axis=-1)
+    rotation = basis / np.where(scale > 1e-12, scale, 1.0)[..., None]
+    return translation, quaternions(rotation), scale
+
+
+def _continuous(quats: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """Flips quaternion signs so consecutive frames stay in the same hemisphere, continuing from
+    the last frame of the previous block."""
+    stacked = np.concatenate([previous[None], quats])
+    dots = np.sum(stacked[1:] * stacked[:-1], axis=-1)
+    signs = np.cumprod(np.where(dots < 0.0, -1.0, 1.0), axis=0)
+    return quats * signs[..., None]
+
+
+class _Layout:
+    def __init__(self, frame_count: int, joint_count: int):
+        """Float offsets of each array in the packed buffer: times, then per channel every
+        joint's frames in a row."""
+        self.frames = frame_count
+        self.joints = joint_count
+        self.widths = {"translation": 3, "rotation": 4, "scale": 3}
+        self.offsets = {"times": 0}
+        offset = frame_count
+        for channel, width in self.widths.items():
+            self.offsets[channel] = offset
+            offset += joint_count * frame_count * width
+        self.floats = offset
+
+    def views(self, buffer: np.ndarray) -> dict:
+        """(joints, frames, width) views of a float32 buffer, times as (frames,)."""
+        views = {"times": buffer[: self.frames]}
+        for channel, width in self.widths.items():
+            start = self.offsets[channel]
+            size = self.joints * self.frames * width
+            views[channel] = buffer[start : start + size].reshape(self.joints, self.frames, width)
+        return views
+
+
+def _gltf_json(names: list, parents: list, rest: tuple, times: np.ndarray, layout, take: str):
+    translation, rotation, scale = rest
+    nodes = []
+    for j, name in enumerate(names):
+        node = {
+            "name": name,
+            "translation": translation[j].tolist(),
+            "rotation": rotation[j].tolist(),
+            "scale": scale[j].tolist(),
+        }
+        children = [c for c, parent in enumerate(parents) if parent == j]
+        if children:
+            node["children"] = children
+        nodes.append(node)
+
+    frame_count = layout.frames
+    buffer_views = [
+        {"buffer": 0, "byteOffset": 0, "byteLength": frame_count * 4},
+    ]
+    accessors = [
+        {
+            "bufferView": 0,
+            "componentType": _FLOAT,
+            "count": frame_count,
+            "type": "SCALAR",
+            "min": [float(np.float32(times[0]))],
+            "max": [float(np.float32(times[-1]))],
+        }
+    ]
+    samplers = []
+    channels = []
+    kinds = {3: "VEC3", 4: "VEC4"}
+    for channel, width in layout.widths.items():
+        view = len(buffer_views)
+        buffer_views.append(
+            {
+                "buffer": 0,
+                "byteOffset": layout.offsets[channel] * 4,
+                "byteLength": layout.joints * frame_count * width * 4,
+            }
+        )
+        for j in range(layout.joints):
+            accessors.append(
+                {
+                    "bufferView": view,
+                    "byteOffset": j * frame_count * width * 4,
+                    "componentType": _FLOAT,
+                    "count": frame_count,
+                    "type": kinds[width],
+                }
+            )
+            channels.append({"sampler": len(samplers), "target": {"node": j, "path": channel}})
+            samplers.append({"input": 0, "output": len(accessors) - 1, "interpolation": "LINEAR"})
+
+    return {
+        "asset": {"version": "2.0", "generator": "febex"},
+        "scene": 0,
+        "scenes": [{"nodes": [j for j, parent in enumerate(parents) if parent < 0]}],
+        "nodes": nodes,
+        "buffers": [{"byteLength": layout.floats * 4}],
+        "bufferViews": buffer_views,
+        "accessors": accessors,
+        "animations": [{"name": take, "samplers": samplers, "channels": channels}],
+    }
+
+
+def _open_glb(path: str, document: dict, layout) -> np.ndarray:
+    """Writes the header and JSON of a .glb and maps its (zero filled) binary chunk."""
+    text = json.dumps(document, separators=(",", ":")).encode()
+    text += b" " * (-len(text) % 4)
+    binary_length = layout.floats * 4
+    total = 12 + 8 + len(text) + 8 + binary_length
+    with open(path, "wb") as glb_file:
+        glb_file.write(struct.pack("<III", _GLB_MAGIC, 2, total))
+        glb_file.write(struct.pack("<II", len(text), _JSON_CHUNK))
+        glb_file.write(text)
+        glb_file.write(struct.pack("<II", binary_length, _BIN_CHUNK))
+        glb_file.truncate(total)
+    offset = total - binary_length
+    return np.memmap(path, dtype="<f4", mode="r+", offset=offset, shape=(layout.floats,))
+
+
+def _open_npy(path: str, names: list, parents: list, rest: tuple, layout, take: str) -> dict:
+    """Writes skeleton.json into a folder and maps one .npy per array, frames first."""
+    os.makedirs(path, exist_ok=True)
+    translation, rotation, scale = rest
+    skeleton = {
+        "take": take,
+        "joints": names,
+        "parents": list(parents),
+        "rest": {
+            "translation": translation.tolist(),
+            "rotation": rotation.tolist(),
+            "scale": scale.tolist(),
+        },
+    }
+    with open(os.path.join(path, "skeleton.json"), "w") as skeleton_file:
+        json.dump(skeleton, skeleton_file, indent=4)
+
+    arrays = {
+        "times": np.lib.format.open_memmap(
+            os.path.join(path, "times.npy"), mode="w+", dtype="<f4", shape=(layout.frames,)
+        )
+    }
+    for channel, width in layout.widths.items():
+        arrays[channel] = np.lib.format.open_memmap(
+            os.path.join(path, f"{channel}.npy"),
+            mode="w+",
+            dtype="<f4",
+            shape=(layout.frames, layout.joints, width),
+        )
+    return arrays
+
+
+def export_animation(
+    path: str,
+    joints: list,
+    frames: list = None,
+    sampler=bake.maya_world_matrices,
+    fps: float = None,
+    take: str = "take",
+) -> dict:
+    """Writes the animation of a joint hierarchy to a compact file.
+
+    Args:
+        path (str): A ".glb" file, any other path is written as a folder of .npy files.
+        joints (list): Joints to write, usually the export skeleton's influences.  Joints whose
+        parent isn't in the list are written relative to the world.
+        frames (list, optional): Frames to write.  Defaults to the playback range.
+        sampler (fn, optional): Called as sampler(joints, frames), returns (frames, joints, 4, 4)
+        world matrices.  Defaults to bake.maya_world_matrices().
+        fps (float, optional): Frames per second for the key times.  Defaults to the scene's.
+        take (str, optional): Animation name stored in the file.  Defaults to "take".
+
+    Returns:
+        dict: "path", "frames", "joints" and "bytes" written.
+    """
+    return tasks.drain(iter_export_animation(path, joints, frames, sampler, fps, take))
+
+
+def iter_export_animation(
+    path: str,
+    joints: list,
+    frames: list = None,
+    sampler=bake.maya_world_matrices,
+    fps: float = None,
+    take: str = "take",
+    block: int = BLOCK_FRAMES,
+):
+    """export_animation() as steps of a block of frames each, see tasks.py.
+
+    Args:
+        block (int, optional): Frames sampled and written per step.  Defaults to BLOCK_FRAMES.
+    """
+    import maya.cmds as cmds
+
+    if frames is None:
+        start_time = cmds.playbackOptions(query=True, minTime=True)
+        end_time = cmds.playbackOptions(query=True, maxTime=True)
+        frames = list(np.arange(start_time, end_time + 1.0))
+    if not frames:
+        raise ValueError("No frames to export.")
+    if fps is None:
+        fps = scene_fps()
+
+    long_names = {path_name.split("|")[-1]: path_name for path_name in cmds.ls(joints, long=True)}
+    index = {joint: j for j, joint in enumerate(joints)}
+    parents = []
+    for joint in joints:
+        parts = long_names[joint].split("|")
+        parents.append(index.get(parts[-2], -1) if len(parts) > 2 else -1)
+
+    times = (np.asarray(frames, dtype=np.float64) - frames[0]) / fps
+    layout = _Layout(len(frames), len(joints))
+    rest = tuple(values[0] for values in local_transforms(sampler(joints, frames[:1]), parents))
+
+    with profiling.span("write animation"):
+        if path.lower().endswith(GLB):
+            document = _gltf_json(joints, parents, rest, times, layout, take)
+            buffer = _open_glb(path, document, layout)
+            views = layout.views(buffer)
+            frames_first = False
+        else:
+            views = _open_npy(path, joints, parents, rest, layout, take)
+            buffer = None
+            frames_first = True
+
+        views["times"][:] = times
+        previous = rest[1]
+        for first in range(0, len(frames), block):
+            last = min(first + block, len(frames))
+            translation, rotation, scale = local_transforms(
+                sampler(joints, frames[first:last]), parents
+            )
+            rotation = _continuous(rotation, previous)
+            previous = rotation[-1]
+            for channel, values in zip(layout.widths, (translation, rotation, scale)):
+                if frames_first:
+                    views[channel][first:last] = values
+                else:
+                    views[channel][:, first:last] = np.swapaxes(values, 0, 1)
+            yield ("Writing frames", last, len(frames))
+
+        for view in views.values():
+            if isinstance(view, np.memmap):
+                view.flush()
+        if buffer is not None:
+            buffer.flush()
+        del views, buffer
+
+    if path.lower().endswith(GLB):
+        size = os.path.getsize(path)
+    else:
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"Wrote {len(frames)} frames of {len(joints)} joints to {path} ({size} bytes).")
+    return {"path": path, "frames": len(frames), "joints": len(joints), "bytes": size}
+
+
+def load_npy(path: str) -> dict:
+    """Opens a folder written by export_animation() without reading it, the arrays are memory
+    mapped.
+
+    Args:
+        path (str): The folder.
+
+    Returns:
+        dict: skeleton.json's contents plus "times", "translation", "rotation" and "scale".
+    """
+    with open(os.path.join(path, "skeleton.json"), "r") as skeleton_file:
+        result = json.load(skeleton_file)
+    for name in ("times", "translation", "rotation", "scale"):
+        result[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    return result
@@ -0,0 +1,905 @@
+"""
+bake.py
+Created: Sunday, 18th October 2026 1:04:51 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 1:04:55 pm
+Modified By: Matthew Riche
+"""
+
+# Constraint free baking.  Instead of constraining the export skeleton and running
+# bakeResults(simulation=True), the world matrices of the source influences are pulled per frame
+# through a DG context into a (frames, joints, 4, 4) array.  Local translate/rotate/scale for the
+# export joints come out of that in one go, and every channel gets written as one animCurve with
+# all of its keys at once.
+#
+# Several takes (named frame ranges on one timeline) bake in one pass: the union of their frames
+# is sampled once and each take gets its own unconnected set of curves, see bake_takes().
+#
+# Matrices follow Maya's row vector convention throughout: world = local * parent_world.
+# Like weights.py, Maya is only imported by the functions that talk to the scene.
+
+import numpy as np
+
+from . import profiling
+from . import tasks
+from .profiling import Progress
+from .weights import export_joints
+
+
+ROTATE_ORDERS = ("xyz", "yzx", "zxy", "xzy", "yxz", "zyx")
+CHANNELS = ("translate", "rotate", "scale")
+CURVE_TYPES = {"translate": "animCurveTL", "rotate": "animCurveTA", "scale": "animCurveTU"}
+
+
+def _axis_rotations(angles: np.ndarray, axis: int) -> np.ndarray:
+    """Row vector rotation matrices about one axis, angles in radians."""
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    mats = np.zeros(angles.shape + (3, 3))
+    a, b = [(1, 2), (2, 0), (0, 1)][axis]
+    mats[..., axis, axis] = 1.0
+    mats[..., a, a] = cos
+    mats[..., a, b] = sin
+    mats[..., b, a] = -sin
+    mats[..., b, b] = cos
+    return mats
+
+
+def euler_to_matrix(angles: np.ndarray, order: str = "xyz") -> np.ndarray:
+    """Rotation matrices from euler angles, the way Maya composes a rotate channel.
+
+    Args:
+        angles (np.ndarray): (..., 3) x, y, z rotations in degrees.
+        order (str, optional): Maya rotate order, first letter applied first.  Defaults to "xyz".
+
+    Returns:
+        np.ndarray: (..., 3, 3) row vector rotation matrices.
+    """
+    radians = np.radians(np.asarray(angles, dtype=np.float64))
+    axes = ["xyz".index(letter) for letter in order]
+    mats = _axis_rotations(radians[..., axes[0]], axes[0])
+    for axis in axes[1:]:
+        mats = mats @ _axis_rotations(radians[..., axis], axis)
+    return mats
+
+
+def matrix_to_euler(mats: np.ndarray, order: str = "xyz") -> np.ndarray:
+    """Euler angles of rotation matrices, the inverse of euler_to_matrix().
+
+    Args:
+        mats (np.ndarray): (..., 3, 3) row vector rotation matrices, no scale.
+        order (str, optional): Maya rotate order.  Defaults to "xyz".
+
+    Returns:
+        np.ndarray: (..., 3) x, y, z rotations in degrees.
+    """
+    # Transposed, a Maya "xyz" matrix is the column vector Rz.Ry.Rx, a static frame "sxyz"
+    # rotation, which has the usual closed form.
+    col = np.swapaxes(mats, -1, -2)
+    i, j = ["xyz".index(letter) for letter in order[:2]]
+    k = 3 - i - j
+    parity = 0 if j == (i + 1) % 3 else 1
+
+    cy = np.hypot(col[..., i, i], col[..., j, i])
+    gimbal = cy < 1e-9
+    first = np.where(
+        gimbal,
+        np.arctan2(-col[..., j, k], col[..., j, j]),
+        np.arctan2(col[..., k, j], col[..., k, k]),
+    )
+    second = np.arctan2(-col[..., k, i], cy)
+    third = np.where(gimbal, 0.0, np.arctan2(col[..., j, i], col[..., i, i]))
+    if parity:
+        first, second, third = -first, -second, -third
+
+    euler = np.empty(mats.shape[:-2] + (3,))
+    euler[..., i] = first
+    euler[..., j] = second
+    euler[..., k] = third
+    return np.degrees(euler)
+
+
+def local_trs(
+    world: np.ndarray,
+    parents: list,
+    static_parents: np.ndarray = None,
+    joint_orients: np.ndarray = None,
+    rotate_axes: np.ndarray = None,
+    rotate_orders: list = None,
+    minimize_rotation: bool = True,
+) -> tuple:
+    """Turns sampled world matrices into translate/rotate/scale channels of a joint hierarchy,
+    all joints and frames at once.
+
+    Args:
+        world (np.ndarray): (frames, joints, 4, 4) world matrices.
+        parents (list): Per joint, the index of its parent joint in world, or -1 when the parent
+        isn't baked.
+        static_parents (np.ndarray, optional): (joints, 4, 4) world matrices of the parents for
+        joints with a -1 parent.  Defaults to identity.
+        joint_orients (np.ndarray, optional): (joints, 3) jointOrient in degrees.  Defaults to 0.
+        rotate_axes (np.ndarray, optional): (joints, 3) rotateAxis in degrees.  Defaults to 0.
+        rotate_orders (list, optional): Rotate order per joint.  Defaults to "xyz".
+        minimize_rotation (bool, optional): Unwrap rotations over time so no channel jumps by more
+        than 180 degrees between frames.  Defaults to True.
+
+    Returns:
+        tuple: (translate, rotate, scale), each (frames, joints, 3).  Rotate in degrees.
+    """
+    frame_count, joint_count = world.shape[:2]
+    parents = np.asarray(parents, dtype=np.int64)
+
+    parent_world = np.empty_like(world)
+    has_parent = parents >= 0
+    parent_world[:, has_parent] = world[:, parents[has_parent]]
+    if static_parents is None:
+        static_parents = np.broadcast_to(np.eye(4), (joint_count, 4, 4))
+    parent_world[:, ~has_parent] = static_parents[~has_parent]
+
+    local = world @ np.linalg.inv(parent_world)
+
+    translate = local[..., 3, :3].copy()
+    basis = local[..., :3, :3]
+    scale = np.linalg.norm(basis, axis=-1)
+    rotation = basis / np.where(scale > 1e-12, scale, 1.0)[..., None]
+
+    # A joint's rotation is [rotateAxis][rotate][jointOrient], peel the outer two off.
+    if joint_orients is not None:
+        rotation = rotation @ np.swapaxes(euler_to_matrix(joint_orients), -1, -2)
+    if rotate_axes is not None:
+        rotation = np.swapaxes(euler_to_matrix(rotate_axes), -1, -2) @ rotation
+
+    if rotate_orders is None:
+        rotate_orders = ["xyz"] * joint_count
+    rotate = np.empty((frame_count, joint_count, 3))
+    for order in set(rotate_orders):
+        columns = [i for i, joint_order in enumerate(rotate_orders) if joint_order == order]
+        rotate[:, columns] = matrix_to_euler(rotation[:, columns], order)
+
+    if minimize_rotation:
+        rotate = np.degrees(np.unwrap(np.radians(rotate), axis=0))
+
+    return translate, rotate, scale
+
+
+def maya_world_matrices(joints: list, frames: list) -> np.ndarray:
+    """Samples worldMatrix of nodes over frames by evaluating their plugs in a DG context per
+    frame, without moving the current time or touching anything else in the scene.
+
+    Args:
+        joints (list): Node names.
+        frames (list): Frames, in the scene's time unit.
+
+    Returns:
+        np.ndarray: (frames, joints, 4, 4) world matrices.
+    """
+    import maya.api.OpenMaya as om
+
+    sel = om.MSelectionList()
+    for joint in joints:
+        sel.add(joint)
+    plugs = []
+    for i in range(len(joints)):
+        node_fn = om.MFnDependencyNode(sel.getDependNode(i))
+        plugs.append(node_fn.findPlug("worldMatrix", False).elementByLogicalIndex(0))
+
+    samples = np.empty((len(frames), len(joints), 16))
+    unit = om.MTime.uiUnit()
+    progress = Progress("Sampling frames", len(frames))
+    for f, frame in enumerate(frames):
+        context = om.MDGContext(om.MTime(frame, unit))
+        previous = context.makeCurrent()
+        try:
+            for j, plug in enumerate(plugs):
+                samples[f, j] = list(om.MFnMatrixData(plug.asMObject()).matrix())
+        finally:
+            previous.makeCurrent()
+        progress.step()
+    progress.finish()
+
+    return samples.reshape(len(frames), len(joints), 4, 4)
+
+
+def maya_read_attributes(nodes: list, attributes: list) -> tuple:
+    """Current values of the same attributes on many nodes through the API, with no command per
+    node, and whether anything drives them.
+
+    Args:
+        nodes (list): Node names.
+        attributes (list): Attribute names, numeric or numeric compounds like scale.  Angles are
+        read in degrees.
+
+    Returns:
+        tuple: (attribute to (nodes,) or (nodes, children) array of values, attribute to (nodes,)
+        mask of the plugs with an incoming connection, on themselves or on a child).
+    """
+    import maya.api.OpenMaya as om
+
+    def plug_value(plug):
+        attribute = plug.attribute()
+        if attribute.hasFn(om.MFn.kUnitAttribute):
+            if om.MFnUnitAttribute(attribute).unitType() == om.MFnUnitAttribute.kAngle:
+                return plug.asMAngle().asUnits(om.MAngle.kDegrees)
+        return plug.asDouble()
+
+    sel = om.MSelectionList()
+    for node in nodes:
+        sel.add(node)
+    values = {attribute: [] for attribute in attributes}
+    driven = {attribute: np.zeros(len(nodes), dtype=bool) for attribute in attributes}
+    for i in range(len(nodes)):
+        node_fn = om.MFnDependencyNode(sel.getDependNode(i))
+        for attribute in attributes:
+            plug = node_fn.findPlug(attribute, False)
+            children = [plug.child(c) for c in range(plug.numChildren())] if plug.isCompound else []
+            if children:
+                values[attribute].append([plug_value(child) for child in children])
+            else:
+                values[attribute].append(plug_value(plug))
+            driven[attribute][i] = any(each.isDestination for each in [plug] + children)
+    return {attribute: np.array(values[attribute]) for attribute in attributes}, driven
+
+
+def default_attribute_reader():
+    """maya_read_attributes(), or that of a stand-in registered as maya.cmds."""
+    import maya.cmds as cmds
+
+    if cmds.__name__ == "maya.cmds":
+        return maya_read_attributes
+    return cmds.read_attributes
+
+
+def maya_write_curves(joints: list, frames: list, channels: dict):
+    """Writes baked channels as animCurves, one addKeys call per curve.  Existing keys on those
+    attributes are cleared first, take curves are disconnected and left as they are (see
+    maya_detach_takes()).
+
+    Args:
+        joints (list): Node names, in the order of the channel arrays.
+        frames (list): Frames, in the scene's time unit.
+        channels (dict): "translate"/"rotate"/"scale" to (frames, joints, 3) arrays, rotate in
+        degrees.
+    """
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+    import maya.cmds as cmds
+
+    attributes = [f"{channel}{axis}" for channel in channels for axis in "XYZ"]
+    maya_detach_takes(joints, attributes)
+    cmds.cutKey(joints, clear=True, attribute=attributes)
+
+    unit = om.MTime.uiUnit()
+    times = om.MTimeArray([om.MTime(frame, unit) for frame in frames])
+    curve_types = {
+        "translate": oma.MFnAnimCurve.kAnimCurveTL,
+        "rotate": oma.MFnAnimCurve.kAnimCurveTA,
+        "scale": oma.MFnAnimCurve.kAnimCurveTU,
+    }
+
+    sel = om.MSelectionList()
+    for joint in joints:
+        sel.add(joint)
+    created = []
+    for j in range(len(joints)):
+        node_fn = om.MFnDependencyNode(sel.getDependNode(j))
+        for channel, values in channels.items():
+            # Angles go into the API in radians.
+            if channel == "rotate":
+                values = np.radians(values)
+            for axis_index, axis in enumerate("XYZ"):
+                plug = node_fn.findPlug(f"{channel}{axis}", False)
+                curve_fn = oma.MFnAnimCurve()
+                curve_fn.create(plug, curve_types[channel])
+                curve_fn.addKeys(times, om.MDoubleArray(values[:, j, axis_index].tolist()))
+                created.append(curve_fn.name())
+    # Made through the API, so out of the undo queue.
+    tasks.created(created)
+
+
+def take_curve_name(joint: str, attribute: str, take: str) -> str:
+    """Name of the curve holding one attribute of one joint in a take."""
+    return f"{joint}_{attribute}_{take}"
+
+
+def is_take_curve(curve: str, joint: str, attribute: str) -> bool:
+    """Whether a curve is named as one of a joint's take curves for an attribute, see
+    take_curve_name().  Take names are identifiers, Maya's own curve names never match."""
+    prefix = take_curve_name(joint.split("|")[-1], attribute, "")
+    return curve.startswith(prefix) and curve[len(prefix) :].isidentifier()
+
+
+def maya_detach_takes(joints: list, attributes: list = None):
+    """Disconnects the take curves driving joints, so whatever bakes onto the joints next keys
+    curves of its own and the takes stay as they were for operations.apply_take().
+
+    Args:
+        joints (list): Node names.
+        attributes (list, optional): Attributes to look at.  Defaults to every channel.
+    """
+    import maya.cmds as cmds
+
+    if attributes is None:
+        attributes = [f"{channel}{axis}" for channel in CHANNELS for axis in "XYZ"]
+    pairs = (
+        cmds.listConnections(
+            joints, source=True, destination=False, type="animCurve", connections=True
+        )
+        or []
+    )
+    for plug, curve in zip(pairs[::2], pairs[1::2]):
+        joint, _, attribute = plug.rpartition(".")
+        if attribute in attributes and is_take_curve(curve, joint, attribute):
+            cmds.disconnectAttr(f"{curve}.output", plug)
+
+
+def check_takes(takes: list):
+    """Raises ValueError unless takes is a list of (name, start, end) with unique names that can be
+    part of a node name, and start <= end.
+    """
+    if not takes:
+        raise ValueError("No takes to bake.")
+    names = [name for name, _, _ in takes]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Take names must be unique, got {names}.")
+    for name, start, end in takes:
+        if not name.isidentifier():
+            raise ValueError(f"'{name}' can't be used in a node name, use letters, digits and _.")
+        if start > end:
+            raise ValueError(f"Take '{name}' starts after it ends ({start} > {end}).")
+
+
+def take_frames(takes: list) -> np.ndarray:
+    """Every frame covered by any of the takes, once each and in order.
+
+    Args:
+        takes (list): (name, start, end) per take, whole frames, end included.
+
+    Returns:
+        np.ndarray: Sorted unique frames.
+    """
+    return np.unique(np.concatenate([np.arange(start, end + 1.0) for _, start, end in takes]))
+
+
+def frame_spans(frames: np.ndarray) -> list:
+    """Runs of consecutive frames.
+
+    Args:
+        frames (np.ndarray): Sorted whole frames.
+
+    Returns:
+        list: (first, last) of each run.
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    breaks = np.flatnonzero(np.diff(frames) > 1.0) + 1
+    return [(float(run[0]), float(run[-1])) for run in np.split(frames, breaks)]
+
+
+def maya_write_take_curves(joints: list, frames: list, channels: dict, take: str):
+    """Writes baked channels of one take as animCurves that aren't connected to anything, named
+    by take_curve_name().  Curves of an earlier bake of the same take are replaced.
+
+    Args:
+        joints (list): Node names, in the order of the channel arrays.
+        frames (list): Frames of the take.
+        channels (dict): "translate"/"rotate"/"scale" to (frames, joints, 3) arrays, rotate in
+        degrees.
+        take (str): Take name.
+    """
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+    import maya.cmds as cmds
+
+    names = [
+        take_curve_name(joint, f"{channel}{axis}", take)
+        for joint in joints
+        for channel in channels
+        for axis in "XYZ"
+    ]
+    old = cmds.ls(names)
+    if old:
+        cmds.delete(old)
+
+    unit = om.MTime.uiUnit()
+    times = om.MTimeArray([om.MTime(frame, unit) for frame in frames])
+    curve_types = {
+        "translate": oma.MFnAnimCurve.kAnimCurveTL,
+        "rotate": oma.MFnAnimCurve.kAnimCurveTA,
+        "scale": oma.MFnAnimCurve.kAnimCurveTU,
+    }
+    for j, joint in enumerate(joints):
+        for channel, values in channels.items():
+            if channel == "rotate":
+                values = np.radians(values)
+            for axis_index, axis in enumerate("XYZ"):
+                curve_fn = oma.MFnAnimCurve()
+                curve = curve_fn.create(curve_types[channel])
+                curve_fn.addKeys(times, om.MDoubleArray(values[:, j, axis_index].tolist()))
+                name = take_curve_name(joint, f"{channel}{axis}", take)
+                om.MFnDependencyNode(curve).setName(name)
+    tasks.created(names)
+
+
+def iter_write_takes(
+    joints: list, frames: np.ndarray, channels: dict, takes: list, writer=maya_write_take_curves
+):
+    """Splits channels baked over the union of the takes' frames into one set of curves per take,
+    a take a step.
+
+    Args:
+        joints (list): Node names, in the order of the channel arrays.
+        frames (np.ndarray): The sorted frames the channels were baked at, take_frames().
+        channels (dict): "translate"/"rotate"/"scale" to (frames, joints, 3) arrays.
+        takes (list): (name, start, end) per take.
+        writer (fn, optional): Called as writer(joints, frames, channels, take).  Defaults to
+        maya_write_take_curves().
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    with profiling.span("bake write takes"):
+        for t, (name, start, end) in enumerate(takes):
+            first, last = np.searchsorted(frames, [start, end + 1.0])
+            writer(
+                joints,
+                list(frames[first:last]),
+                {channel: values[first:last] for channel, values in channels.items()},
+                name,
+            )
+            yield ("Writing takes", t + 1, len(takes))
+
+
+def bake_direct(
+    old_influences: list,
+    frames: list = None,
+    sampler=maya_world_matrices,
+    writer=maya_write_curves,
+    minimize_rotation: bool = True,
+    influence_map: dict = None,
+) -> tuple:
+    """Bakes the "_INF" export skeleton from the source influences without constraints or a
+    scene simulation.  Only the source joints' world matrices are evaluated per frame.
+
+    Segment scale compensation isn't modelled, a scaled parent's scale is inherited the plain way.
+
+    Args:
+        old_influences (list): Influences of the original rig, each with an "_INF" copy.
+        frames (list, optional): Frames to bake.  Defaults to every frame of the playback range.
+        sampler (fn, optional): Called as sampler(joints, frames), returns (frames, joints, 4, 4)
+        world matrices.  Defaults to maya_world_matrices().
+        writer (fn, optional): Called as writer(joints, frames, channels) to key the results.
+        Defaults to maya_write_curves().
+        minimize_rotation (bool, optional): Keep rotations continuous over time.  Defaults to True.
+        influence_map (dict, optional): Source joint to export joint, as a session stores it
+        (see session.py).  Joints not in it go by the "_INF" name.  Defaults to going by name.
+
+    Returns:
+        tuple: (frames, channels) as handed to the writer.
+    """
+    return tasks.drain(
+        iter_bake_direct(
+            old_influences,
+            frames,
+            sampler,
+            writer,
+            minimize_rotation,
+            influence_map=influence_map,
+        )
+    )
+
+
+def iter_bake_direct(
+    old_influences: list,
+    frames: list = None,
+    sampler=maya_world_matrices,
+    writer=maya_write_curves,
+    minimize_rotation: bool = True,
+    block: int = None,
+    influence_map: dict = None,
+):
+    """bake_direct() as steps of a block of frames each, see tasks.py.  The curves are written in
+    one last step, once every frame is sampled.
+
+    Args:
+        block (int, optional): Frames sampled per step.  Defaults to all of them in one.
+    """
+    import maya.cmds as cmds
+
+    if frames is None:
+        start_time = cmds.playbackOptions(query=True, minTime=True)
+        end_time = cmds.playbackOptions(query=True, maxTime=True)
+        frames = list(np.arange(start_time, end_time + 1.0))
+
+    new_influences, channels = yield from _iter_solve_direct(
+        old_influences, frames, sampler, minimize_rotation, block, influence_map
+    )
+    with profiling.span("bake write"):
+        writer(new_influences, frames, channels)
+
+    return frames, channels
+
+
+def bake_takes(
+    old_influences: list,
+    takes: list,
+    sampler=maya_world_matrices,
+    writer=maya_write_take_curves,
+    minimize_rotation: bool = True,
+    influence_map: dict = None,
+) -> np.ndarray:
+    """bake_direct() for several takes at once.  Every frame any take covers is sampled and solved
+    once, overlapping takes share their frames, then each take is written as its own curves.
+    The export skeleton itself isn't keyed.
+
+    Args:
+        old_influences (list): Influences of the original rig, each with an "_INF" copy.
+        takes (list): (name, start, end) per take, see check_takes().
+        sampler (fn, optional): As for bake_direct().  Defaults to maya_world_matrices().
+        writer (fn, optional): Called as writer(joints, frames, channels, take).  Defaults to
+        maya_write_take_curves().
+        minimize_rotation (bool, optional): Keep rotations continuous over time.  Defaults to True.
+        influence_map (dict, optional): Source joint to export joint, as a session stores it
+        (see session.py).  Joints not in it go by the "_INF" name.  Defaults to going by name.
+
+    Returns:
+        np.ndarray: The frames that were sampled.
+    """
+    return tasks.drain(
+        iter_bake_takes(
+            old_influences,
+            takes,
+            sampler,
+            writer,
+            minimize_rotation,
+            influence_map=influence_map,
+        )
+    )
+
+
+def iter_bake_takes(
+    old_influences: list,
+    takes: list,
+    sampler=maya_world_matrices,
+    writer=maya_write_take_curves,
+    minimize_rotation: bool = True,
+    block: int = None,
+    influence_map: dict = None,
+):
+    """bake_takes() as steps, see tasks.py.
+
+    Args:
+        block (int, optional): Frames sampled per step.  Defaults to all of them in one.
+    """
+    check_takes(takes)
+    frames = take_frames(takes)
+    new_influences, channels = yield from _iter_solve_direct(
+        old_influences, list(frames), sampler, minimize_rotation, block, influence_map
+    )
+    yield from iter_write_takes(new_influences, frames, channels, takes, writer)
+    return frames
+
+
+def export_layout(old_influences: list, influence_map: dict = None) -> dict:
+    """What local_trs() needs to know about the export skeleton besides the sampled matrices.
+
+    Args:
+        old_influences (list): Influences of the original rig, each with an "_INF" copy.
+        influence_map (dict, optional): Source joint to export joint, as a session stores it
+        (see session.py).  Joints not in it go by the "_INF" name.  Defaults to going by name.
+
+    Returns:
+        dict: "joints", the export copies, then parents, static_parents, joint_orients,
+        rotate_axes and rotate_orders as local_trs() takes them.
+    """
+    import maya.cmds as cmds
+
+    new_influences = export_joints(old_influences, influence_map)
+    index = {new: i for i, new in enumerate(new_influences)}
+
+    # Parents of the whole export skeleton from one long-name query.
+    long_names = {path.split("|")[-1]: path for path in cmds.ls(new_influences, long=True)}
+    parents = []
+    static_parents = np.broadcast_to(np.eye(4), (len(new_influences), 4, 4)).copy()
+    for i, new in enumerate(new_influences):
+        parent = long_names[new].split("|")[-2] if long_names[new].count("|") > 1 else None
+        parents.append(index.get(parent, -1))
+        if parent is not None and parent not in index:
+            # Not driven, so wherever it is now it stays for the whole bake.
+            static_parents[i] = np.reshape(cmds.getAttr(f"{parent}.worldMatrix[0]"), (4, 4))
+
+    return {
+        "joints": new_influences,
+        "parents": parents,
+        "static_parents": static_parents,
+        "joint_orients": np.array(
+            [cmds.getAttr(f"{new}.jointOrient")[0] for new in new_influences]
+        ),
+        "rotate_axes": np.array([cmds.getAttr(f"{new}.rotateAxis")[0] for new in new_influences]),
+        "rotate_orders": [
+            ROTATE_ORDERS[cmds.getAttr(f"{new}.rotateOrder")] for new in new_influences
+        ],
+    }
+
+
+def _iter_solve_direct(
+    old_influences: list,
+    frames: list,
+    sampler,
+    minimize_rotation: bool,
+    block: int,
+    influence_map: dict = None,
+):
+    """Samples and solves the export skeleton's channels, returns (new influences, channels)."""
+    layout = export_layout(old_influences, influence_map)
+    new_influences = layout.pop("joints")
+
+    with profiling.span("bake sample"):
+        step = block or max(len(frames), 1)
+        world = []
+        for start in range(0, len(frames), step):
+            world.append(sampler(old_influences, frames[start : start + step]))
+            yield ("Sampling frames", min(start + step, len(frames)), len(frames))
+        world = np.concatenate(world)
+    with profiling.span("bake solve"):
+        translate, rotate, scale = local_trs(world, minimize_rotation=minimize_rotation, **layout)
+
+    return new_influences, {"translate": translate, "rotate": rotate, "scale": scale}
+
+
+LINEAR = "linear"
+HERMITE = "hermite"
+
+
+def _key_neighbours(keep: np.ndarray) -> tuple:
+    """For every frame of every channel, the index of the kept key at or before it and at or after
+    it.  keep is (frames, channels) and must be True on the first and last frame.
+    """
+    rows = np.arange(keep.shape[0])[:, None]
+    before = np.maximum.accumulate(np.where(keep, rows, 0), axis=0)
+    after = np.minimum.accumulate(np.where(keep, rows, keep.shape[0] - 1)[::-1], axis=0)[::-1]
+    return before, after
+
+
+def interpolate_keys(
+    times: np.ndarray, values: np.ndarray, keep: np.ndarray, interpolation: str = LINEAR
+) -> np.ndarray:
+    """Rebuilds every frame of every channel from the kept keys only.
+
+    Args:
+        times (np.ndarray): (frames,) key times.
+        values (np.ndarray): (frames, channels) key values.
+        keep (np.ndarray): (frames, channels) mask of kept keys, first and last frame kept.
+        interpolation (str, optional): LINEAR, or HERMITE for Catmull-Rom style slopes through
+        the kept keys (what Maya's spline tangents do).  Defaults to LINEAR.
+
+    Returns:
+        np.ndarray: (frames, channels) rebuilt values.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    before, after = _key_neighbours(keep)
+    t0 = times[before]
+    t1 = times[after]
+    v0 = np.take_along_axis(values, before, axis=0)
+    v1 = np.take_along_axis(values, after, axis=0)
+    span = t1 - t0
+    safe_span = np.where(span > 0.0, span, 1.0)
+    u = np.where(span > 0.0, (times[:, None] - t0) / safe_span, 0.0)
+
+    if interpolation == LINEAR:
+        return v0 + u * (v1 - v0)
+    if interpolation != HERMITE:
+        raise ValueError(f"{interpolation} isn't an interpolation, use {LINEAR} or {HERMITE}.")
+
+    slopes = key_slopes(times, values, keep)
+    m0 = np.take_along_axis(slopes, before, axis=0) * span
+    m1 = np.take_along_axis(slopes, after, axis=0) * span
+    u2 = u * u
+    u3 = u2 * u
+    return (
+        (2 * u3 - 3 * u2 + 1) * v0
+        + (u3 - 2 * u2 + u) * m0
+        + (-2 * u3 + 3 * u2) * v1
+        + (u3 - u2) * m1
+    )
+
+
+def key_slopes(times: np.ndarray, values: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    """Slope interpolate_keys() gives every kept key with HERMITE: from the kept key before it to
+    the kept key after it, one sided at the ends.
+
+    Args:
+        times (np.ndarray): (frames,) key times.
+        values (np.ndarray): (frames, channels) key values.
+        keep (np.ndarray): (frames, channels) mask of kept keys, first and last frame kept.
+
+    Returns:
+        np.ndarray: (frames, channels) value change per time unit, meaningful on kept keys.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    before, after = _key_neighbours(keep)
+    last = keep.shape[0] - 1
+    prev_key = np.vstack((np.zeros_like(before[:1]), before[:-1]))
+    next_key = np.vstack((after[1:], np.full_like(after[:1], last)))
+    here = np.broadcast_to(np.arange(keep.shape[0])[:, None], keep.shape)
+    prev_key = np.where(here == 0, 0, prev_key)
+    next_key = np.where(here == last, last, next_key)
+    rise = np.take_along_axis(values, next_key, axis=0) - np.take_along_axis(
+        values, prev_key, axis=0
+    )
+    run = times[next_key] - times[prev_key]
+    return np.where(run > 0.0, rise / np.where(run > 0.0, run, 1.0), 0.0)
+
+
+def reduce_keys(
+    times: np.ndarray, values: np.ndarray, tolerance, interpolation: str = LINEAR
+) -> tuple:
+    """Picks the keys needed to rebuild every channel within a tolerance, all channels at once.
+    Constant channels come down to a single key.  The rest are refined top down (Douglas-Peucker
+    style): starting from the end keys, every span that misses by more than the tolerance gets
+    its worst frame back as a key, until nothing misses.
+
+    Args:
+        times (np.ndarray): (frames,) key times.
+        values (np.ndarray): (frames, channels) key values, one column per curve.
+        tolerance (float | np.ndarray): Largest allowed error, or one per channel.
+        interpolation (str, optional): LINEAR or HERMITE, see interpolate_keys().  Defaults to
+        LINEAR.
+
+    Returns:
+        tuple: ((frames, channels) keep mask, report dict).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    frame_count, channel_count = values.shape
+    tolerance = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (channel_count,))
+
+    keep = np.zeros(values.shape, dtype=bool)
+    keep[0] = True
+    keep[-1] = True
+    constant = np.ptp(values, axis=0) <= tolerance
+
+    passes = 0
+    error = np.zeros(values.shape)
+    while True:
+        error = np.abs(interpolate_keys(times, values, keep, interpolation) - values)
+        error[:, constant] = 0.0
+        missing = error > tolerance
+        if not missing.any():
+            break
+        passes += 1
+
+        # Worst frame of every (channel, span) that misses, found with one sort.
+        before, _ = _key_neighbours(keep)
+        frame, channel = np.nonzero(missing)
+        span_id = channel * frame_count + before[frame, channel]
+        order = np.lexsort((-error[frame, channel], span_id))
+        firsts = order[np.r_[True, span_id[order][1:] != span_id[order][:-1]]]
+        keep[frame[firsts], channel[firsts]] = True
+
+    # A constant channel keeps its first key, so it's off by how far it strays from it.
+    keep[1:, constant] = False
+    error[:, constant] = np.abs(values[:, constant] - values[0, constant])
+    kept = int(keep.sum())
+    report = {
+        "channels": channel_count,
+        "constant_channels": int(constant.sum()),
+        "keys_before": int(values.size),
+        "keys_after": kept,
+        "keys_removed": int(values.size) - kept,
+        "max_error": float(error.max()) if error.size else 0.0,
+        "passes": passes,
+    }
+    return keep, report
+
+
+def maya_read_keys(curves: list) -> list:
+    """Key times and values of many animCurves in three keyframe queries, whatever their count.
+
+    Args:
+        curves (list): animCurve names.
+
+    Returns:
+        list: (times, values) arrays per curve, values in the UI units (degrees).
+    """
+    import maya.cmds as cmds
+
+    if not curves:
+        return []
+    indices = np.array(cmds.keyframe(curves, query=True, indexValue=True) or [], dtype=np.int64)
+    times = np.array(cmds.keyframe(curves, query=True, timeChange=True) or [])
+    values = np.array(cmds.keyframe(curves, query=True, valueChange=True) or [])
+    # Key indices restart from 0 on every curve.
+    starts = np.flatnonzero(indices == 0)
+    if len(starts) != len(curves):
+        # A curve without keys leaves no mark, go one curve at a time.
+        return [
+            (
+                np.array(cmds.keyframe(curve, query=True, timeChange=True) or []),
+                np.array(cmds.keyframe(curve, query=True, valueChange=True) or []),
+            )
+            for curve in curves
+        ]
+    return list(zip(np.split(times, starts[1:]), np.split(values, starts[1:])))
+
+
+def maya_write_reduced_keys(
+    curves: list,
+    times: np.ndarray,
+    values: np.ndarray,
+    keep: np.ndarray,
+    tolerances: np.ndarray,
+    interpolation: str = LINEAR,
+) -> tuple:
+    """Cuts curves sharing their key times down to the keys reduce_keys() kept, through the API.
+    LINEAR gives the rest linear tangents.  HERMITE gives them fixed tangents at the slopes
+    reduce_keys() measured its error with, then evaluates each curve at every original key time
+    and keys back the frames still over tolerance, until none are.
+
+    Args:
+        curves (list): The animCurves.
+        times (np.ndarray): (frames,) key times in the scene's time unit.
+        values (np.ndarray): (frames, curves) key values in the UI units (degrees).
+        keep (np.ndarray): (frames, curves) mask of the keys to keep.
+        tolerances (np.ndarray): Largest allowed error per curve.
+        interpolation (str, optional): LINEAR or HERMITE.  Defaults to LINEAR.
+
+    Returns:
+        tuple: ((frames, curves) mask of the keys left, (curves,) largest error left per curve,
+        measured on the curves for HERMITE and taken as 0 for LINEAR).
+    """
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+
+    unit = om.MTime.uiUnit()
+    key_times = [om.MTime(float(time), unit) for time in times]
+    # Tangents are measured against seconds.
+    seconds = np.array([time.asUnits(om.MTime.kSeconds) for time in key_times])
+    linear = oma.MFnAnimCurve.kTangentLinear
+    fixed = oma.MFnAnimCurve.kTangentFixed
+
+    sel = om.MSelectionList()
+    for curve in curves:
+        sel.add(curve)
+    keep = np.array(keep, dtype=bool)
+    errors = np.zeros(len(curves))
+    for column in range(len(curves)):
+        curve_fn = oma.MFnAnimCurve(sel.getDependNode(column))
+        for index in np.flatnonzero(~keep[:, column])[::-1]:
+            curve_fn.remove(int(index))
+        if interpolation == LINEAR:
+            for index in range(curve_fn.numKeys):
+                curve_fn.setInTangentType(index, linear)
+                curve_fn.setOutTangentType(index, linear)
+            continue
+
+        # The API works in internal units, radians for rotations.
+        scale = 1.0
+        if curve_fn.animCurveType == oma.MFnAnimCurve.kAnimCurveTA:
+            scale = np.radians(1.0)
+        column_values = values[:, column] * scale
+        kept = keep[:, column]
+        while True:
+            if kept.sum() > 1:
+                slopes = key_slopes(seconds, column_values[:, None], kept[:, None])[:, 0]
+                for index, frame in enumerate(np.flatnonzero(kept)):
+                    angle = om.MAngle(float(np.arctan(slopes[frame])))
+                    curve_fn.setInTangentType(index, fixed)
+                    curve_fn.setOutTangentType(index, fixed)
+                    curve_fn.setAngle(index, angle, True)
+                    curve_fn.setAngle(index, angle, False)
+
+            evaluated = np.array([curve_fn.evaluate(time) for time in key_times])
+            error = np.abs(evaluated - column_values) / scale
+            missing = np.flatnonzero((error > tolerances[column]) & ~kept)
+            if not missing.size:
+                errors[column] = error.max() if error.size else 0.0
+                break
+            for frame in missing:
+                curve_fn.addKey(key_times[frame], float(column_values[frame]), fixed, fixed)
+            kept[missing] = True
+    return keep, errors
+
+
+def default_key_writer():
+    """maya_write_reduced_keys(), or that of a stand-in registered as maya.cmds."""
+    import maya.cmds as cmds
+
+    if cmds.__name__ == "maya.cmds":
+        return maya_write_reduced_keys
+    return cmds.write_reduced_keys
@@ -0,0 +1,469 @@
+"""
+batch.py
+Created: Sunday, 18th October 2026 11:20:05 am
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 11:20:09 am
+Modified By: Matthew Riche
+"""
+
+# Headless batch processing.  A manifest lists scenes to run through build_export_content() and
+# bake_animated_skeleton(), each job runs in its own mayapy process so a crash or hang only costs
+# that job.  The scheduler side of this module doesn't need Maya at all.
+#
+# From a shell:
+#   mayapy -m febex.batch nightly.json --workers 8 --summary nightly_summary.json
+#
+# Manifest layout:
+#   {
+#       "workers": 4, "timeout": 1800, "retries": 1,
+#       "jobs": [
+#           {"name": "hero", "scene": "D:/rigs/hero_anim.ma", "mesh": "hero_body",
+#            "top_joint": "root", "frame_range": [1, 240], "bake": true,
+#            "output": "D:/export/hero_anim.fbx"}
+#       ]
+#   }
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+
+# The worker prints its result on a line starting with this, everything else it prints is log.
+RESULT_TAG = "FEBEX_RESULT:"
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        scene: str,
+        mesh,
+        top_joint: str,
+        frame_range: list = None,
+        bake: bool = True,
+        direct: bool = False,
+        reduce: bool = False,
+        max_influences: int = None,
+        prune_below: float = 0.0,
+        report: str = None,
+        output: str = None,
+        build: bool = True,
+        driver: str = "constraint",
+        shards: int = None,
+        weight_cache: str = None,
+        validate_cache: bool = False,
+        max_joints: int = None,
+        merge_below: float = 0.0,
+        verify: bool = True,
+        diff_meshes: bool = False,
+    ):
+        """One scene to process.
+
+        Args:
+            name (str): Label used in logs and the summary.
+            scene (str): Path of the Maya scene to open.
+            mesh (str | list): Skinned mesh to export, or a list of them for a multi-mesh character.
+            top_joint (str): Top of the joint hierarchy.
+            frame_range (list, optional): [start, end] to bake.  Defaults to the scene's playback
+            range.
+            bake (bool, optional): Whether to bake the export skeleton.  Defaults to True.
+            direct (bool, optional): Bake by sampling matrices instead of a constraint simulation.
+            Defaults to False.
+            reduce (bool, optional): Strip redundant keys after the bake.  Defaults to False.
+            max_influences (int, optional): Influence limit per vertex.  Defaults to no limit.
+            prune_below (float, optional): Smallest weight kept.  Defaults to 0.
+            report (str, optional): Where to write a JSON timing report of the job.  Defaults to
+            no report.
+            output (str, optional): Where to write the result, ".fbx" exports the export_group,
+            ".glb" writes the baked skeleton's animation (see animexport.py), anything else saves
+            the scene there.  Defaults to not writing anything.
+            build (bool, optional): Build the export rig.  When False the scene must have one
+            already, and its stored session (see session.py) gives the influences to bake.
+            Defaults to True.
+            driver (str, optional): What drives the export skeleton during a simulation bake,
+            "constraint" or "matrix" (see skeleton.DRIVERS).  Defaults to "constraint".
+            shards (int, optional): Split the bake across this many more worker processes, each
+            opening the scene for a run of frames (see shard.py).  Defaults to one process.
+            weight_cache (str, optional): Folder of a weight cache (see weightcache.py) shared
+            between runs, "default" for weightcache.default_folder().  Defaults to no cache.
+            validate_cache (bool, optional): Transfer weights even when cached and check the
+            cache against them.  Defaults to False.
+            max_joints (int, optional): Joint budget of the export skeleton, weaker influences
+            are merged into their ancestors (see reduction.py).  Defaults to no limit.
+            merge_below (float, optional): Also merge influences never weighted this much.
+            Defaults to 0.
+            verify (bool, optional): Check the baked skeleton against the source joints on every
+            verify.STRIDE-th frame (see verify.py) and fail the job, before writing anything, if
+            it's off.  Defaults to True.
+            diff_meshes (bool, optional): Compare how the export meshes deform with their source
+            meshes after the bake (see verify.diff_meshes()).  Reported, never fails the job.
+            Defaults to False.
+        """
+        self.name = name
+        self.scene = scene
+        self.mesh = mesh
+        self.top_joint = top_joint
+        self.frame_range = list(frame_range) if frame_range is not None else None
+        self.bake = bake
+        self.direct = direct
+        self.reduce = reduce
+        self.max_influences = max_influences
+        self.prune_below = prune_below
+        self.report = report
+        self.output = output
+        self.build = build
+        self.driver = driver
+        self.shards = shards
+        self.weight_cache = weight_cache
+        self.validate_cache = validate_cache
+        self.max_joints = max_joints
+        self.merge_below = merge_below
+        self.verify = verify
+        self.diff_meshes = diff_meshes
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        missing = [key for key in ("scene", "mesh", "top_joint") if key not in data]
+        if missing:
+            raise ValueError(f"Job {data.get('name', data)} is missing {missing}.")
+        data = dict(data)
+        data.setdefault("name", os.path.splitext(os.path.basename(data["scene"]))[0])
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def load_manifest(path: str) -> dict:
+    """Reads a manifest file.
+
+    Args:
+        path (str): Path to the JSON manifest.
+
+    Raises:
+        ValueError: If the manifest has no jobs or two jobs share a name.
+
+    Returns:
+        dict: Manifest settings, with "jobs" turned into a list of Job.
+    """
+    with open(path, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    jobs = [Job.from_dict(job) for job in manifest.get("jobs", [])]
+    if len(jobs) == 0:
+        raise ValueError(f"{path} doesn't list any jobs.")
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Job names in {path} must be unique.")
+    manifest["jobs"] = jobs
+
+    return manifest
+
+
+def install_cmds(cmds_module):
+    """Registers a module as maya.cmds, so febex can be imported and run against a local stand-in
+    where there is no Maya.  If the module has a weight_backend it becomes the default weight
+    backend too.
+
+    Args:
+        cmds_module (module): Anything with the cmds functions febex calls, standin for one.
+    """
+    maya = sys.modules.get("maya") or types.ModuleType("maya")
+    maya.cmds = cmds_module
+    sys.modules["maya"] = maya
+    sys.modules["maya.cmds"] = cmds_module
+
+    if getattr(cmds_module, "weight_backend", None) is not None:
+        from . import weights
+
+        weights.set_default_backend(cmds_module.weight_backend)
+
+
+def run_job(job: Job) -> dict:
+    """Runs a job in the current process.  Expects maya.cmds to be importable, either a real
+    (standalone) Maya session or a stand-in registered through install_cmds().
+
+    Args:
+        job (Job): What to run.
+
+    Returns:
+        dict: Counts of what was built.
+    """
+    from . import profiling
+
+    if job.report is None:
+        return _run_job(job)
+
+    with profiling.record(job.name) as run:
+        details = _run_job(job)
+    run.write(job.report)
+    return details
+
+
+def _run_job(job: Job) -> dict:
+    import maya.cmds as cmds
+
+    from . import animexport
+    from . import operations
+    from . import session
+    from . import verify
+    from . import weightcache
+
+    cmds.file(job.scene, open=True, force=True)
+
+    cache = None
+    if job.weight_cache is not None:
+        folder = None if job.weight_cache == "default" else job.weight_cache
+        cache = weightcache.WeightCache(folder, validate=job.validate_cache)
+
+    meshes = job.mesh if isinstance(job.mesh, list) else [job.mesh]
+    if job.build:
+        old_influences, new_influences = operations.build_multi_export_content(
+            meshes,
+            job.top_joint,
+            max_influences=job.max_influences,
+            prune_below=job.prune_below,
+            weight_cache=cache,
+            max_joints=job.max_joints,
+            merge_below=job.merge_below,
+        )
+    else:
+        stored = session.find(operations.EXPORT_GROUP)
+        if stored is None:
+            raise ValueError(f"{job.scene} has no stored export rig, build it first.")
+        old_influences, new_influences = stored.old_influences, stored.new_influences
+
+    # The build's own pairing of source and export joints, rather than going by names.
+    influence_map = session.find(operations.EXPORT_GROUP).influence_map
+    details = {"influences": len(old_influences), "exported_influences": len(new_influences)}
+    if cache is not None:
+        details["weight_cache"] = cache.stats
+    if job.build and (job.max_joints is not None or job.merge_below > 0.0):
+        details["merged_influences"] = len(session.load(operations.EXPORT_GROUP).merges)
+    if job.bake:
+        if job.frame_range is not None:
+            cmds.playbackOptions(minTime=job.frame_range[0], maxTime=job.frame_range[1])
+        operations.bake_animated_skeleton(
+            old_influences,
+            new_influences,
+            direct=job.direct,
+            driver=job.driver,
+            shards=job.shards,
+        )
+        if job.reduce:
+            details["keys"] = operations.reduce_baked_keys(new_influences)
+        if job.verify:
+            checked = verify.verify_bake(
+                old_influences, stride=verify.STRIDE, influence_map=influence_map
+            )
+            details["verify"] = {
+                key: checked[key]
+                for key in ("passed", "max_position_error", "max_rotation_error", "frames_checked")
+            }
+            if not checked["passed"]:
+                worst = checked["worst"][0]
+                raise RuntimeError(
+                    f"The bake is off its source: {checked['failing_joints']} joints, worst "
+                    f"{worst['joint']} by {worst['position_error']:.5f} units and "
+                    f"{worst['rotation_error']:.5f} degrees."
+                )
+        if job.diff_meshes:
+            diffed = verify.diff_meshes(meshes)
+            details["mesh_diff"] = {
+                mesh: {
+                    key: diffed["meshes"][mesh][key]
+                    for key in ("max_error", "mean_error", "problem_vertices", "problem_regions")
+                }
+                for mesh in diffed["meshes"]
+            }
+
+    if job.output is not None:
+        if job.output.lower().endswith(".fbx"):
+            cmds.loadPlugin("fbxmaya", quiet=True)
+            cmds.select("export_group", r=True)
+            cmds.file(job.output, force=True, exportSelected=True, type="FBX export")
+        elif job.output.lower().endswith(animexport.GLB):
+            animexport.export_animation(job.output, new_influences, take=job.name)
+        else:
+            cmds.file(rename=job.output)
+            cmds.file(save=True, force=True)
+
+    return details
+
+
+def worker_main(argv: list = None):
+    """Entry point of a worker process: reads one job as JSON from stdin, runs it and prints a
+    tagged JSON result line.
+    """
+    parser = argparse.ArgumentParser(description="febex batch worker")
+    parser.add_argument("--worker", action="store_true")
+    parser.add_argument("--standin", help="Import path of a module to use as maya.cmds.")
+    args, _ = parser.parse_known_args(argv)
+
+    if args.standin:
+        install_cmds(importlib.import_module(args.standin))
+    else:
+        import maya.standalone
+
+        maya.standalone.initialize(name="python")
+
+    from . import execution
+
+    # Nobody will undo anything in a worker.
+    execution.set_profile(execution.PROFILES["lean"])
+
+    job = Job.from_dict(json.loads(sys.stdin.read()))
+    start = time.perf_counter()
+    try:
+        result = {"status": OK, "details": run_job(job)}
+    except Exception as error:
+        result = {"status": FAILED, "error": f"{type(error).__name__}: {error}"}
+    result["seconds"] = time.perf_counter() - start
+
+    print(RESULT_TAG + json.dumps(result))
+    sys.stdout.flush()
+
+
+class SubprocessRunner:
+    def __init__(self, executable: str = "mayapy", standin: str = None, module: str = "batch"):
+        """Runs each job in a fresh process of the given interpreter.
+
+        Args:
+            executable (str, optional): Interpreter to launch.  Defaults to "mayapy".
+            standin (str, optional): Import path of a stand-in maya.cmds module, for running the
+            pipeline without Maya.  Defaults to None (real Maya).
+            module (str, optional): febex module whose worker_main() runs the job, e.g. "shard"
+            for bake shards.  Defaults to "batch".
+        """
+        self.executable = executable
+        self.standin = standin
+        self.module = module
+
+    def command(self) -> list:
+        command = [self.executable, "-m", f"{__package__}.{self.module}", "--worker"]
+        if self.standin:
+            command += ["--standin", self.standin]
+        return command
+
+    def __call__(self, job: Job, timeout: float) -> dict:
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (package_root, env.get("PYTHONPATH")) if path
+        )
+
+        try:
+            process = subprocess.run(
+                self.command(),
+                input=json.dumps(job.to_dict()),
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                env=env,
+            )
+        except subprocess.TimeoutExpired:
+            return {"status": TIMEOUT, "error": f"No result after {timeout} seconds."}
+
+        for line in reversed(process.stdout.splitlines()):
+            if line.startswith(RESULT_TAG):
+                return json.loads(line[len(RESULT_TAG) :])
+
+        tail = (process.stderr or process.stdout).strip().splitlines()[-5:]
+        return {
+            "status": FAILED,
+            "error": f"Worker exited with {process.returncode}: " + "\n".join(tail),
+        }
+
+
+def run_batch(
+    jobs: list, runner=None, workers: int = 1, timeout: float = None, retries: int = 0
+) -> dict:
+    """Runs jobs across a pool of workers, retrying failures and timeouts.
+
+    Args:
+        jobs (list): Job objects.
+        runner (fn, optional): Called as runner(job, timeout), returns a result dict with at least
+        a "status".  Defaults to a SubprocessRunner on mayapy.
+        workers (int, optional): Jobs allowed to run at once.  Defaults to 1.
+        timeout (float, optional): Seconds a single attempt may take.  Defaults to no limit.
+        retries (int, optional): Extra attempts for a job that doesn't come back ok.  Defaults to 0.
+
+    Returns:
+        dict: Summary with a result per job and totals per status.
+    """
+    if runner is None:
+        runner = SubprocessRunner()
+
+    def attempt(job: Job) -> dict:
+        for attempt_number in range(1, retries + 2):
+            start = time.perf_counter()
+            try:
+                result = runner(job, timeout)
+            except Exception as error:
+                result = {"status": FAILED, "error": f"{type(error).__name__}: {error}"}
+            result.setdefault("seconds", time.perf_counter() - start)
+            result["attempts"] = attempt_number
+            if result["status"] == OK:
+                break
+            print(f'Job "{job.name}" attempt {attempt_number}: {result["status"]}.')
+        result["name"] = job.name
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        results = list(pool.map(attempt, jobs))
+
+    totals = {}
+    for result in results:
+        totals[result["status"]] = totals.get(result["status"], 0) + 1
+
+    return {"seconds": time.perf_counter() - start, "totals": totals, "jobs": results}
+
+
+def main(argv: list = None) -> int:
+    """Command line entry point, see the top of this module."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if "--worker" in argv:
+        worker_main(argv)
+        return 0
+
+    parser = argparse.ArgumentParser(description="Run febex over many scenes headlessly.")
+    parser.add_argument("manifest", help="JSON manifest of jobs.")
+    parser.add_argument("--workers", type=int, help="Parallel worker processes.")
+    parser.add_argument("--timeout", type=float, help="Seconds allowed per job attempt.")
+    parser.add_argument("--retries", type=int, help="Extra attempts for failed jobs.")
+    parser.add_argument("--summary", help="Where to write the JSON summary.")
+    parser.add_argument("--mayapy", default="mayapy", help="Interpreter for the workers.")
+    parser.add_argument("--standin", help="Import path of a stand-in maya.cmds module.")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    summary = run_batch(
+        manifest["jobs"],
+        runner=SubprocessRunner(args.mayapy, args.standin),
+        workers=args.workers or manifest.get("workers", os.cpu_count() or 1),
+        timeout=args.timeout or manifest.get("timeout"),
+        retries=args.retries if args.retries is not None else manifest.get("retries", 0),
+    )
+
+    if args.summary:
+        with open(args.summary, "w") as summary_file:
+            json.dump(summary, summary_file, indent=4)
+    print(json.dumps(summary["totals"]))
+
+    return 0 if set(summary["totals"]) <= {OK} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
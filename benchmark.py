@@ -0,0 +1,495 @@
+"""
+benchmark.py
+Created: Sunday, 18th October 2026 7:58:40 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 7:58:44 pm
+Modified By: Matthew Riche
+"""
+
+# Benchmarks of the pipeline against generated rigs in the stand-in scene (standin.py), so
+# regressions show up without a Maya licence.  Run it with plain python, not inside Maya, as it
+# replaces maya.cmds:
+#
+#   python -m febex.benchmark --preset small medium --save baseline.json
+#   python -m febex.benchmark --preset small medium --baseline baseline.json
+#
+# Each benchmark prepares its scene untimed, then runs once or more under profiling.record() and
+# keeps the fastest wall time and the command count.  A benchmark can return the bytes its working
+# data took, which are reported along.  Against a baseline, a benchmark regresses
+# when it issues more commands or gets slower by more than the tolerance, and the exit code is 1.
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+
+
+# Rig sizes: joints, vertices per mesh and meshes.
+PRESETS = {
+    "small": {"joints": 50, "verts": 1000, "meshes": 1},
+    "medium": {"joints": 250, "verts": 60000, "meshes": 2},
+    "large": {"joints": 1000, "verts": 20000, "meshes": 1},
+    "dense": {"joints": 50, "verts": 500000, "meshes": 1},
+}
+
+# Overlapping takes on the stand-in's 120 frame timeline.
+TAKES = [("idle", 1, 40), ("walk", 30, 70), ("run", 60, 120)]
+
+
+def _open(rig: dict) -> dict:
+    """Opens a fresh synthetic scene, returns what build_rig() made."""
+    import maya.cmds as cmds
+
+    from . import skinning
+    from . import standin
+
+    cmds.file(new=True, force=True)
+    # What the resolver's scene callbacks would do in Maya.
+    skinning._resolver.forget()
+    return standin.scene.build_rig(**rig)
+
+
+def _shape(mesh: str) -> str:
+    from . import nodecache
+
+    return nodecache.current().shapes(mesh)[0]
+
+
+def bench_copy_influence_tree(rig: dict):
+    from . import skeleton
+
+    made = _open(rig)
+    yield
+    skeleton.copy_influence_tree(made["top_joint"], made["influences"])
+
+
+def bench_find_cluster_node(rig: dict):
+    from . import skinning
+
+    made = _open(rig)
+    shapes = [_shape(mesh) for mesh in made["meshes"]]
+    yield
+    # A cold lookup then the repeats a build makes.
+    for _ in range(10):
+        for shape in shapes:
+            skinning.find_cluster_node(shape)
+
+
+def _skinned_copies(rig: dict) -> list:
+    """Opens a scene and binds an "_EXP" copy of each mesh to an "_INF" skeleton, returns
+    (old shape, new shape) pairs."""
+    import maya.cmds as cmds
+
+    from . import skeleton
+    from . import skinning
+
+    made = _open(rig)
+    tree = skeleton.copy_influence_tree(made["top_joint"], made["influences"])
+    pairs = []
+    for mesh in made["meshes"]:
+        copy = cmds.rename(cmds.duplicate(mesh)[0], f"{mesh}_EXP")
+        skinning.bind_skin(_shape(copy), list(tree.values()))
+        pairs.append((_shape(mesh), _shape(copy)))
+    return pairs
+
+
+def bench_copy_skinning(rig: dict):
+    from . import skinning
+
+    pairs = _skinned_copies(rig)
+    yield
+    copied = [skinning.copy_skinning(old_shape, new_shape) for old_shape, new_shape in pairs]
+    return sum(skin_weights.nbytes for skin_weights in copied)
+
+
+def bench_copy_skinning_dense(rig: dict):
+    """bench_copy_skinning() with whole (verts x influences) tables, as it was done before
+    weights.SkinWeights."""
+    from . import skinning
+    from . import weights
+
+    pairs = _skinned_copies(rig)
+    backend = weights.default_backend()
+    yield
+    data_bytes = 0
+    for old_shape, new_shape in pairs:
+        old_cluster = skinning.find_cluster_node(old_shape)
+        new_cluster = skinning.find_cluster_node(new_shape)
+        table, old_infs = backend.read(old_cluster)
+        new_table, new_infs = backend.read(new_cluster)
+        remapped = weights.normalize_rows(weights.remap_columns(table, old_infs, new_infs))
+        backend.write(new_cluster, remapped, new_infs)
+        data_bytes += table.nbytes + new_table.nbytes + remapped.nbytes
+    return data_bytes
+
+
+def bench_build_export_content(rig: dict):
+    from . import operations
+
+    made = _open(rig)
+    yield
+    operations.build_multi_export_content(made["meshes"], made["top_joint"], max_influences=4)
+
+
+def bench_rebuild_unchanged(rig: dict):
+    from . import operations
+
+    made = _open(rig)
+    operations.build_multi_export_content(made["meshes"], made["top_joint"], max_influences=4)
+    yield
+    operations.build_multi_export_content(made["meshes"], made["top_joint"], max_influences=4)
+
+
+def bench_build_weight_cached(rig: dict):
+    """bench_build_export_content() on a fresh scene with every mesh's weights already in the
+    weight cache, as on the night after a batch."""
+    import tempfile
+
+    from . import operations
+    from . import weightcache
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache = weightcache.WeightCache(folder)
+        made = _open(rig)
+        operations.build_multi_export_content(
+            made["meshes"], made["top_joint"], max_influences=4, weight_cache=cache
+        )
+        made = _open(rig)
+        yield
+        operations.build_multi_export_content(
+            made["meshes"], made["top_joint"], max_influences=4, weight_cache=cache
+        )
+
+
+def bench_build_reduced(rig: dict):
+    """bench_build_export_content() with the export skeleton cut to a quarter of its joints."""
+    from . import operations
+
+    made = _open(rig)
+    yield
+    operations.build_multi_export_content(
+        made["meshes"], made["top_joint"], max_joints=max(rig["joints"] // 4, 1)
+    )
+
+
+def bench_bake_constraints(rig: dict):
+    from . import operations
+
+    made = _open(rig)
+    old, new = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    yield
+    operations.bake_animated_skeleton(old, new)
+
+
+def bench_bake_matrix(rig: dict):
+    """bench_bake_constraints() with the export skeleton driven by matrix nodes."""
+    from . import operations
+    from . import skeleton
+
+    made = _open(rig)
+    old, new = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    yield
+    operations.bake_animated_skeleton(old, new, driver=skeleton.MATRIX)
+
+
+def bench_bake_direct(rig: dict):
+    from . import bake
+    from . import operations
+    from . import standin
+
+    made = _open(rig)
+    old, _ = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    scene = standin.scene
+    yield
+    bake.bake_direct(old, sampler=scene.world_matrices, writer=scene.write_curves)
+
+
+def bench_bake_sharded(rig: dict):
+    """bench_bake_direct() split across four stand-in worker processes, startup included."""
+    import sys
+
+    from . import batch
+    from . import operations
+    from . import shard
+    from . import standin
+
+    made = _open(rig)
+    old, _ = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    scene = standin.scene
+    synthetic = "synthetic:" + ",".join(f"{key}={value}" for key, value in rig.items())
+    runner = batch.SubprocessRunner(sys.executable, standin.__name__, module="shard")
+    yield
+    shard.bake_sharded(
+        old, shards=4, scene=synthetic, runner=runner, writer=scene.write_curves, retries=0
+    )
+
+
+def bench_verify_bake(rig: dict):
+    """Checks a constraint bake against the source joints on every frame."""
+    from . import operations
+    from . import verify
+
+    made = _open(rig)
+    old, new = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    operations.bake_animated_skeleton(old, new)
+    yield
+    verify.verify_bake(old, stop_early=False)
+
+
+def bench_diff_meshes(rig: dict):
+    """Compares the deformation of every export mesh with its source after a constraint bake."""
+    from . import operations
+    from . import verify
+
+    made = _open(rig)
+    old, new = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    operations.bake_animated_skeleton(old, new)
+    yield
+    verify.diff_meshes(made["meshes"])
+
+
+def bench_bake_takes(rig: dict):
+    from . import bake
+    from . import operations
+    from . import standin
+
+    made = _open(rig)
+    old, _ = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    scene = standin.scene
+    yield
+    bake.bake_takes(old, TAKES, sampler=scene.world_matrices, writer=scene.write_take_curves)
+
+
+def bench_bake_takes_separately(rig: dict):
+    """What bench_bake_takes() replaces: one bake per take."""
+    from . import bake
+    from . import operations
+    from . import standin
+
+    made = _open(rig)
+    old, _ = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    scene = standin.scene
+    yield
+    for _, start, end in TAKES:
+        frames = list(range(start, end + 1))
+        bake.bake_direct(old, frames, sampler=scene.world_matrices, writer=scene.write_curves)
+
+
+def bench_export_glb(rig: dict):
+    import tempfile
+
+    from . import animexport
+    from . import operations
+    from . import standin
+
+    made = _open(rig)
+    old, new = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    operations.bake_animated_skeleton(old, new)
+    scene = standin.scene
+    with tempfile.TemporaryDirectory() as folder:
+        yield
+        animexport.export_animation(
+            f"{folder}/clip.glb", new, sampler=scene.world_matrices, fps=24.0
+        )
+
+
+def bench_build_maya_profile(rig: dict):
+    """bench_build_export_content() with undo, refresh and evaluation as Maya left them."""
+    from . import execution
+    from . import operations
+
+    made = _open(rig)
+    yield
+    with execution.applied(execution.BUILD, execution.PROFILES["maya"]):
+        operations.build_multi_export_content(made["meshes"], made["top_joint"], max_influences=4)
+
+
+def bench_bake_maya_profile(rig: dict):
+    """bench_bake_constraints() with undo, refresh and evaluation as Maya left them."""
+    from . import execution
+    from . import operations
+
+    made = _open(rig)
+    old, new = operations.build_multi_export_content(made["meshes"], made["top_joint"])
+    yield
+    with execution.applied(execution.BAKE, execution.PROFILES["maya"]):
+        operations.bake_animated_skeleton(old, new)
+
+
+BENCHMARKS = {
+    "copy_influence_tree": bench_copy_influence_tree,
+    "find_cluster_node": bench_find_cluster_node,
+    "copy_skinning": bench_copy_skinning,
+    "copy_skinning_dense": bench_copy_skinning_dense,
+    "build_export_content": bench_build_export_content,
+    "rebuild_unchanged": bench_rebuild_unchanged,
+    "build_weight_cached": bench_build_weight_cached,
+    "build_reduced": bench_build_reduced,
+    "bake_constraints": bench_bake_constraints,
+    "bake_matrix": bench_bake_matrix,
+    "bake_direct": bench_bake_direct,
+    "bake_sharded": bench_bake_sharded,
+    "verify_bake": bench_verify_bake,
+    "diff_meshes": bench_diff_meshes,
+    "bake_takes": bench_bake_takes,
+    "bake_takes_separately": bench_bake_takes_separately,
+    "export_glb": bench_export_glb,
+    "build_maya_profile": bench_build_maya_profile,
+    "bake_maya_profile": bench_bake_maya_profile,
+}
+
+
+def run_benchmark(name: str, rig: dict, repeat: int = 1) -> dict:
+    """Runs one benchmark on one rig size.
+
+    Args:
+        name (str): Key of BENCHMARKS.
+        rig (dict): build_rig() arguments.
+        repeat (int, optional): Timed runs, each with a fresh setup.  Defaults to 1.
+
+    Returns:
+        dict: Fastest "seconds", "commands" and "command_counts" of that run, its spans, and
+        the "undo_bytes" and "redraws" the stand-in scene counted during it.
+    """
+    from . import profiling
+    from . import standin
+
+    best = None
+    for _ in range(max(repeat, 1)):
+        # The pipeline's own printing is kept out of the way.
+        with contextlib.redirect_stdout(io.StringIO()):
+            steps = BENCHMARKS[name](rig)
+            next(steps)
+            scene = standin.scene
+            undo_bytes, redraws = scene.undo_bytes, scene.redraws
+            data_bytes = None
+            with profiling.record(name) as run:
+                try:
+                    next(steps)
+                except StopIteration as stop:
+                    data_bytes = stop.value
+            costs = (scene.undo_bytes - undo_bytes, scene.redraws - redraws, data_bytes)
+        if best is None or run.root.seconds < best.root.seconds:
+            best, best_costs = run, costs
+
+    report = best.to_dict()
+    return {
+        "seconds": report["seconds"],
+        "commands": report["commands"],
+        "command_counts": report["command_counts"],
+        "spans": report["children"],
+        "undo_bytes": best_costs[0],
+        "redraws": best_costs[1],
+        "data_bytes": best_costs[2],
+    }
+
+
+def run_benchmarks(rigs: dict, names: list = None, repeat: int = 1) -> dict:
+    """Runs benchmarks against the stand-in scene, installing it as maya.cmds first.
+
+    Args:
+        rigs (dict): Label to build_rig() arguments, like PRESETS.
+        names (list, optional): Benchmarks to run.  Defaults to all of BENCHMARKS.
+        repeat (int, optional): Timed runs per benchmark.  Defaults to 1.
+
+    Returns:
+        dict: Results per rig label, then per benchmark.
+    """
+    from . import batch
+    from . import standin
+
+    batch.install_cmds(standin)
+
+    results = {}
+    for label, rig in rigs.items():
+        results[label] = {"rig": rig}
+        for name in names or list(BENCHMARKS):
+            result = run_benchmark(name, rig, repeat)
+            results[label][name] = result
+            data = ""
+            if result["data_bytes"] is not None:
+                data = f", {result['data_bytes'] / 1e6:.1f}MB data"
+            print(
+                f"{label} {name}: {result['seconds']:.3f}s, {result['commands']} commands, "
+                f"{result['undo_bytes'] / 1e6:.1f}MB undo, {result['redraws']} redraws{data}.",
+                flush=True,
+            )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25, slack: float = 0.01) -> list:
+    """Finds benchmarks that got worse than a baseline.
+
+    Args:
+        results (dict): From run_benchmarks().
+        baseline (dict): An earlier run_benchmarks() result.
+        tolerance (float, optional): Allowed slow down, as a fraction.  Defaults to 0.25.
+        slack (float, optional): Seconds of slow down always allowed, so tiny benchmarks don't
+        flag on noise.  Defaults to 0.01.
+
+    Returns:
+        list: One message per regression.
+    """
+    regressions = []
+    for label, benches in results.items():
+        for name, result in benches.items():
+            before = baseline.get(label, {}).get(name)
+            if name == "rig" or before is None:
+                continue
+            if baseline[label].get("rig") != benches["rig"]:
+                regressions.append(f"{label}: the rig differs from the baseline's, not compared.")
+                break
+            if result["commands"] > before["commands"]:
+                regressions.append(
+                    f"{label} {name}: {result['commands']} commands, "
+                    f"baseline {before['commands']}."
+                )
+            allowed = before["seconds"] * (1.0 + tolerance) + slack
+            if result["seconds"] > allowed:
+                regressions.append(
+                    f"{label} {name}: {result['seconds']:.3f}s, "
+                    f"baseline {before['seconds']:.3f}s."
+                )
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    """Command line entry point, see the top of this module."""
+    parser = argparse.ArgumentParser(description="Benchmark febex against synthetic rigs.")
+    parser.add_argument("--preset", nargs="+", choices=list(PRESETS), default=["small"])
+    parser.add_argument("--joints", type=int, help="Custom rig joint count, instead of presets.")
+    parser.add_argument("--verts", type=int, default=10000, help="Custom rig vertex count.")
+    parser.add_argument("--meshes", type=int, default=1, help="Custom rig mesh count.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs, the fastest is kept.")
+    parser.add_argument("--save", help="Write the results as a baseline here.")
+    parser.add_argument("--baseline", help="Compare against a saved baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slow down.")
+    args = parser.parse_args(argv)
+
+    if args.joints:
+        rigs = {"custom": {"joints": args.joints, "verts": args.verts, "meshes": args.meshes}}
+    else:
+        rigs = {label: PRESETS[label] for label in args.preset}
+
+    results = run_benchmarks(rigs, args.only, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
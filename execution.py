@@ -0,0 +1,187 @@
+"""
+execution.py
+Created: Sunday, 18th October 2026 9:46:03 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 9:46:07 pm
+Modified By: Matthew Riche
+"""
+
+# Execution profiles: how Maya is set up while febex works.  Each profile decides what happens to
+# the undo queue (left alone, one chunk, or off), whether the viewport redraws, which evaluation
+# mode runs and whether cached playback and auto key stay on.  Operations apply the profile of
+# their stage ("build" or "bake") and everything is put back afterwards, errors included:
+#
+#   execution.set_profile(execution.PROFILES["lean"])      # every stage, from now on
+#   with execution.applied("bake", execution.PROFILES["maya"]):
+#       ...                                                 # or just for a block
+#
+# Profiles don't nest, inside an applied profile further applied() calls change nothing.  Under a
+# tasks.Task the profile is handed to the task, which applies it around each time slice and puts
+# Maya back in between, so the user never gets a frozen viewport or a switched evaluation mode
+# while the task waits on the UI timer.  Undo is never switched off then, the task needs it to
+# roll back.
+
+import contextlib
+
+from . import tasks
+
+
+UNDO_ON = "on"
+UNDO_CHUNK = "chunk"
+UNDO_OFF = "off"
+
+# Evaluation manager modes, DG is the manager switched off.
+DG = "off"
+SERIAL = "serial"
+PARALLEL = "parallel"
+
+BUILD = "build"
+BAKE = "bake"
+
+
+class ExecutionProfile:
+    def __init__(
+        self,
+        name: str,
+        undo: str = UNDO_CHUNK,
+        suspend_refresh: bool = True,
+        evaluation: str = None,
+        cached_playback: bool = None,
+        auto_key: bool = False,
+    ):
+        """Scene settings to run an operation under.
+
+        Args:
+            name (str): Label for messages.
+            undo (str, optional): UNDO_ON, UNDO_CHUNK (the whole operation is one undo step) or
+            UNDO_OFF (nothing is recorded, the queue before it is kept).  Defaults to UNDO_CHUNK.
+            suspend_refresh (bool, optional): Stop viewport redraws.  Defaults to True.
+            evaluation (str, optional): DG, SERIAL or PARALLEL.  Defaults to leaving it be.
+            cached_playback (bool, optional): Turn cached playback on or off.  Defaults to
+            leaving it be.
+            auto_key (bool, optional): Auto key state, None leaves it be.  Defaults to False.
+        """
+        self.name = name
+        self.undo = undo
+        self.suspend_refresh = suspend_refresh
+        self.evaluation = evaluation
+        self.cached_playback = cached_playback
+        self.auto_key = auto_key
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+PROFILES = {
+    # Maya as the user left it.
+    "maya": ExecutionProfile(
+        "maya", undo=UNDO_ON, suspend_refresh=False, cached_playback=None, auto_key=None
+    ),
+    # Node creation and parenting: the graph changes constantly, so the evaluation manager only
+    # gets in the way.  Still one undo step.
+    "build": ExecutionProfile("build", undo=UNDO_CHUNK, evaluation=DG, cached_playback=False),
+    # Frame sampling: parallel evaluation, no cache filling up behind it, nothing recorded.
+    "bake": ExecutionProfile("bake", undo=UNDO_OFF, evaluation=PARALLEL, cached_playback=False),
+    # Headless runs, nobody is going to undo anything.
+    "lean": ExecutionProfile("lean", undo=UNDO_OFF, evaluation=DG, cached_playback=False),
+}
+
+_profiles = {BUILD: PROFILES["build"], BAKE: PROFILES["bake"]}
+_applied = []
+
+
+def profile_for(stage: str) -> ExecutionProfile:
+    """The profile a stage runs under."""
+    return _profiles[stage]
+
+
+def set_profile(profile: ExecutionProfile, stage: str = None):
+    """Sets the profile operations run under.
+
+    Args:
+        profile (ExecutionProfile): Profile to use, see PROFILES.
+        stage (str, optional): BUILD or BAKE.  Defaults to both.
+    """
+    for key in [stage] if stage else list(_profiles):
+        _profiles[key] = profile
+
+
+@contextlib.contextmanager
+def applied(stage: str, profile: ExecutionProfile = None):
+    """Runs a block under an execution profile and puts every setting back afterwards.  Inside a
+    running tasks.Task the task holds the profile instead, see tasks.Task.hold().
+
+    Args:
+        stage (str): BUILD or BAKE, picks the profile when none is given and names the undo
+        chunk.
+        profile (ExecutionProfile, optional): Defaults to the stage's profile.
+
+    Yields:
+        ExecutionProfile: The profile in effect.
+    """
+    if _applied:
+        yield _applied[-1]
+        return
+
+    profile = profile or profile_for(stage)
+    task = tasks.current()
+    if task is None:
+        with _apply(stage, profile):
+            yield profile
+        return
+
+    task.hold(lambda: _apply(stage, profile))
+    try:
+        yield profile
+    finally:
+        task.hold(None)
+
+
+@contextlib.contextmanager
+def _apply(stage: str, profile: ExecutionProfile):
+    import maya.cmds as cmds
+
+    restores = []
+    _applied.append(profile)
+    try:
+        undo = profile.undo
+        if undo == UNDO_OFF and tasks.running():
+            undo = UNDO_CHUNK
+        if undo == UNDO_OFF and cmds.undoInfo(query=True, state=True):
+            cmds.undoInfo(stateWithoutFlush=False)
+            restores.append(lambda: cmds.undoInfo(stateWithoutFlush=True))
+        elif undo == UNDO_CHUNK:
+            cmds.undoInfo(openChunk=True, chunkName=f"febex {stage}")
+            restores.append(lambda: cmds.undoInfo(closeChunk=True))
+
+        if profile.suspend_refresh:
+            cmds.refresh(suspend=True)
+            restores.append(lambda: cmds.refresh(suspend=False))
+
+        if profile.evaluation is not None:
+            mode = cmds.evaluationManager(query=True, mode=True)[0]
+            if mode != profile.evaluation:
+                cmds.evaluationManager(mode=profile.evaluation)
+                restores.append(lambda: cmds.evaluationManager(mode=mode))
+
+        if profile.cached_playback is not None:
+            try:
+                cached = cmds.evaluator(name="cache", query=True, enable=True)
+            except RuntimeError:
+                # No cached playback before Maya 2019.
+                cached = profile.cached_playback
+            if cached != profile.cached_playback:
+                cmds.evaluator(name="cache", enable=profile.cached_playback)
+                restores.append(lambda: cmds.evaluator(name="cache", enable=cached))
+
+        if profile.auto_key is not None:
+            auto_key = cmds.autoKeyframe(query=True, state=True)
+            if auto_key != profile.auto_key:
+                cmds.autoKeyframe(state=profile.auto_key)
+                restores.append(lambda: cmds.autoKeyframe(state=auto_key))
+
+        yield profile
+    finally:
+        _applied.pop()
+        for restore in reversed(restores):
+            restore()
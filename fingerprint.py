@@ -0,0 +1,184 @@
+"""
+fingerprint.py
+Created: Sunday, 18th October 2026 3:41:12 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 3:41:16 pm
+Modified By: Matthew Riche
+"""
+
+# Fingerprints of what an export rig was built from, stored on the export group.  Re-running a
+# build compares them with the scene and only redoes the parts that changed.
+
+import hashlib
+import json
+
+import maya.cmds as cmds
+import numpy as np
+
+from . import weights
+from .skeleton import HierarchyIndex
+
+
+ATTRIBUTE = "febexFingerprints"
+VERSION = 3
+
+KEEP = "keep"
+EXTEND = "extend"
+REWEIGHT = "reweight"
+REBUILD = "rebuild"
+
+
+def _digest(*parts) -> str:
+    """Short hash of arrays, strings and anything json can write."""
+    hasher = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            hasher.update(str(part.shape).encode())
+            hasher.update(np.ascontiguousarray(part).tobytes())
+        else:
+            hasher.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return hasher.hexdigest()[:16]
+
+
+def skeleton_prints(
+    index: HierarchyIndex, clusters: list, backend: weights.WeightBackend = None
+) -> dict:
+    """One fingerprint per joint that gets copied: where it goes in the export hierarchy and its
+    bind matrix (from the first skinCluster it's bound to).  Posing the rig or moving the current
+    frame changes neither.
+
+    Args:
+        index (HierarchyIndex): Index of the skeleton being exported.
+        clusters (list): The source meshes' skinClusters.
+        backend (weights.WeightBackend, optional): Defaults to weights.default_backend().
+
+    Returns:
+        dict: Joint name to fingerprint.
+    """
+    if backend is None:
+        backend = weights.default_backend()
+
+    bind_matrices = {}
+    for cluster in clusters:
+        for joint, matrix in backend.bind_matrices(cluster).items():
+            bind_matrices.setdefault(joint, matrix)
+
+    prints = {}
+    for joint in [index.top_joint] + index.kept:
+        # A top joint that isn't an influence has no bind matrix, only its place counts.
+        matrix = bind_matrices.get(joint)
+        matrix = None if matrix is None else np.round(np.asarray(matrix, dtype=np.float64), 5)
+        prints[joint] = _digest(index.kept_ancestors.get(joint), matrix)
+    return prints
+
+
+def mesh_prints(
+    mesh: str, cluster: str, influences: list, settings: dict, backend: weights.WeightBackend = None
+) -> dict:
+    """Fingerprints of a source mesh: its topology, its undeformed geometry, its weights, its
+    influences and the settings its export copy is made with.  None of them depend on the pose
+    or the current frame.
+
+    Args:
+        mesh (str): Mesh shape node.
+        cluster (str): Its skinCluster.
+        influences (list): The cluster's influences.
+        settings (dict): Export options that change the result (transfer mode, limits...).
+        backend (weights.WeightBackend, optional): Defaults to weights.default_backend().
+
+    Returns:
+        dict: Fingerprint per part.
+    """
+    if backend is None:
+        backend = weights.default_backend()
+
+    points, triangles = backend.rest_geometry(mesh)
+    skin_weights = backend.read_sparse(cluster)
+    topology = _digest(len(points), np.asarray(triangles, dtype=np.int64))
+
+    return {
+        "topology": topology,
+        "geometry": _digest(topology, np.round(points, 5)),
+        "weights": _digest(
+            skin_weights.indptr,
+            skin_weights.indices,
+            np.round(skin_weights.values, 6),
+            skin_weights.influences,
+        ),
+        "influences": _digest(sorted(influences)),
+        "settings": _digest(settings),
+    }
+
+
+def read(node: str) -> dict:
+    """Fingerprints stored on a node, or None if it has none (or from another version).
+
+    Args:
+        node (str): Usually the export group.
+
+    Returns:
+        dict: The stored fingerprints.
+    """
+    if not cmds.objExists(f"{node}.{ATTRIBUTE}"):
+        return None
+    try:
+        stored = json.loads(cmds.getAttr(f"{node}.{ATTRIBUTE}") or "")
+    except ValueError:
+        return None
+    if stored.get("version") != VERSION:
+        return None
+    return stored
+
+
+def write(node: str, prints: dict):
+    """Stores fingerprints on a node as a string attribute.
+
+    Args:
+        node (str): Usually the export group.
+        prints (dict): Fingerprints to store.
+    """
+    if not cmds.objExists(f"{node}.{ATTRIBUTE}"):
+        cmds.addAttr(node, ln=ATTRIBUTE, dt="string")
+    cmds.setAttr(f"{node}.{ATTRIBUTE}", json.dumps(dict(prints, version=VERSION)), type="string")
+
+
+def plan_skeleton(stored: dict, current: dict) -> str:
+    """Decides what the export skeleton needs.
+
+    Args:
+        stored (dict): Fingerprints from the last build, or None.
+        current (dict): Fingerprints of the scene now.
+
+    Returns:
+        str: KEEP when nothing changed, EXTEND when joints were only added, REBUILD otherwise.
+    """
+    if stored is None or stored.get("top_joint") != current["top_joint"]:
+        return REBUILD
+
+    before = stored["skeleton"]
+    now = current["skeleton"]
+    if any(now.get(joint) != joint_print for joint, joint_print in before.items()):
+        return REBUILD
+    if len(now) > len(before):
+        return EXTEND
+    return KEEP
+
+
+def plan_mesh(stored: dict, current: dict, mesh: str) -> str:
+    """Decides what one export mesh needs, assuming its skeleton is kept or extended.
+
+    Args:
+        stored (dict): Fingerprints from the last build, or None.
+        current (dict): Fingerprints of the scene now.
+        mesh (str): Source mesh transform the fingerprints are keyed by.
+
+    Returns:
+        str: KEEP, REWEIGHT when only the weights or export settings changed, REBUILD otherwise.
+    """
+    before = (stored or {}).get("meshes", {}).get(mesh)
+    now = current["meshes"][mesh]
+    if before is None or any(before[part] != now[part] for part in ("geometry", "influences")):
+        return REBUILD
+    if any(before[part] != now[part] for part in ("weights", "settings")):
+        return REWEIGHT
+    return KEEP
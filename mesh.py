@@ -7,7 +7,7 @@ Modified By: Matthew Riche
 """
 
 
-import maya.cmds as cmds
+from . import nodecache
 
 
 class MeshData:
@@ -27,21 +27,23 @@ class MeshData:
         self.mesh_node = None
         self.trans_node = None
 
-        if cmds.objExists(mesh) == False:
+        nodes = nodecache.current()
+        if nodes.exists(mesh) == False:
             raise ValueError(f"{mesh} can't be found in scene.")
 
-        if cmds.objectType(mesh) == "transform":
+        mesh_type = nodes.type(mesh)
+        if mesh_type == "transform":
             self.trans_node = mesh
-            relatives = cmds.listRelatives(mesh, s=True)
-            if relatives is None:
+            relatives = nodes.shapes(mesh)
+            if len(relatives) == 0:
                 raise TypeError(f"{mesh} doesn't have a shape node.")
             else:
                 self.mesh_node = relatives[0]
-        elif cmds.objectType(mesh) == "mesh":
+        elif mesh_type == "mesh":
             self.mesh_node = mesh
-            self.trans_node = cmds.listRelatives(mesh, p=True)[0]
+            self.trans_node = nodes.parent(mesh)
         else:
-            raise TypeError(f"{mesh} is of type {cmds.objectType(mesh)}, not 'mesh'")
+            raise TypeError(f"{mesh} is of type {mesh_type}, not 'mesh'")
 
     @property
     def shape(self):
@@ -0,0 +1,204 @@
+"""
+nodecache.py
+Created: Sunday, 18th October 2026 4:37:02 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 4:37:06 pm
+Modified By: Matthew Riche
+"""
+
+# Scene query cache.  Existence, type, long name and shape/transform relationships of nodes are
+# looked up in bulk (one ls(showType=True) for a whole list) and remembered for the rest of an
+# operation, instead of every function asking objExists/objectType about the same nodes again.
+#
+#   with nodecache.scope():
+#       ... everything febex calls in here shares one cache ...
+#
+# Outside a scope, current() hands out a fresh cache per call so nothing is remembered.  Inside
+# Maya the scope listens for nodes being added, removed, renamed or reparented and forgets them.
+
+import contextlib
+
+import maya.cmds as cmds
+
+
+_active = []
+
+
+class NodeCache:
+    def __init__(self):
+        """Node info keyed by the name it was asked for.  febex assumes unique node names, names
+        handed back are short names (last path component)."""
+        self._nodes = {}
+        self._by_short = {}
+        self.queries = 0
+
+    def prefetch(self, names: list):
+        """Resolves every name not known yet with one ls, plus one listRelatives and one ls for the
+        shapes of any transforms among them.
+
+        Args:
+            names (list): Node names or paths.
+        """
+        unknown = [name for name in dict.fromkeys(names) if name and name not in self._nodes]
+        if not unknown:
+            return
+
+        self.queries += 1
+        listing = cmds.ls(unknown, showType=True, long=True) or []
+        by_short = {}
+        for long_name, node_type in zip(listing[::2], listing[1::2]):
+            by_short.setdefault(_short(long_name), []).append((long_name, node_type))
+
+        transforms = []
+        for name in unknown:
+            path = "|" + name.lstrip("|")
+            matches = [
+                (long_name, node_type)
+                for long_name, node_type in by_short.get(_short(name), [])
+                if long_name == name or long_name.endswith(path)
+            ]
+            self._remember(name, matches)
+            if len(matches) == 1 and matches[0][1] == "transform":
+                transforms.append(matches[0][0])
+
+        if transforms:
+            self.queries += 2
+            shape_paths = cmds.listRelatives(transforms, s=True, f=True) or []
+            shape_listing = cmds.ls(shape_paths, showType=True, long=True) or []
+            shape_types = dict(zip(shape_listing[::2], shape_listing[1::2]))
+            shapes = {}
+            for shape_path in shape_paths:
+                shapes.setdefault(shape_path.rsplit("|", 1)[0], []).append(shape_path)
+            for name in unknown:
+                info = self._nodes[name]
+                if info["long"] and info["long"][0] in shapes:
+                    info["shapes"] = [
+                        (path, shape_types.get(path)) for path in shapes[info["long"][0]]
+                    ]
+
+    def _remember(self, name: str, matches: list):
+        self._nodes[name] = {
+            "long": [long_name for long_name, _ in matches],
+            "type": matches[0][1] if matches else None,
+            "shapes": [],
+        }
+        self._by_short.setdefault(_short(name), set()).add(name)
+
+    def _info(self, name: str) -> dict:
+        if name not in self._nodes:
+            self.prefetch([name])
+        return self._nodes[name]
+
+    def exists(self, name: str) -> bool:
+        """Like cmds.objExists()."""
+        return len(self._info(name)["long"]) > 0
+
+    def unique(self, name: str) -> bool:
+        """True if exactly one node goes by this name."""
+        return len(self._info(name)["long"]) == 1
+
+    def type(self, name: str) -> str:
+        """Like cmds.objectType(), None for a node that doesn't exist."""
+        return self._info(name)["type"]
+
+    def types(self, names: list) -> list:
+        """Types of many nodes, resolved together."""
+        self.prefetch(names)
+        return [self._nodes[name]["type"] for name in names]
+
+    def long_name(self, name: str) -> str:
+        """Full DAG path (or the name, for DG nodes), None for a node that doesn't exist."""
+        long_names = self._info(name)["long"]
+        return long_names[0] if long_names else None
+
+    def shapes(self, name: str, shape_type: str = None) -> list:
+        """Short names of a transform's shapes, optionally of one type only."""
+        return [
+            _short(path)
+            for path, node_type in self._info(name)["shapes"]
+            if shape_type is None or node_type == shape_type
+        ]
+
+    def parent(self, name: str) -> str:
+        """Short name of a DAG node's parent, None for world level and DG nodes."""
+        long_name = self.long_name(name)
+        if long_name is None or long_name.count("|") < 2:
+            return None
+        return _short(long_name.rsplit("|", 1)[0])
+
+    def forget(self, name: str = None):
+        """Drops what's known about a node (by any name it was asked for), or everything."""
+        if name is None:
+            self._nodes.clear()
+            self._by_short.clear()
+            return
+        for key in self._by_short.pop(_short(name), ()):
+            self._nodes.pop(key, None)
+        # A transform's entry also holds its shapes.
+        for key, info in list(self._nodes.items()):
+            if any(_short(path) == _short(name) for path, _ in info["shapes"]):
+                self._nodes.pop(key)
+
+
+def _short(path: str) -> str:
+    return path.rsplit("|", 1)[-1]
+
+
+def _watch(cache: NodeCache) -> list:
+    """Registers scene callbacks that keep the cache honest, returns their ids."""
+    try:
+        import maya.api.OpenMaya as om
+    except ImportError:
+        return []
+
+    def forget_node(node, *_):
+        cache.forget(om.MFnDependencyNode(node).name())
+
+    def forget_renamed(node, previous, *_):
+        cache.forget(previous)
+        forget_node(node)
+
+    def forget_dag(message, child, parent, *_):
+        for path in (child, parent):
+            if path.isValid() and path.length():
+                cache.forget(path.partialPathName())
+
+    return [
+        om.MDGMessage.addNodeAddedCallback(forget_node),
+        om.MDGMessage.addNodeRemovedCallback(forget_node),
+        om.MNodeMessage.addNameChangedCallback(om.MObject(), forget_renamed),
+        om.MDagMessage.addAllDagChangesCallback(forget_dag),
+        om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, lambda *_: cache.forget()),
+        om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, lambda *_: cache.forget()),
+    ]
+
+
+def _unwatch(callback_ids: list):
+    if callback_ids:
+        import maya.api.OpenMaya as om
+
+        om.MMessage.removeCallbacks(callback_ids)
+
+
+@contextlib.contextmanager
+def scope():
+    """Shares one NodeCache across everything run inside it.  Nested scopes share the outermost
+    cache.
+    """
+    if _active:
+        yield _active[-1]
+        return
+
+    cache = NodeCache()
+    callback_ids = _watch(cache)
+    _active.append(cache)
+    try:
+        yield cache
+    finally:
+        _active.pop()
+        _unwatch(callback_ids)
+
+
+def current() -> NodeCache:
+    """The cache of the running scope, or a fresh one outside of any scope."""
+    return _active[-1] if _active else NodeCache()
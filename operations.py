@@ -6,74 +6,751 @@ Last Modified: Wednesday, 11th October 2023 8:12:52 pm
 Modified By: Matthew Riche
 """
 
+import json
+
 import maya.cmds as cmds
+import numpy as np
+
+from . import bake
+from . import execution
+from . import fingerprint
+from . import nodecache
+from . import profiling
+from . import reduction
+from . import session
+from . import shard
 from . import skeleton
 from . import skinning
+from . import tasks
+from . import weightcache
+from . import weights
 from .mesh import MeshData
 
 
-def build_export_content(target_geo: MeshData, top_joint: str, new_mesh=True) -> tuple:
+EXPORT_GROUP = "export_group"
+
+
+def build_export_content(
+    target_geo: MeshData, top_joint: str, new_mesh=True, transfer_mode: str = None
+) -> tuple:
     """This will create a group in the scene that will have save components to export as FBX to a
     game engine.
 
     Args:
-        target_geo (MeshData): The skin-cluster mesh (should be just one!)
+        target_geo (MeshData): The skin-cluster mesh (should be just one!  See
+        build_multi_export_content() for more.)
         top_joint (str): Top of the joint hierarchy.
         new_mesh (bool, optional): Whether a mesh should be duplicated or just a skeleton.
         Defaults to True.
+        transfer_mode (str, optional): None to copy weights with cmds.copySkinWeights, or one of
+        transfer.MODES to use febex's own closest-point transfer.  Defaults to None.
 
     Returns:
         tuple: The new and old influences to be used in later operations.
     """
-    mesh = MeshData(target_geo)
-    print(f"Mesh shape node is {mesh.mesh_node}.")
-
-    old_cluster = skinning.find_cluster_node(mesh.mesh_node)
-    print(f'Identified original skinCluster: "{old_cluster}"...')
-    old_influences = skeleton.find_influence_list(old_cluster)
-    new_influences = skeleton.copy_influence_tree(top_joint, old_influences)
-    print(f"Copied new skeleton based on valid influences:\n{new_influences}")
-
-    new_mesh = MeshData(cmds.duplicate(mesh.trans_node, n=f"{mesh.trans_node}_EXP")[0])
-    cmds.parent(new_mesh.trans_node, "export_group")
-    print(f'Created new mesh: "{new_mesh.mesh_node}"...')
-    new_cluster = skinning.bind_skin(new_mesh.mesh_node, new_influences)
-
-    # Now copy skin weights with closest point on surface, closest-bone, closest joint, then name.
-    cmds.copySkinWeights(
-        ss=old_cluster,
-        ds=new_cluster,
-        sa="closestPoint",
-        ia=["closestBone", "closestJoint", "name"],
+    return build_multi_export_content([target_geo], top_joint, transfer_mode=transfer_mode)
+
+
+def build_multi_export_content(
+    target_geos: list,
+    top_joint: str,
+    transfer_mode: str = None,
+    max_influences: int = None,
+    prune_below: float = 0.0,
+    incremental: bool = True,
+    weight_cache: weightcache.WeightCache = None,
+    max_joints: int = None,
+    merge_below: float = 0.0,
+) -> tuple:
+    """Like build_export_content(), for characters made of many skinned meshes.  The skeleton is
+    copied once from the union of every mesh's influences, then each mesh is duplicated, bound to
+    the copies of its own influences and has its weights transferred.
+
+    The inputs are fingerprinted onto the export group along with what the build made, see
+    session.py.  Run again on the same scene, only what changed is redone: new joints are added
+    to the skeleton, meshes whose weights changed are re-transferred and meshes whose geometry or
+    influences changed are rebuilt.  Any other change to the skeleton rebuilds everything.
+
+    Runs under the execution profile of the build stage, see execution.py.
+
+    Args:
+        target_geos (list): The skin-cluster meshes.
+        top_joint (str): Top of the joint hierarchy.
+        transfer_mode (str, optional): None to copy weights with cmds.copySkinWeights, or one of
+        transfer.MODES to use febex's own closest-point transfer.  Defaults to None.
+        max_influences (int, optional): Limit the export meshes to this many influences per
+        vertex (4 or 8 for most engines).  Defaults to no limit.
+        prune_below (float, optional): Drop export weights under this.  Defaults to 0.
+        incremental (bool, optional): Reuse what an earlier build left in the scene.  When False
+        an existing export group is replaced.  Defaults to True.
+        weight_cache (weightcache.WeightCache, optional): Where to look for weights transferred
+        by an earlier build (of any scene) before transferring them, and to keep new ones.
+        Defaults to no cache.
+        max_joints (int, optional): Most joints the export skeleton may have, top joint included.
+        The weakest influences are merged into their nearest kept ancestor until it fits, see
+        reduction.py.  Defaults to no limit.
+        merge_below (float, optional): Also merge influences never weighted this much on any
+        vertex.  Defaults to 0 (none).
+
+    Returns:
+        tuple: The new and old influences to be used in later operations.  Merged influences
+        aren't in either.
+    """
+    return tasks.drain(
+        iter_build_multi_export_content(
+            target_geos,
+            top_joint,
+            transfer_mode,
+            max_influences,
+            prune_below,
+            incremental,
+            weight_cache=weight_cache,
+            max_joints=max_joints,
+            merge_below=merge_below,
+        )
     )
 
+
+def iter_build_multi_export_content(
+    target_geos: list,
+    top_joint: str,
+    transfer_mode: str = None,
+    max_influences: int = None,
+    prune_below: float = 0.0,
+    incremental: bool = True,
+    blocks: dict = None,
+    weight_cache: weightcache.WeightCache = None,
+    max_joints: int = None,
+    merge_below: float = 0.0,
+):
+    """build_multi_export_content() as steps, to run as a tasks.Task.  The skeleton is copied in
+    blocks of joints and closest-point transfers go in blocks of vertices, copySkinWeights is one
+    step per mesh.
+
+    Args:
+        blocks (dict, optional): "joints" and "vertices" per step, like tasks.BLOCKS.  Defaults
+        to doing each stage in a single step.
+
+    Returns:
+        tuple: Like build_multi_export_content().
+    """
+    with nodecache.scope() as nodes, execution.applied(execution.BUILD):
+        nodes.prefetch(list(target_geos) + [top_joint, EXPORT_GROUP])
+        return (
+            yield from _iter_build_multi_export_content(
+                target_geos,
+                top_joint,
+                transfer_mode,
+                max_influences,
+                prune_below,
+                incremental,
+                blocks or {},
+                weight_cache,
+                max_joints,
+                merge_below,
+            )
+        )
+
+
+def _iter_build_multi_export_content(
+    target_geos: list,
+    top_joint: str,
+    transfer_mode: str,
+    max_influences: int,
+    prune_below: float,
+    incremental: bool,
+    blocks: dict,
+    weight_cache: weightcache.WeightCache,
+    max_joints: int,
+    merge_below: float,
+):
+    nodes = nodecache.current()
+    meshes = [MeshData(geo) for geo in target_geos]
+    print(f"Mesh shape nodes are {[mesh.mesh_node for mesh in meshes]}.")
+
+    with profiling.span("cluster lookup"):
+        old_clusters = skinning.find_cluster_nodes([mesh.mesh_node for mesh in meshes])
+    print(f"Identified original skinClusters: {list(old_clusters.values())}...")
+
+    # Union of the influences, in the order they're first seen.
+    with profiling.span("influence query"):
+        mesh_influences = {}
+        old_influences = []
+        seen = set()
+        for mesh in meshes:
+            mesh_influences[mesh.mesh_node] = skeleton.find_influence_list(
+                old_clusters[mesh.mesh_node]
+            )
+            for influence in mesh_influences[mesh.mesh_node]:
+                if influence not in seen:
+                    seen.add(influence)
+                    old_influences.append(influence)
+
+        index = skeleton.HierarchyIndex(top_joint, old_influences)
+
+    plan = None
+    export_name = weights.inf_name
+    if max_joints is not None or merge_below > 0.0:
+        with profiling.span("influence reduction"):
+            plan = reduction.plan_reduction(
+                index,
+                [weights.SkinWeights.read(old_clusters[mesh.mesh_node]) for mesh in meshes],
+                max_joints=max_joints,
+                min_weight=merge_below,
+            )
+            # Merged joints aren't copied, each mesh binds to where their weights went.
+            old_influences = [inf for inf in old_influences if inf not in plan.merges]
+            mesh_influences = {
+                mesh_node: plan.targets(influences)
+                for mesh_node, influences in mesh_influences.items()
+            }
+            index = skeleton.HierarchyIndex(top_joint, old_influences)
+            export_name = plan.export_name
+        print(
+            f"Merged {plan.stats['merged']} influences, export skeleton has "
+            f"{plan.stats['joints_after']} joints (was {plan.stats['joints_before']}), "
+            f"max vertex error {plan.stats['max_vertex_error']:.5f}."
+        )
+
+    with profiling.span("fingerprint"):
+        settings = {
+            "transfer_mode": transfer_mode,
+            "max_influences": max_influences,
+            "prune_below": prune_below,
+        }
+        if plan is not None:
+            # Every mesh's weights decide the merges, they're part of each mesh's settings.
+            settings["merges"] = sorted(plan.merges.items())
+        prints = {
+            "top_joint": top_joint,
+            "skeleton": fingerprint.skeleton_prints(index, list(old_clusters.values())),
+            "meshes": {
+                mesh.trans_node: fingerprint.mesh_prints(
+                    mesh.mesh_node,
+                    old_clusters[mesh.mesh_node],
+                    mesh_influences[mesh.mesh_node],
+                    settings,
+                )
+                for mesh in meshes
+            },
+        }
+
+        previous = session.load(EXPORT_GROUP) if nodes.exists(EXPORT_GROUP) else None
+        stored = None
+        if nodes.exists(EXPORT_GROUP) and incremental:
+            # Scenes built before sessions only have their fingerprints.
+            stored = previous.fingerprints if previous else fingerprint.read(EXPORT_GROUP)
+        skeleton_plan = fingerprint.plan_skeleton(stored, prints)
+    yield ("Reading the scene", 1, 1)
+
+    with profiling.span("tree copy"):
+        if skeleton_plan == fingerprint.REBUILD:
+            if nodes.exists(EXPORT_GROUP):
+                print("Export rig is out of date, rebuilding it.")
+                cmds.delete(EXPORT_GROUP)
+            influence_tree = yield from skeleton.iter_copy_influence_tree(
+                top_joint, old_influences, index=index, block=blocks.get("joints")
+            )
+            mesh_plans = {mesh.trans_node: fingerprint.REBUILD for mesh in meshes}
+        else:
+            influence_tree = yield from skeleton.iter_extend_influence_tree(
+                top_joint, old_influences, index=index, block=blocks.get("joints")
+            )
+            existing = set(cmds.ls([f"{mesh.trans_node}_EXP" for mesh in meshes]) or [])
+            mesh_plans = {
+                mesh.trans_node: (
+                    fingerprint.plan_mesh(stored, prints, mesh.trans_node)
+                    if f"{mesh.trans_node}_EXP" in existing
+                    else fingerprint.REBUILD
+                )
+                for mesh in meshes
+            }
+    new_influences = list(influence_tree.values())
+    print(f"Export skeleton ({skeleton_plan}) has {len(new_influences)} influences.")
+
+    rebuild = [mesh for mesh in meshes if mesh_plans[mesh.trans_node] == fingerprint.REBUILD]
+    reweight = [mesh for mesh in meshes if mesh_plans[mesh.trans_node] == fingerprint.REWEIGHT]
+
+    new_meshes = {}
+    new_clusters = {}
+    with profiling.span("mesh duplicate"):
+        if rebuild and skeleton_plan != fingerprint.REBUILD:
+            stale = cmds.ls([f"{mesh.trans_node}_EXP" for mesh in rebuild])
+            if stale:
+                cmds.delete(stale)
+
+        if rebuild:
+            # Duplicate and group every mesh at once, then name them after their source.
+            duplicates = cmds.duplicate([mesh.trans_node for mesh in rebuild])
+            for mesh, dup in zip(rebuild, duplicates):
+                new_meshes[mesh.trans_node] = MeshData(cmds.rename(dup, f"{mesh.trans_node}_EXP"))
+            tasks.created([new_meshes[mesh.trans_node].trans_node for mesh in rebuild])
+            cmds.parent([new_mesh.trans_node for new_mesh in new_meshes.values()], EXPORT_GROUP)
+            print(f"Created {len(rebuild)} new meshes...")
+        for mesh in reweight:
+            new_meshes[mesh.trans_node] = MeshData(f"{mesh.trans_node}_EXP")
+
+    for mesh_number, mesh in enumerate(rebuild + reweight):
+        new_mesh = new_meshes[mesh.trans_node]
+        with profiling.span("bind"):
+            if mesh in rebuild:
+                # The top joint copy always comes along, same as a single mesh export.
+                bind_list = [influence_tree[top_joint]] + [
+                    influence_tree[inf]
+                    for inf in mesh_influences[mesh.mesh_node]
+                    if inf in influence_tree and inf != top_joint
+                ]
+                new_cluster = skinning.bind_skin(new_mesh.mesh_node, bind_list)
+            else:
+                print(f"Weights of {mesh.trans_node} changed, transferring them again.")
+                new_cluster = skinning.find_cluster_node(new_mesh.mesh_node)
+                if tasks.running():
+                    # The API writes below aren't undoable, so keep the weights to put back.
+                    backend = weights.default_backend()
+                    kept = backend.read_sparse(new_cluster)
+                    tasks.on_rollback(lambda c=new_cluster, w=kept: backend.write_sparse(c, w))
+
+        cached = None
+        if weight_cache is not None:
+            with profiling.span("weight cache"):
+                cache_key = weightcache.cache_key(
+                    prints["meshes"][mesh.trans_node],
+                    weights.default_backend().influences(new_cluster),
+                )
+                cached = weight_cache.get(cache_key)
+                if cached is not None and not weight_cache.validate:
+                    print(f"Weights of {mesh.trans_node} found in the weight cache.")
+                    cached.store(new_cluster)
+                    skinning.lock_max_influences(new_cluster, max_influences)
+
+        if cached is None or weight_cache.validate:
+            with profiling.span("weight transfer"):
+                if transfer_mode is not None:
+                    yield from skinning.iter_closest_point_skinning(
+                        mesh.mesh_node,
+                        [new_mesh.mesh_node],
+                        mode=transfer_mode,
+                        block=blocks.get("vertices"),
+                        name_map=export_name,
+                    )
+                elif plan is not None:
+                    # copySkinWeights can't be told where merged joints go, the duplicate has
+                    # the same topology so the table is copied over by name instead.
+                    skinning.copy_skinning(
+                        mesh.mesh_node, new_mesh.mesh_node, name_map=export_name
+                    )
+                else:
+                    # Now copy skin weights with closest point on surface, closest-bone, closest
+                    # joint, then name.
+                    cmds.copySkinWeights(
+                        ss=old_clusters[mesh.mesh_node],
+                        ds=new_cluster,
+                        sa="closestPoint",
+                        ia=["closestBone", "closestJoint", "name"],
+                    )
+
+                if max_influences is not None or prune_below > 0.0:
+                    skinning.condition_skin(new_mesh.mesh_node, max_influences, prune_below)
+
+            if weight_cache is not None:
+                with profiling.span("weight cache"):
+                    fresh = weights.SkinWeights.read(new_cluster)
+                    if cached is None:
+                        weight_cache.put(cache_key, fresh)
+                    else:
+                        weight_cache.check(cache_key, cached, fresh)
+        new_clusters[mesh.trans_node] = new_cluster
+        yield ("Skinning meshes", mesh_number + 1, len(rebuild) + len(reweight))
+
+    # Meshes that were kept still have the clusters the last build recorded.
+    for mesh in meshes:
+        if mesh.trans_node not in new_clusters:
+            known = previous.clusters.get(mesh.trans_node) if previous else None
+            new_clusters[mesh.trans_node] = (
+                known[1] if known else skinning.find_cluster_node(f"{mesh.trans_node}_EXP")
+            )
+    session.save(
+        session.Session(
+            top_joint,
+            influence_tree,
+            old_influences,
+            new_influences,
+            meshes={mesh.trans_node: f"{mesh.trans_node}_EXP" for mesh in meshes},
+            clusters={
+                mesh.trans_node: [old_clusters[mesh.mesh_node], new_clusters[mesh.trans_node]]
+                for mesh in meshes
+            },
+            fingerprints=prints,
+            merges=plan.merges if plan is not None else {},
+        ),
+        EXPORT_GROUP,
+    )
+    if skeleton_plan == fingerprint.KEEP and not rebuild and not reweight:
+        print("Export rig is up to date, nothing to rebuild.")
+
     return (old_influences, new_influences)
 
 
-def bake_animated_skeleton(old_influences: list, new_influences: list):
-    """Runs a bake simulation on the influences of the exported skeleton.
+def bake_animated_skeleton(
+    old_influences: list,
+    new_influences: list,
+    direct: bool = False,
+    driver: str = skeleton.CONSTRAINT,
+    shards: int = None,
+):
+    """Runs a bake simulation on the influences of the exported skeleton, under the execution
+    profile of the bake stage (see execution.py).  The nodes driving the export skeleton are
+    deleted once it's baked.
 
     Args:
         old_influences (list): Influence list of the original rig.
         new_influences (list): Influence list of the export skeleton.
+        direct (bool, optional): Bake by sampling the source joints' matrices (bake.bake_direct)
+        instead of constraining and simulating the scene.  Defaults to False.
+        driver (str, optional): How the export skeleton follows the rig during the simulation,
+        skeleton.CONSTRAINT or skeleton.MATRIX (matrix nodes, cheaper to evaluate per frame).
+        Defaults to skeleton.CONSTRAINT.
+        shards (int, optional): Bake as direct does, split across this many worker processes
+        opening the saved scene (see shard.py).  Defaults to baking in this process.
+    """
+    if shards:
+        with execution.applied(execution.BAKE), profiling.span("bake"):
+            shard.bake_sharded(old_influences, shards=shards, influence_map=_influence_map())
+        return
+
+    tasks.drain(
+        iter_bake_animated_skeleton(old_influences, new_influences, direct, driver=driver)
+    )
+
+
+def iter_bake_animated_skeleton(
+    old_influences: list,
+    new_influences: list,
+    direct: bool = False,
+    block: int = None,
+    driver: str = skeleton.CONSTRAINT,
+):
+    """bake_animated_skeleton() as steps of a block of frames each, to run as a tasks.Task.  A
+    simulation bake in more than one block gets an euler filter on its rotations afterwards, so
+    the block boundaries don't flip.
+
+    Args:
+        block (int, optional): Frames per step.  Defaults to all of them in one.
     """
-    skeleton.bind_exported_skeleton(old_influences)
+    with execution.applied(execution.BAKE):
+        yield from _iter_bake_animated_skeleton(
+            old_influences, new_influences, direct, block, driver
+        )
+
+
+def _iter_bake_animated_skeleton(
+    old_influences: list, new_influences: list, direct: bool, block: int, driver: str
+):
+    if direct:
+        with profiling.span("bake"):
+            yield from bake.iter_bake_direct(
+                old_influences, block=block, influence_map=_influence_map()
+            )
+        return
+
+    with profiling.span("driver setup"):
+        # bakeResults keys into the connected curves, which mustn't be a take's.
+        bake.maya_detach_takes(new_influences)
+        drivers = skeleton.bind_exported_skeleton(old_influences, _influence_map(), driver)
 
     start_time = cmds.playbackOptions(query=True, minTime=True)
     end_time = cmds.playbackOptions(query=True, maxTime=True)
 
+    with profiling.span("bake"):
+        yield from _iter_bake_simulation(new_influences, [(start_time, end_time)], block)
+    with profiling.span("driver cleanup"):
+        skeleton.unbind_exported_skeleton(drivers)
+
+
+def _influence_map() -> dict:
+    """The old to new joint mapping the last build stored, or None to go by names."""
+    stored = session.load(EXPORT_GROUP)
+    return stored.influence_map if stored else None
+
+
+def _iter_bake_simulation(new_influences: list, spans: list, block: int):
+    """Simulation bake of the driven export skeleton over (first, last) frame spans.  Keys
+    outside the frames being baked are kept, so spans add up.
+    """
     cmds.select(new_influences, r=True)
 
-    cmds.bakeResults(
-        simulation=True,
-        t=(start_time, end_time),
-        sampleBy=1,
-        disableImplicitControl=True,
-        preserveOutsideKeys=True,
-        sparseAnimCurveBake=False,
-        removeBakedAttributeFromLayer=False,
-        bakeOnOverrideLayer=False,
-        minimizeRotation=True,
-        controlPoints=False,
-        shape=True,
+    frame_count = sum(int(end - start) + 1 for start, end in spans)
+    done = 0
+    bakes = 0
+    for start_time, end_time in spans:
+        span_count = int(end_time - start_time) + 1
+        step = block or span_count
+        for first in range(0, span_count, step):
+            last = min(first + step, span_count) - 1
+            cmds.bakeResults(
+                simulation=True,
+                t=(start_time + first, start_time + last),
+                sampleBy=1,
+                disableImplicitControl=True,
+                preserveOutsideKeys=True,
+                sparseAnimCurveBake=False,
+                removeBakedAttributeFromLayer=False,
+                bakeOnOverrideLayer=False,
+                minimizeRotation=True,
+                controlPoints=False,
+                shape=True,
+            )
+            bakes += 1
+            done += last - first + 1
+            yield ("Baking frames", done, frame_count)
+
+    if bakes > 1:
+        pairs = cmds.listConnections(
+            new_influences, source=True, destination=False, type="animCurve", connections=True
+        )
+        pairs = pairs or []
+        rotations = [curve for plug, curve in zip(pairs[::2], pairs[1::2]) if ".rotate" in plug]
+        if rotations:
+            cmds.filterCurve(rotations, filter="euler")
+
+
+TAKES_ATTRIBUTE = "febexTakes"
+
+
+def bake_takes(
+    old_influences: list,
+    new_influences: list,
+    takes: list,
+    direct: bool = False,
+    driver: str = skeleton.CONSTRAINT,
+) -> list:
+    """Bakes several takes (named frame ranges of the one timeline) in a single pass.  The frames
+    of all takes are evaluated once, frames shared by overlapping takes included, and each take
+    gets its own set of curves named by bake.take_curve_name().  The takes are stored on the
+    export group and the first one is left connected to the export skeleton, apply_take()
+    switches to another before exporting it.
+
+    Runs under the execution profile of the bake stage, see execution.py.
+
+    Args:
+        old_influences (list): Influence list of the original rig.
+        new_influences (list): Influence list of the export skeleton.
+        takes (list): (name, start, end) per take, like ("walk", 1, 32).
+        direct (bool, optional): Sample the source joints' matrices (bake.bake_takes) instead of
+        constraining and simulating the scene.  Defaults to False.
+        driver (str, optional): skeleton.CONSTRAINT or skeleton.MATRIX, as for
+        bake_animated_skeleton().  Defaults to skeleton.CONSTRAINT.
+
+    Returns:
+        list: The frames that were evaluated.
+    """
+    return tasks.drain(
+        iter_bake_takes(old_influences, new_influences, takes, direct, driver=driver)
+    )
+
+
+def iter_bake_takes(
+    old_influences: list,
+    new_influences: list,
+    takes: list,
+    direct: bool = False,
+    block: int = None,
+    driver: str = skeleton.CONSTRAINT,
+):
+    """bake_takes() as steps of a block of frames each, to run as a tasks.Task.
+
+    Args:
+        block (int, optional): Frames per step.  Defaults to each run of frames in one.
+    """
+    with execution.applied(execution.BAKE):
+        return (
+            yield from _iter_bake_takes(
+                old_influences, new_influences, takes, direct, block, driver
+            )
+        )
+
+
+def _iter_bake_takes(
+    old_influences: list,
+    new_influences: list,
+    takes: list,
+    direct: bool,
+    block: int,
+    driver: str,
+):
+    bake.check_takes(takes)
+    frames = bake.take_frames(takes)
+    # Takes of an earlier bake are kept (apply_take() can still connect them), the bake mustn't
+    # key into them or delete them below.
+    bake.maya_detach_takes(new_influences)
+
+    if direct:
+        with profiling.span("bake"):
+            yield from bake.iter_bake_takes(
+                old_influences, takes, block=block, influence_map=_influence_map()
+            )
+    else:
+        with profiling.span("driver setup"):
+            drivers = skeleton.bind_exported_skeleton(old_influences, _influence_map(), driver)
+        with profiling.span("bake"):
+            yield from _iter_bake_simulation(new_influences, bake.frame_spans(frames), block)
+            skeleton.unbind_exported_skeleton(drivers)
+            channels = _read_baked_channels(new_influences, frames)
+            yield from bake.iter_write_takes(
+                new_influences, frames, channels, takes, bake.maya_write_take_curves
+            )
+
+    # Whatever is keyed on the export skeleton now belongs to no take.
+    pairs = cmds.listConnections(
+        new_influences, source=True, destination=False, type="animCurve", connections=True
+    )
+    if pairs:
+        cmds.delete(pairs[1::2])
+
+    _write_takes(takes)
+    apply_take(new_influences, takes[0][0])
+    print(f"Baked {len(takes)} takes from {len(frames)} frames.")
+    return frames.tolist()
+
+
+def _read_baked_channels(new_influences: list, frames: np.ndarray) -> dict:
+    """Channels keyed on the export skeleton at frames, as bake.local_trs() gives them."""
+    pairs = cmds.listConnections(
+        new_influences, source=True, destination=False, type="animCurve", connections=True
+    )
+    pairs = pairs or []
+    curves = dict(zip(pairs[::2], pairs[1::2]))
+
+    shape = (len(frames), len(new_influences), 3)
+    channels = {channel: np.empty(shape) for channel in bake.CHANNELS}
+    for j, joint in enumerate(new_influences):
+        for channel in bake.CHANNELS:
+            for axis_index, axis in enumerate("XYZ"):
+                plug = f"{joint}.{channel}{axis}"
+                if plug not in curves:
+                    channels[channel][:, j, axis_index] = cmds.getAttr(plug)
+                    continue
+                times = cmds.keyframe(curves[plug], q=True, timeChange=True)
+                values = cmds.keyframe(curves[plug], q=True, valueChange=True)
+                channels[channel][:, j, axis_index] = np.interp(frames, times, values)
+    return channels
+
+
+def _write_takes(takes: list):
+    if not cmds.objExists(f"{EXPORT_GROUP}.{TAKES_ATTRIBUTE}"):
+        cmds.addAttr(EXPORT_GROUP, ln=TAKES_ATTRIBUTE, dt="string")
+    takes = [[name, float(start), float(end)] for name, start, end in takes]
+    cmds.setAttr(f"{EXPORT_GROUP}.{TAKES_ATTRIBUTE}", json.dumps(takes), type="string")
+
+
+def read_takes() -> list:
+    """The takes of the last bake_takes(), as (name, start, end), or [] if there were none."""
+    if not cmds.objExists(f"{EXPORT_GROUP}.{TAKES_ATTRIBUTE}"):
+        return []
+    try:
+        takes = json.loads(cmds.getAttr(f"{EXPORT_GROUP}.{TAKES_ATTRIBUTE}"))
+    except (TypeError, ValueError):
+        return []
+    return [tuple(take) for take in takes]
+
+
+def apply_take(new_influences: list, take: str):
+    """Connects a take's curves to the export skeleton, so that take is what plays and exports.
+    The curves of the take that was connected before are left in the scene.
+
+    Args:
+        new_influences (list): Influence list of the export skeleton.
+        take (str): Name of a take from the last bake_takes().
+    """
+    if take not in [name for name, _, _ in read_takes()]:
+        raise ValueError(f"There's no take called '{take}', bake it with bake_takes() first.")
+
+    for joint in new_influences:
+        for channel in bake.CHANNELS:
+            for axis in "XYZ":
+                attribute = f"{channel}{axis}"
+                curve = bake.take_curve_name(joint, attribute, take)
+                cmds.connectAttr(f"{curve}.output", f"{joint}.{attribute}", force=True)
+
+
+# Default reduction tolerances per channel kind: scene units, degrees and scale factor.
+KEY_TOLERANCES = {"translate": 0.001, "rotate": 0.01, "scale": 0.0001}
+
+
+def reduce_baked_keys(
+    new_influences: list, tolerances: dict = None, interpolation: str = bake.LINEAR
+) -> dict:
+    """Strips redundant keys off a baked export skeleton.  Constant channels are cut down to one
+    key and keys that the interpolation can rebuild within tolerance are removed.  The values of
+    every curve sharing the same key times are reduced together as one array.
+
+    Args:
+        new_influences (list): Influence list of the export skeleton.
+        tolerances (dict, optional): Largest allowed error per channel kind ("translate",
+        "rotate", "scale").  Defaults to KEY_TOLERANCES.
+        interpolation (str, optional): bake.LINEAR or bake.HERMITE, the remaining keys get linear
+        tangents, or fixed ones with the slopes the reduction assumed, checked against the
+        original keys.  Defaults to bake.LINEAR.
+
+    Returns:
+        dict: Totals of keys before and after, keys removed, constant channels and the largest
+        error introduced.
+    """
+    tolerances = dict(KEY_TOLERANCES, **(tolerances or {}))
+    with execution.applied(execution.BAKE), profiling.span("key reduction"):
+        return _reduce_baked_keys(new_influences, tolerances, interpolation)
+
+
+def _reduce_baked_keys(new_influences: list, tolerances: dict, interpolation: str) -> dict:
+
+    pairs = (
+        cmds.listConnections(
+            new_influences, source=True, destination=False, type="animCurve", connections=True
+        )
+        or []
+    )
+    curves, curve_tolerances = [], []
+    for plug, curve in zip(pairs[::2], pairs[1::2]):
+        attribute = plug.split(".")[-1]
+        kind = next((kind for kind in tolerances if attribute.startswith(kind)), None)
+        if kind is not None:
+            curves.append(curve)
+            curve_tolerances.append(tolerances[kind])
+
+    # Group curves by their key times so each group becomes one (frames, curves) array.
+    groups = {}
+    for curve, tolerance, (times, values) in zip(
+        curves, curve_tolerances, bake.maya_read_keys(curves)
+    ):
+        if len(times) < 3:
+            continue
+        groups.setdefault(tuple(times), []).append((curve, tolerance, values))
+
+    write_keys = bake.default_key_writer()
+    totals = {"keys_before": 0, "keys_after": 0, "keys_removed": 0, "constant_channels": 0}
+    max_error = 0.0
+    for times, group in groups.items():
+        times = np.array(times)
+        values = np.array([values for _, _, values in group]).T
+        group_tolerances = np.array([tolerance for _, tolerance, _ in group])
+        keep, report = bake.reduce_keys(times, values, group_tolerances, interpolation)
+        for key in totals:
+            totals[key] += report[key]
+        max_error = max(max_error, report["max_error"])
+
+        kept, errors = write_keys(
+            [curve for curve, _, _ in group], times, values, keep, group_tolerances, interpolation
+        )
+        # HERMITE keys back the frames the written tangents still miss.
+        added = int(kept.sum() - keep.sum())
+        totals["keys_after"] += added
+        totals["keys_removed"] -= added
+        if interpolation == bake.HERMITE:
+            max_error = max(max_error, float(errors.max()))
+
+    totals["max_error"] = max_error
+    print(
+        f"Removed {totals['keys_removed']} of {totals['keys_before']} keys "
+        f"({totals['constant_channels']} constant channels)."
     )
+    return totals
@@ -0,0 +1,214 @@
+"""
+profiling.py
+Created: Sunday, 18th October 2026 6:02:44 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 6:02:48 pm
+Modified By: Matthew Riche
+"""
+
+# Where the time goes.  Pipeline stages are wrapped in span() blocks, which cost nothing unless a
+# recording is running:
+#
+#   with profiling.record() as run:
+#       operations.build_export_content("body", "root")
+#   run.write("build_report.json")
+#
+# While recording, every maya.cmds call is counted (API calls aren't), each span keeps its wall
+# time and the commands issued inside it, and profile=True adds a cProfile of the whole run.
+
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import time
+
+
+_active = []
+
+
+class Span:
+    def __init__(self, name: str):
+        """One timed stage of a run, with the spans nested inside it."""
+        self.name = name
+        self.seconds = 0.0
+        self.commands = 0
+        self.children = []
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "seconds": round(self.seconds, 6),
+            "commands": self.commands,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class Run:
+    def __init__(self, name: str = "run"):
+        """A recording: a root span, command counts per command and an optional profile."""
+        self.root = Span(name)
+        self.stack = [self.root]
+        self.command_counts = {}
+        self.commands = 0
+        self.profile_text = None
+
+    def count(self, command: str):
+        self.commands += 1
+        self.command_counts[command] = self.command_counts.get(command, 0) + 1
+
+    def to_dict(self) -> dict:
+        report = self.root.to_dict()
+        report["command_counts"] = dict(
+            sorted(self.command_counts.items(), key=lambda item: item[1], reverse=True)
+        )
+        if self.profile_text is not None:
+            report["profile"] = self.profile_text
+        return report
+
+    def write(self, path: str):
+        """Writes the run report as JSON.
+
+        Args:
+            path (str): File to write.
+        """
+        with open(path, "w") as report_file:
+            json.dump(self.to_dict(), report_file, indent=4)
+
+    def summary(self) -> str:
+        """Readable one-line-per-span breakdown."""
+        lines = []
+
+        def walk(span: Span, depth: int):
+            lines.append(
+                f"{'  ' * depth}{span.name}: {span.seconds:.3f}s, {span.commands} commands"
+            )
+            for child in span.children:
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return "\n".join(lines)
+
+
+def _counted(run: Run, name: str, command):
+    def counted(*args, **kwargs):
+        run.count(name)
+        return command(*args, **kwargs)
+
+    counted.__name__ = name
+    counted.__doc__ = command.__doc__
+    return counted
+
+
+@contextlib.contextmanager
+def _counting_commands(run: Run):
+    """Swaps every maya.cmds function for a counting wrapper while the block runs."""
+    import maya.cmds as cmds
+
+    originals = {}
+    for name in dir(cmds):
+        command = getattr(cmds, name)
+        if not name.startswith("_") and callable(command) and not isinstance(command, type):
+            originals[name] = command
+            setattr(cmds, name, _counted(run, name, command))
+    try:
+        yield
+    finally:
+        for name, command in originals.items():
+            setattr(cmds, name, command)
+
+
+@contextlib.contextmanager
+def record(name: str = "run", profile: bool = False, count_commands: bool = True):
+    """Records spans (and commands, and optionally a cProfile) for everything run inside.
+
+    Args:
+        name (str, optional): Name of the root span.  Defaults to "run".
+        profile (bool, optional): Also run cProfile, its top entries go in the report.  Defaults
+        to False.
+        count_commands (bool, optional): Count maya.cmds calls.  Defaults to True.
+
+    Yields:
+        Run: The recording, complete once the block exits.
+    """
+    run = Run(name)
+    profiler = cProfile.Profile() if profile else None
+    _active.append(run)
+    start = time.perf_counter()
+    try:
+        with _counting_commands(run) if count_commands else contextlib.nullcontext():
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield run
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    finally:
+        run.root.seconds = time.perf_counter() - start
+        run.root.commands = run.commands
+        _active.remove(run)
+        if profiler is not None:
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+            run.profile_text = text.getvalue()
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Times a stage of the pipeline.  Does nothing when no recording is running.
+
+    Args:
+        name (str): Stage name, as it should read in the report.
+    """
+    if not _active:
+        yield
+        return
+
+    run = _active[-1]
+    current = Span(name)
+    run.stack[-1].children.append(current)
+    run.stack.append(current)
+    start = time.perf_counter()
+    commands = run.commands
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        current.commands = run.commands - commands
+        run.stack.pop()
+
+
+class Progress:
+    def __init__(self, label: str, total: int, interval: float = 1.0):
+        """Progress printing that shows up at most once per interval, with an ETA, in place of a
+        print per item.
+
+        Args:
+            label (str): What's being worked through.
+            total (int): Number of items.
+            interval (float, optional): Seconds between prints.  Defaults to 1.
+        """
+        self.label = label
+        self.total = max(total, 1)
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def step(self, count: int = 1):
+        """Marks items as done, printing if it's been long enough since the last print."""
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last >= self.interval and self.done < self.total:
+            self._last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            eta = (self.total - self.done) / max(rate, 1e-9)
+            print(
+                f"{self.label}: {100.0 * self.done / self.total:.0f}% "
+                f"({self.done}/{self.total}), about {eta:.0f}s left."
+            )
+
+    def finish(self):
+        """Prints the total time taken."""
+        print(f"{self.label}: done in {time.perf_counter() - self.start:.2f}s.")
@@ -0,0 +1,182 @@
+"""
+reduction.py
+Created: Monday, 19th October 2026 12:21:44 am
+Matthew Riche
+Last Modified: Monday, 19th October 2026 12:21:49 am
+Modified By: Matthew Riche
+"""
+
+# Influence count reduction for bone budgets.  Every influence is scored by the weight it carries
+# over all the source meshes and by its strongest weight on any one vertex.  Joints that carry
+# little (helpers, twist joints...) are merged into their nearest kept ancestor, and more of the
+# weakest go until the export skeleton fits a joint count.  A merged joint isn't exported: its
+# weights move onto the ancestor's column, see Reduction.export_name() as a weights.remap_columns()
+# name map.  The error reported is the weight each vertex had moved to another joint.
+#
+#   plan = reduction.plan_reduction(index, tables, max_joints=60, min_weight=0.05)
+#   print(plan.stats["merged"], plan.stats["max_vertex_error"])
+#
+# Like weights.py, nothing in here needs Maya.
+
+import numpy as np
+
+from .weights import inf_name
+
+
+class Reduction:
+    def __init__(self, top_joint: str, kept: list, merges: dict, stats: dict = None):
+        """Which influences an export skeleton keeps and where the others go.
+
+        Args:
+            top_joint (str): Top of the joint hierarchy, always kept.
+            kept (list): Influences that are exported, parents first.
+            merges (dict): Merged influence to the kept joint (or the top joint) taking its
+            weights.
+            stats (dict, optional): What plan_reduction() measured.
+        """
+        self.top_joint = top_joint
+        self.kept = list(kept)
+        self.merges = dict(merges)
+        self.stats = stats or {}
+
+    def target(self, joint: str) -> str:
+        """The joint carrying a source joint's weights on the export meshes."""
+        return self.merges.get(joint, joint)
+
+    def export_name(self, joint: str) -> str:
+        """Export joint of a source joint, as a name map for weights.remap_columns()."""
+        return inf_name(self.target(joint))
+
+    def targets(self, joints: list) -> list:
+        """target() of each joint, without repeats, in order."""
+        return list(dict.fromkeys(self.target(joint) for joint in joints))
+
+
+def influence_scores(tables: list, influences: list) -> tuple:
+    """Total and largest weight of each influence over several weight tables.
+
+    Args:
+        tables (list): weights.SkinWeights of the source meshes.
+        influences (list): Influences to score, in the order of the results.  Columns of the
+        tables that aren't in here are ignored.
+
+    Returns:
+        tuple: (totals, peaks) arrays, one value per influence.
+    """
+    lookup = {name: i for i, name in enumerate(influences)}
+    totals = np.zeros(len(influences))
+    peaks = np.zeros(len(influences))
+    for table in tables:
+        columns = np.array([lookup.get(name, -1) for name in table.influences] + [-1])
+        scored = columns[table.indices]
+        inside = scored >= 0
+        totals += np.bincount(scored[inside], table.values[inside], minlength=len(influences))
+        np.maximum.at(peaks, scored[inside], table.values[inside])
+    return totals, peaks
+
+
+def plan_reduction(
+    index,
+    tables: list,
+    max_joints: int = None,
+    min_weight: float = 0.0,
+    min_share: float = 0.0,
+    keep: list = None,
+) -> Reduction:
+    """Picks the influences to merge away.  Joints under both thresholds that are given go first,
+    then, while the skeleton is over max_joints, the ones with the smallest largest weight (then
+    the smallest total).
+
+    Args:
+        index (skeleton.HierarchyIndex): The skeleton and the influences of every mesh.
+        tables (list): weights.SkinWeights of the source meshes.
+        max_joints (int, optional): Most joints the export skeleton may have, the top joint
+        included.  Defaults to no limit.
+        min_weight (float, optional): Merge joints never weighted this much on any vertex.
+        Defaults to 0 (no threshold).
+        min_share (float, optional): Merge joints carrying less than this share of all the
+        weight.  Defaults to 0 (no threshold).
+        keep (list, optional): Joints never merged.  Defaults to none.
+
+    Raises:
+        ValueError: If max_joints can't be met, the top joint and the joints to keep stay.
+
+    Returns:
+        Reduction: The plan, its stats hold the error it introduces.
+    """
+    candidates = list(index.kept)
+    totals, peaks = influence_scores(tables, candidates)
+    shares = totals / max(totals.sum(), 1e-12)
+    protected = np.array([joint in set(keep or []) for joint in candidates], dtype=bool)
+
+    below = np.zeros(len(candidates), dtype=bool)
+    if min_weight > 0.0 or min_share > 0.0:
+        below = ~protected
+        if min_weight > 0.0:
+            below &= peaks < min_weight
+        if min_share > 0.0:
+            below &= shares < min_share
+
+    if max_joints is not None:
+        floor = 1 + int(protected.sum())
+        if max_joints < floor:
+            raise ValueError(
+                f"{max_joints} joints is too few, the top joint and {int(protected.sum())} "
+                f"kept joints stay."
+            )
+        excess = 1 + len(candidates) - int(below.sum()) - max_joints
+        if excess > 0:
+            # Weakest first by largest weight, then by total.
+            order = np.lexsort((shares, peaks))
+            order = order[~below[order] & ~protected[order]]
+            below[order[:excess]] = True
+
+    merged = {candidates[i] for i in np.flatnonzero(below)}
+    merges = {}
+    for joint in candidates:
+        if joint in merged:
+            ancestor = index.kept_ancestors[joint]
+            while ancestor in merged:
+                ancestor = index.kept_ancestors[ancestor]
+            merges[joint] = ancestor
+
+    reduction = Reduction(
+        index.top_joint, [joint for joint in candidates if joint not in merged], merges
+    )
+    reduction.stats = _reduction_stats(reduction, tables, candidates, totals, peaks)
+    return reduction
+
+
+def _reduction_stats(
+    reduction: Reduction, tables: list, candidates: list, totals: np.ndarray, peaks: np.ndarray
+) -> dict:
+    """Weight moved per vertex by a reduction, over every table, and what each merge carried."""
+    moved = []
+    for table in tables:
+        merged_columns = np.array(
+            [name in reduction.merges for name in table.influences] + [False], dtype=bool
+        )
+        mask = merged_columns[table.indices]
+        moved.append(
+            np.bincount(table._rows()[mask], table.values[mask], minlength=table.shape[0])
+        )
+    moved = np.concatenate(moved) if moved else np.zeros(0)
+
+    position = {joint: i for i, joint in enumerate(candidates)}
+    return {
+        "joints_before": 1 + len(candidates),
+        "joints_after": 1 + len(reduction.kept),
+        "merged": len(reduction.merges),
+        "vertices": int(moved.size),
+        "vertices_changed": int(np.count_nonzero(moved)),
+        "max_vertex_error": float(moved.max()) if moved.size else 0.0,
+        "mean_vertex_error": float(moved.mean()) if moved.size else 0.0,
+        "joints": {
+            joint: {
+                "into": into,
+                "total": float(totals[position[joint]]),
+                "peak": float(peaks[position[joint]]),
+            }
+            for joint, into in reduction.merges.items()
+        },
+    }
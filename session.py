@@ -0,0 +1,175 @@
+"""
+session.py
+Created: Sunday, 18th October 2026 11:02:19 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 11:02:23 pm
+Modified By: Matthew Riche
+"""
+
+# What a build made, kept with the scene so nothing has to be rebuilt or guessed from names later:
+# the old to new joint mapping, which export mesh came from which source mesh, the skinClusters
+# of both, and the build's fingerprints.  The build stores it on the export group as a JSON string
+# attribute, so it's saved with the scene, and it can be written beside the scene as well:
+#
+#   stored = session.load()                   # None if the scene has no (current) session
+#   old_influences, new_influences = stored.old_influences, stored.new_influences
+#   session.write_sidecar(stored)             # D:/anim/hero.ma -> D:/anim/hero.ma.febex.json
+#
+# Sessions written by another VERSION are ignored, the next build replaces them.
+
+import json
+import os
+
+import maya.cmds as cmds
+
+
+ATTRIBUTE = "febexSession"
+VERSION = 1
+SIDECAR_SUFFIX = ".febex.json"
+
+# Where the build puts the export rig, operations.EXPORT_GROUP.
+NODE = "export_group"
+
+
+class Session:
+    def __init__(
+        self,
+        top_joint: str,
+        influence_map: dict,
+        old_influences: list,
+        new_influences: list,
+        meshes: dict = None,
+        clusters: dict = None,
+        fingerprints: dict = None,
+        merges: dict = None,
+    ):
+        """The results of a build.
+
+        Args:
+            top_joint (str): Top of the source joint hierarchy.
+            influence_map (dict): Source joint to export joint, the top joint included.
+            old_influences (list): Influences of the source meshes, as the build returned them.
+            new_influences (list): Joints of the export skeleton, as the build returned them.
+            meshes (dict, optional): Source mesh transform to its export mesh transform.
+            clusters (dict, optional): Source mesh transform to [source skinCluster, export
+            skinCluster].
+            fingerprints (dict, optional): What the build was made from, see fingerprint.py.
+            merges (dict, optional): Source joints left out of the export skeleton to the joint
+            that took their weights, see reduction.py.
+        """
+        self.top_joint = top_joint
+        self.influence_map = dict(influence_map)
+        self.old_influences = list(old_influences)
+        self.new_influences = list(new_influences)
+        self.meshes = dict(meshes or {})
+        self.clusters = {mesh: list(pair) for mesh, pair in (clusters or {}).items()}
+        self.fingerprints = fingerprints
+        self.merges = dict(merges or {})
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        data = dict(data)
+        data.pop("version", None)
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return dict(vars(self), version=VERSION)
+
+    def export_joint(self, joint: str) -> str:
+        """The export skeleton's copy of a source joint.
+
+        Raises:
+            KeyError: If the joint wasn't copied.
+        """
+        return self.influence_map[joint]
+
+
+def _parse(text: str) -> Session:
+    try:
+        data = json.loads(text or "")
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get("version") != VERSION:
+        return None
+    try:
+        return Session.from_dict(data)
+    except TypeError:
+        return None
+
+
+def load(node: str = NODE) -> Session:
+    """The session stored on a node, or None when there's none or it's from another version.
+
+    Args:
+        node (str, optional): Defaults to the export group.
+
+    Returns:
+        Session: What the last build made.
+    """
+    if not cmds.objExists(f"{node}.{ATTRIBUTE}"):
+        return None
+    return _parse(cmds.getAttr(f"{node}.{ATTRIBUTE}"))
+
+
+def save(session: Session, node: str = NODE):
+    """Stores a session on a node as a string attribute.
+
+    Args:
+        session (Session): What to store.
+        node (str, optional): Defaults to the export group.
+    """
+    if not cmds.objExists(f"{node}.{ATTRIBUTE}"):
+        cmds.addAttr(node, ln=ATTRIBUTE, dt="string")
+    cmds.setAttr(f"{node}.{ATTRIBUTE}", json.dumps(session.to_dict()), type="string")
+
+
+def sidecar_path(scene_path: str = None) -> str:
+    """Path of the sidecar file of a scene.
+
+    Args:
+        scene_path (str, optional): Defaults to the open scene.
+
+    Returns:
+        str: The scene path with SIDECAR_SUFFIX added, None for an unsaved scene.
+    """
+    scene_path = scene_path or cmds.file(query=True, sceneName=True)
+    return f"{scene_path}{SIDECAR_SUFFIX}" if scene_path else None
+
+
+def write_sidecar(session: Session, path: str = None) -> str:
+    """Writes a session to a JSON file.
+
+    Args:
+        session (Session): What to write.
+        path (str, optional): Defaults to sidecar_path().
+
+    Raises:
+        ValueError: If no path is given and the scene was never saved.
+
+    Returns:
+        str: The path written.
+    """
+    path = path or sidecar_path()
+    if path is None:
+        raise ValueError("The scene hasn't been saved, give the session file a path.")
+    with open(path, "w") as sidecar_file:
+        json.dump(session.to_dict(), sidecar_file, indent=4)
+    return path
+
+
+def read_sidecar(path: str = None) -> Session:
+    """Reads a session file, None if it's missing or from another version.
+
+    Args:
+        path (str, optional): Defaults to sidecar_path().
+    """
+    path = path or sidecar_path()
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, "r") as sidecar_file:
+        return _parse(sidecar_file.read())
+
+
+def find(node: str = NODE) -> Session:
+    """The session on the node if there is one, otherwise the scene's sidecar file's."""
+    return load(node) or read_sidecar()
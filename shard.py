@@ -0,0 +1,300 @@
+"""
+shard.py
+Created: Sunday, 18th October 2026 11:41:07 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 11:41:12 pm
+Modified By: Matthew Riche
+"""
+
+# Sharded baking.  A long bake is mostly sampling, one frame after the other, so the frame range is
+# split into contiguous shards and each one is sampled and solved (as in bake.bake_direct()) by its
+# own headless worker opening the same scene.  The workers run through batch.py's process
+# handling, timeouts and retries included, and save their channels as .npz files, which are
+# joined back in frame order and keyed in the open scene in one go:
+#
+#   shard.bake_sharded(old_influences, shards=8)        # the scene must be saved
+#
+# Each worker unwraps rotations within its shard, then every shard is shifted by whole turns to
+# carry on from the last frame of the one before, so the curves come out as one bake makes them.
+# Workers only sample the source joints, their scene doesn't need the export rig.
+#
+# Against the stand-in (standin.py) the workers open a synthetic scene:
+#
+#   runner = batch.SubprocessRunner(sys.executable, "febex.standin", module="shard")
+#   shard.bake_sharded(old_influences, scene="synthetic:joints=50", runner=runner, ...)
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import bake
+from . import batch
+from . import profiling
+
+
+# Below this many frames a shard costs more to start than it saves.
+MIN_FRAMES = 24
+
+
+class Shard:
+    def __init__(
+        self,
+        name: str,
+        scene: str,
+        influences: list,
+        frames: list,
+        layout: dict,
+        output: str,
+        minimize_rotation: bool = True,
+    ):
+        """One run of frames for a worker to bake.
+
+        Args:
+            name (str): Label used in logs.
+            scene (str): Path of the Maya scene to open.
+            influences (list): Source joints to sample.
+            frames (list): Frames to sample, in order.
+            layout (dict): bake.export_layout() without "joints", as JSON friendly lists.
+            output (str): Where to save the channels, an .npz file.
+            minimize_rotation (bool, optional): Unwrap rotations within the shard.  Defaults to
+            True.
+        """
+        self.name = name
+        self.scene = scene
+        self.influences = list(influences)
+        self.frames = list(frames)
+        self.layout = dict(layout)
+        self.output = output
+        self.minimize_rotation = minimize_rotation
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def split_frames(frames: list, shards: int, minimum: int = MIN_FRAMES) -> list:
+    """Splits frames into contiguous runs of near equal length.
+
+    Args:
+        frames (list): Frames, in order.
+        shards (int): Most runs to make.
+        minimum (int, optional): Fewest frames per run, unless there are fewer frames than that
+        altogether.  Defaults to MIN_FRAMES.
+
+    Returns:
+        list: Lists of frames.
+    """
+    frames = [float(frame) for frame in frames]
+    if not frames:
+        return []
+    count = max(1, min(shards, len(frames) // max(minimum, 1)))
+    return [chunk.tolist() for chunk in np.array_split(np.array(frames), count)]
+
+
+def join_channels(parts: list, minimize_rotation: bool = True) -> dict:
+    """Joins the channels of consecutive shards.
+
+    Args:
+        parts (list): Per shard, in frame order, "translate"/"rotate"/"scale" to
+        (frames, joints, 3) arrays.
+        minimize_rotation (bool, optional): Shift each shard's rotations by whole turns, per joint
+        and axis, to carry on from the last frame of the shard before.  Defaults to True.
+
+    Returns:
+        dict: The channels over every frame.
+    """
+    rotations = [parts[0]["rotate"]]
+    for part in parts[1:]:
+        rotate = part["rotate"]
+        if minimize_rotation:
+            rotate = rotate + 360.0 * np.round((rotations[-1][-1] - rotate[0]) / 360.0)
+        rotations.append(rotate)
+
+    return {
+        channel: np.concatenate(rotations)
+        if channel == "rotate"
+        else np.concatenate([part[channel] for part in parts])
+        for channel in parts[0]
+    }
+
+
+def _interpreter() -> str:
+    folder, name = os.path.split(sys.executable)
+    base, extension = os.path.splitext(name)
+    if base.lower() == "maya":
+        # Inside the Maya UI, workers need its headless interpreter.
+        return os.path.join(folder, f"mayapy{extension}")
+    return sys.executable
+
+
+def default_runner() -> batch.SubprocessRunner:
+    """Runs workers on this Maya's mayapy, or outside of Maya on this interpreter with the same
+    stand-in as maya.cmds.
+    """
+    import maya.cmds as cmds
+
+    standin = None if cmds.__name__ == "maya.cmds" else cmds.__name__
+    return batch.SubprocessRunner(_interpreter(), standin, module="shard")
+
+
+def bake_sharded(
+    old_influences: list,
+    frames: list = None,
+    shards: int = None,
+    scene: str = None,
+    runner=None,
+    timeout: float = None,
+    retries: int = 1,
+    writer=bake.maya_write_curves,
+    minimize_rotation: bool = True,
+    influence_map: dict = None,
+) -> tuple:
+    """bake.bake_direct() with the sampling and solving split across worker processes.
+
+    Args:
+        old_influences (list): Influences of the original rig, each with an "_INF" copy.
+        frames (list, optional): Frames to bake.  Defaults to every frame of the playback range.
+        shards (int, optional): Most workers to use, see split_frames().  Defaults to the CPU
+        count.
+        scene (str, optional): Scene the workers open, with the same animation as the open one.
+        Defaults to the open scene's file, save it first.
+        runner (fn, optional): Called as runner(shard, timeout), as for batch.run_batch().
+        Defaults to default_runner().
+        timeout (float, optional): Seconds a shard may take.  Defaults to no limit.
+        retries (int, optional): Extra attempts for a failed shard.  Defaults to 1.
+        writer (fn, optional): As for bake.bake_direct().  Defaults to bake.maya_write_curves().
+        minimize_rotation (bool, optional): Keep rotations continuous over time.  Defaults to True.
+        influence_map (dict, optional): Source joint to export joint, as a session stores it
+        (see session.py).  Joints not in it go by the "_INF" name.  Defaults to going by name.
+
+    Raises:
+        ValueError: If no scene is given and the open one was never saved.
+        RuntimeError: If a shard still fails after its retries.
+
+    Returns:
+        tuple: (frames, channels) as handed to the writer.
+    """
+    import maya.cmds as cmds
+
+    if frames is None:
+        start_time = cmds.playbackOptions(query=True, minTime=True)
+        end_time = cmds.playbackOptions(query=True, maxTime=True)
+        frames = list(np.arange(start_time, end_time + 1.0))
+    scene = scene or cmds.file(query=True, sceneName=True)
+    if not scene:
+        raise ValueError("The scene hasn't been saved, the bake shards need a file to open.")
+
+    layout = bake.export_layout(old_influences, influence_map)
+    new_influences = layout.pop("joints")
+    layout = {key: np.asarray(value).tolist() for key, value in layout.items()}
+
+    with tempfile.TemporaryDirectory() as folder:
+        shard_list = [
+            Shard(
+                f"shard{i}",
+                scene,
+                old_influences,
+                chunk,
+                layout,
+                os.path.join(folder, f"shard{i}.npz"),
+                minimize_rotation,
+            )
+            for i, chunk in enumerate(split_frames(frames, shards or os.cpu_count() or 1))
+        ]
+        with profiling.span("bake shards"):
+            summary = batch.run_batch(
+                shard_list,
+                runner=runner or default_runner(),
+                workers=len(shard_list),
+                timeout=timeout,
+                retries=retries,
+            )
+        failed = [result for result in summary["jobs"] if result["status"] != batch.OK]
+        if failed:
+            raise RuntimeError(
+                "Bake shards failed: "
+                + "; ".join(f'{result["name"]} {result.get("error")}' for result in failed)
+            )
+
+        with profiling.span("bake join"):
+            parts = []
+            for shard in shard_list:
+                with np.load(shard.output) as saved:
+                    parts.append({channel: saved[channel] for channel in bake.CHANNELS})
+            channels = join_channels(parts, minimize_rotation)
+
+    with profiling.span("bake write"):
+        writer(new_influences, frames, channels)
+    print(f"Baked {len(frames)} frames in {len(shard_list)} shards.")
+
+    return frames, channels
+
+
+def run_shard(shard: Shard, sampler=None) -> dict:
+    """Bakes one shard in the current process and saves its channels.
+
+    Args:
+        shard (Shard): What to bake.
+        sampler (fn, optional): As for bake.bake_direct().  Defaults to bake.maya_world_matrices().
+
+    Returns:
+        dict: The frame count and where the channels went.
+    """
+    import maya.cmds as cmds
+
+    cmds.file(shard.scene, open=True, force=True)
+
+    layout = dict(shard.layout)
+    layout["static_parents"] = np.asarray(layout["static_parents"], dtype=np.float64)
+    world = (sampler or bake.maya_world_matrices)(shard.influences, shard.frames)
+    translate, rotate, scale = bake.local_trs(
+        world, minimize_rotation=shard.minimize_rotation, **layout
+    )
+    np.savez(shard.output, translate=translate, rotate=rotate, scale=scale)
+
+    return {"frames": len(shard.frames), "output": shard.output}
+
+
+def worker_main(argv: list = None):
+    """Entry point of a shard worker: reads one shard as JSON from stdin, bakes it and prints a
+    tagged JSON result line, as batch.worker_main() does.
+    """
+    parser = argparse.ArgumentParser(description="febex bake shard worker")
+    parser.add_argument("--worker", action="store_true")
+    parser.add_argument("--standin", help="Import path of a module to use as maya.cmds.")
+    args, _ = parser.parse_known_args(argv)
+
+    sampler = None
+    if args.standin:
+        cmds_module = importlib.import_module(args.standin)
+        batch.install_cmds(cmds_module)
+        # There's no API in a stand-in, it samples its own scene.
+        sampler = getattr(cmds_module, "world_matrices", None)
+    else:
+        import maya.standalone
+
+        maya.standalone.initialize(name="python")
+
+    shard = Shard.from_dict(json.loads(sys.stdin.read()))
+    start = time.perf_counter()
+    try:
+        result = {"status": batch.OK, "details": run_shard(shard, sampler)}
+    except Exception as error:
+        result = {"status": batch.FAILED, "error": f"{type(error).__name__}: {error}"}
+    result["seconds"] = time.perf_counter() - start
+
+    print(batch.RESULT_TAG + json.dumps(result))
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    worker_main()
@@ -9,7 +9,16 @@ Modified By: Matthew Riche
 # Skeleton wrangling.
 
 import maya.cmds as cmds
+import numpy as np
 
+from . import bake
+from . import nodecache
+from . import tasks
+
+
+CONSTRAINT = "constraint"
+MATRIX = "matrix"
+DRIVERS = (CONSTRAINT, MATRIX)
 
 
 def find_influence_list(cluster: str) -> list:
@@ -27,9 +36,10 @@ def find_influence_list(cluster: str) -> list:
         list: List of connected influences.
     """
 
-    if cmds.objExists(cluster) == False:
+    nodes = nodecache.current()
+    if nodes.exists(cluster) == False:
         raise ValueError(f"No cluster node called {cluster} exists in the scene.")
-    elif cmds.objectType(cluster) != "skinCluster":
+    elif nodes.type(cluster) != "skinCluster":
         raise TypeError(f"{cluster} is not of type 'skinCluster'.")
 
     influences = cmds.skinCluster(cluster, query=True, influence=True)
@@ -40,69 +50,338 @@ def find_influence_list(cluster: str) -> list:
     return influences
 
 
-def copy_influence_tree(top_joint: str, inf_list: str) -> list:
-    """Given a list of influences to a skin, rebuilds them as best as possible.  Will try to retain
-    parent structure, provided all influences in use are part of the parent structure.  If any
-    influences are not used in the skin cluster, they are bypassed-- probably at no cost to the
-    animation accuracy.
+class HierarchyIndex:
+    def __init__(self, top_joint: str, inf_list: list):
+        """Everything copy_influence_tree() needs to know about a skeleton, from a single
+        listRelatives query.  Full paths of the descendants give the parent of every joint without
+        asking Maya again.
+
+        Args:
+            top_joint (str): Highest joint of the skeleton.
+            inf_list (list): Joints that matter to the cluster.
+        """
+        self.top_joint = top_joint
+        self.influences = set(inf_list)
+
+        paths = cmds.listRelatives(top_joint, ad=True, type="joint", fullPath=True) or []
+        # listRelatives lists deepest first, so reversed and sorted by depth every parent comes
+        # before its children.
+        paths = sorted(reversed(paths), key=lambda path: path.count("|"))
+
+        self.parents = {}
+        self.joints = []
+        for path in paths:
+            parts = path.split("|")
+            self.parents[parts[-1]] = parts[-2]
+            self.joints.append(parts[-1])
+
+        self.kept = [joint for joint in self.joints if joint in self.influences]
+
+        # Walk up from each kept joint until a kept ancestor (or the top) turns up.  Parents are
+        # resolved before children, so each walk stops at the first already-resolved joint.
+        self.kept_ancestors = {}
+        resolved = {top_joint: top_joint}
+        for joint in self.joints:
+            parent = self.parents[joint]
+            nearest = parent if parent in self.influences else resolved.get(parent, top_joint)
+            resolved[joint] = nearest
+            if joint in self.influences:
+                self.kept_ancestors[joint] = nearest
+
+    @property
+    def pruned(self) -> list:
+        """Joints under the top that are skipped because the cluster doesn't use them."""
+        return [joint for joint in self.joints if joint not in self.influences]
+
+
+def copy_influence_tree(top_joint: str, inf_list: list, index: HierarchyIndex = None) -> dict:
+    """Given a list of influences to a skin, rebuilds them as best as possible.  Parent structure
+    is retained: a joint whose parent isn't an influence goes under its nearest ancestor that is.
+    If any influences are not used in the skin cluster, they are bypassed-- probably at no cost to
+    the animation accuracy.
 
     Args:
         top_joint (str): Highest joint of the skeleton to copy.
-        inf_list (str): List of joints that actually matter to the cluster.
+        inf_list (list): List of joints that actually matter to the cluster.
+        index (HierarchyIndex, optional): Index of the skeleton if the caller already has one.
 
     Returns:
-        list: List of all duplicated influences.  They will be parented in scene, but an unordered
-        list returned.
+        dict: Original joint to duplicated joint, top joint first and every parent before its
+        children.
     """
+    return tasks.drain(iter_copy_influence_tree(top_joint, inf_list, index))
+
+
+def iter_copy_influence_tree(
+    top_joint: str, inf_list: list, index: HierarchyIndex = None, block: int = None
+):
+    """copy_influence_tree() as steps of a block of joints each, see tasks.py.
+
+    Args:
+        top_joint (str): Highest joint of the skeleton to copy.
+        inf_list (list): List of joints that actually matter to the cluster.
+        index (HierarchyIndex, optional): Index of the skeleton if the caller already has one.
+        block (int, optional): Joints per step.  Defaults to all of them in one.
+
+    Returns:
+        dict: Like copy_influence_tree().
+    """
+    if index is None:
+        index = HierarchyIndex(top_joint, inf_list)
+
+    export_group = cmds.createNode("transform", n="export_group")
+    tasks.created([export_group])
 
-    # Copy the topmost joint.
-    dup_top_joint = cmds.duplicate(
-        top_joint, un=False, ic=False, po=True, n=f"{top_joint}_INF"
-    )[0]
-    influence_tree = [dup_top_joint]
-
-    export_group = cmds.createNode('transform', n="export_group")
-
-
-    # Duplicate all influence joints.
-    for source_joint in cmds.listRelatives(top_joint, ad=True, type="joint"):
-        # Check if the source joint is in the list of joints to copy
-        if source_joint in inf_list:
-            # Duplicate the joint
-            dup_joint = cmds.duplicate(
-                source_joint, po=True, n=f"{source_joint}_INF", un=False, ic=False
-            )[0]
-            influence_tree.append(dup_joint)
-
-            cmds.parent(dup_joint, dup_top_joint)
-
-    # Once they are all created, we can parent them based on how they were parented before.
-    for source_joint in cmds.listRelatives(top_joint, ad=True, type="joint"):
-        if source_joint in inf_list:
-            parent = cmds.listRelatives(source_joint, parent=True)[0]
-            # Make sure a parent is actually found, and it's not already the top_joint duplicate.
-            if parent is not None and parent:
-                if (
-                    cmds.listRelatives(f"{source_joint}_INF", parent=True)[0]
-                    != f"{parent}_INF"
-                ):
-                    cmds.parent(f"{source_joint}_INF", f"{parent}_INF")
-
-    cmds.parent(dup_top_joint, export_group)
+    influence_tree = {}
+    grouped = False
+    for progress in _iter_duplicate_joints(index, [top_joint] + index.kept, influence_tree, block):
+        # The top joint is in the first block.
+        if not grouped:
+            cmds.parent(influence_tree[top_joint], export_group)
+            grouped = True
+        yield progress
 
     return influence_tree
 
 
-def bind_exported_skeleton(old_infs: list):
-    """Binds 1:1 the original influences to the new influences with parent constraints set to
-    'no-flip'.
+def extend_influence_tree(top_joint: str, inf_list: list, index: HierarchyIndex = None) -> dict:
+    """Brings an existing export skeleton up to date with an influence list by copying only the
+    influences that don't have an "_INF" joint yet.
+
+    Args:
+        top_joint (str): Highest joint of the skeleton, already copied.
+        inf_list (list): List of joints that actually matter to the cluster.
+        index (HierarchyIndex, optional): Index of the skeleton if the caller already has one.
+
+    Returns:
+        dict: Original joint to duplicated joint, like copy_influence_tree().
+    """
+    return tasks.drain(iter_extend_influence_tree(top_joint, inf_list, index))
+
+
+def iter_extend_influence_tree(
+    top_joint: str, inf_list: list, index: HierarchyIndex = None, block: int = None
+):
+    """extend_influence_tree() as steps of a block of joints each, see tasks.py."""
+    if index is None:
+        index = HierarchyIndex(top_joint, inf_list)
+
+    sources = [top_joint] + index.kept
+    influence_tree = {joint: f"{joint}_INF" for joint in sources}
+    existing = set(cmds.ls(list(influence_tree.values())) or [])
+    added = [joint for joint in index.kept if influence_tree[joint] not in existing]
+    if added:
+        print(f"Adding {len(added)} new influences to the export skeleton: {added}")
+        yield from _iter_duplicate_joints(index, added, influence_tree, block)
+
+    return influence_tree
+
+
+def _iter_duplicate_joints(
+    index: HierarchyIndex, sources: list, influence_tree: dict, block: int = None
+):
+    """Duplicates joints into influence_tree and parents each copy under the copy of its nearest
+    kept ancestor, which must be in influence_tree already or among the sources.  Sources come
+    parents first, so each block only needs parents from itself or earlier blocks.
+    """
+    block = block or max(len(sources), 1)
+    for start in range(0, len(sources), block):
+        chunk = sources[start : start + block]
+
+        # One duplicate call for the lot, then name them after the joint they came from.
+        duplicates = cmds.duplicate(chunk, un=False, ic=False, po=True)
+        for source_joint, dup_joint in zip(chunk, duplicates):
+            influence_tree[source_joint] = cmds.rename(dup_joint, f"{source_joint}_INF")
+        tasks.created([influence_tree[source_joint] for source_joint in chunk])
+
+        # Parenting is grouped so each new parent takes all of its children in one call.
+        children = {}
+        for source_joint in chunk:
+            if source_joint in index.kept_ancestors:
+                children.setdefault(index.kept_ancestors[source_joint], []).append(source_joint)
+
+        for parent, kids in children.items():
+            cmds.parent([influence_tree[kid] for kid in kids], influence_tree[parent])
+
+        yield ("Copying joints", start + len(chunk), len(sources))
+
+
+def bind_exported_skeleton(
+    old_infs: list, influence_map: dict = None, driver: str = CONSTRAINT
+) -> list:
+    """Binds 1:1 the original influences to the new influences, with parent constraints set to
+    'no-flip' or with matrix nodes.  With MATRIX, joints the matrix nodes can't drive exactly
+    (see _matrix_unsafe()) get a constraint for translate and rotate, and only their scale from
+    the matrix nodes.
 
     Args:
         old_infs (list): The list of old influences.
-    """    
+        influence_map (dict, optional): Old joint to new joint, as a session stores it.  Joints
+        not in it go by the "_INF" name.  Defaults to going by name.
+        driver (str, optional): CONSTRAINT or MATRIX.  Defaults to CONSTRAINT.
+
+    Raises:
+        ValueError: If driver isn't one of DRIVERS.
+
+    Returns:
+        list: The nodes doing the driving, for unbind_exported_skeleton().
+    """
+    if driver not in DRIVERS:
+        raise ValueError(f"{driver} isn't a driver, use one of {DRIVERS}.")
 
     print("Binding new export skeleton to old skeleton...")
+    influence_map = influence_map or {}
+    if driver == CONSTRAINT:
+        return _bind_with_constraints(old_infs, influence_map)
+
+    unsafe = _matrix_unsafe(old_infs, influence_map)
+    if unsafe:
+        print(f"Scaling keeps matrix nodes off the rotation of {len(unsafe)} joints: {unsafe}.")
+    nodes = _bind_with_matrices(old_infs, influence_map, scale_only=unsafe)
+    tasks.created(nodes)
+    return nodes + _bind_with_constraints(unsafe, influence_map)
+
+
+def _bind_with_constraints(old_infs: list, influence_map: dict) -> list:
+    constraints = []
     for jnt in old_infs:
-        pconstraint = cmds.parentConstraint(jnt, f"{jnt}_INF", mo=False)[0]
+        pconstraint = cmds.parentConstraint(jnt, influence_map.get(jnt, f"{jnt}_INF"), mo=False)[0]
         # Make this a 'no flip' constraint.
-        cmds.setAttr(f"{pconstraint}.interpType", 0)
\ No newline at end of file
+        cmds.setAttr(f"{pconstraint}.interpType", 0)
+        constraints.append(pconstraint)
+    tasks.created(constraints)
+    return constraints
+
+
+def _matrix_unsafe(old_infs: list, influence_map: dict) -> list:
+    """Joints whose matrix nodes would get the pose wrong.  Decomposing worldMatrix times
+    parentInverseMatrix is only exact when that local matrix has no shear and nothing but the
+    channels sits between the joint and its parent.  That fails for:
+
+    - a non-uniform (or driven) scale under a rotateAxis,
+    - a non-uniform (or driven) scale on a source ancestor the export skeleton skips,
+    - a scaled (or driven) parent, when segmentScaleCompensate puts its inverseScale in between
+      or its scale isn't uniform.
+
+    Args:
+        old_infs (list): Source joints.
+        influence_map (dict): Old joint to new joint.
+
+    Returns:
+        list: The source joints that need a constraint instead.
+    """
+    new_infs = [influence_map.get(jnt, f"{jnt}_INF") for jnt in old_infs]
+    source_of = dict(zip(new_infs, old_infs))
+    cache = nodecache.current()
+    cache.prefetch(old_infs + new_infs)
+
+    # Whose scale matters to each joint: the ancestors the export skeleton skips, and the node
+    # whose scale its export parent gets.
+    skipped, parents = [], []
+    for jnt, new in zip(old_infs, new_infs):
+        parent = cache.parent(new)
+        parents.append(None if parent is None else source_of.get(parent, parent))
+        ancestors = cache.long_name(jnt).split("|")[1:-1]
+        stop = source_of.get(parent)
+        if stop in ancestors:
+            ancestors = ancestors[ancestors.index(stop) + 1 :]
+        skipped.append(ancestors)
+    cache.prefetch([parent for parent in parents if parent])
+
+    read = bake.default_attribute_reader()
+    scaled = list(dict.fromkeys(old_infs + [node for nodes in skipped for node in nodes]))
+    scaled += [parent for parent in dict.fromkeys(parents) if parent and parent not in scaled]
+    values, driven = read(scaled, ["scale"])
+    scale = dict(zip(scaled, values["scale"]))
+    scale_driven = dict(zip(scaled, driven["scale"]))
+    values, _ = read(new_infs, ["rotateAxis", "segmentScaleCompensate"])
+
+    def non_uniform(node: str) -> bool:
+        return scale_driven[node] or np.ptp(scale[node]) > 1e-6
+
+    def not_unit(node: str) -> bool:
+        return scale_driven[node] or np.abs(scale[node] - 1.0).max() > 1e-6
+
+    unsafe = []
+    for i, jnt in enumerate(old_infs):
+        parent = parents[i]
+        compensated = values["segmentScaleCompensate"][i] and cache.type(parent) == "joint"
+        if (
+            (non_uniform(jnt) and np.any(values["rotateAxis"][i]))
+            or any(non_uniform(node) for node in skipped[i])
+            or (parent is not None and not_unit(parent) and (compensated or non_uniform(parent)))
+        ):
+            unsafe.append(jnt)
+    return unsafe
+
+
+def _inverse_rotation(angles: tuple) -> list:
+    """Flat 4x4 matrix undoing an xyz euler rotation, for a setAttr of type "matrix"."""
+    matrix = np.eye(4)
+    matrix[:3, :3] = bake.euler_to_matrix(angles).T
+    return matrix.ravel().tolist()
+
+
+def _bind_with_matrices(old_infs: list, influence_map: dict, scale_only: list = ()) -> list:
+    """Drives each new joint's channels from its source joint's world matrix, taken into the new
+    joint's parent space by a multMatrix and split into channels by a decomposeMatrix.  Joints
+    with a jointOrient or rotateAxis get a second pair that takes them off the rotation.  Every
+    jointOrient and rotateAxis is read in one go.  Joints in scale_only only get their scale.
+    """
+    if not old_infs:
+        return []
+    cmds.loadPlugin("matrixNodes", quiet=True)
+
+    new_infs = [influence_map.get(jnt, f"{jnt}_INF") for jnt in old_infs]
+    values, _ = bake.default_attribute_reader()(new_infs, ["jointOrient", "rotateAxis"])
+
+    nodes = []
+    for jnt, new, orient, axis in zip(
+        old_infs, new_infs, values["jointOrient"], values["rotateAxis"]
+    ):
+        local = cmds.createNode("multMatrix", n=f"{new}_localMatrix")
+        cmds.connectAttr(f"{jnt}.worldMatrix[0]", f"{local}.matrixIn[0]")
+        cmds.connectAttr(f"{new}.parentInverseMatrix[0]", f"{local}.matrixIn[1]")
+        channels = cmds.createNode("decomposeMatrix", n=f"{new}_localChannels")
+        cmds.connectAttr(f"{local}.matrixSum", f"{channels}.inputMatrix")
+        cmds.connectAttr(f"{channels}.outputScale", f"{new}.scale", force=True)
+        nodes += [local, channels]
+        if jnt in scale_only:
+            continue
+        cmds.connectAttr(f"{channels}.outputTranslate", f"{new}.translate", force=True)
+
+        if np.any(orient) or np.any(axis):
+            # local is [scale][rotateAxis][rotate][jointOrient][translate], rotate is what's left
+            # with the two taken off either side.  _matrix_unsafe() keeps non-uniform scale away.
+            rotation = cmds.createNode("multMatrix", n=f"{new}_rotateMatrix")
+            inputs = [f"{local}.matrixSum"]
+            if np.any(axis):
+                inputs.insert(0, _inverse_rotation(axis))
+            if np.any(orient):
+                inputs.append(_inverse_rotation(orient))
+            for i, source in enumerate(inputs):
+                if isinstance(source, str):
+                    cmds.connectAttr(source, f"{rotation}.matrixIn[{i}]")
+                else:
+                    cmds.setAttr(f"{rotation}.matrixIn[{i}]", *source, type="matrix")
+            rotate = cmds.createNode("decomposeMatrix", n=f"{new}_rotateChannels")
+            cmds.connectAttr(f"{rotation}.matrixSum", f"{rotate}.inputMatrix")
+            nodes += [rotation, rotate]
+        else:
+            rotate = channels
+        cmds.connectAttr(f"{new}.rotateOrder", f"{rotate}.inputRotateOrder")
+        cmds.connectAttr(f"{rotate}.outputRotate", f"{new}.rotate", force=True)
+
+    return nodes
+
+
+def unbind_exported_skeleton(drivers: list):
+    """Deletes what bind_exported_skeleton() made, all in one go.  Channels a bake has keyed keep
+    their keys.
+
+    Args:
+        drivers (list): The nodes bind_exported_skeleton() returned.
+    """
+    existing = cmds.ls(drivers) if drivers else []
+    if existing:
+        cmds.delete(existing)
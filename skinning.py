@@ -7,9 +7,110 @@ Modified By: Matthew Riche
 """
 
 import maya.cmds as cmds
+import numpy as np
 
+from . import nodecache
 from . import skeleton
+from . import tasks
+from . import transfer
+from . import weights
 from .mesh import MeshData
+from .weights import SkinWeights
+
+
+class ClusterResolver:
+    def __init__(self):
+        """Finds the skinCluster of meshes and remembers it.  Direct connections are looked up for
+        all meshes at once, anything else gets a typed walk up its history that stops at the first
+        skinCluster.  Inside Maya the cache is dropped whenever a skinCluster is created or deleted
+        or a scene is opened.
+        """
+        self._clusters = {}
+        self._callback_ids = None
+
+    def forget(self, *_):
+        """Drops every cached mesh to skinCluster pairing."""
+        self._clusters.clear()
+
+    def _watch(self):
+        if self._callback_ids is not None:
+            return
+        self._callback_ids = []
+        try:
+            import maya.api.OpenMaya as om
+        except ImportError:
+            return
+        self._callback_ids = [
+            om.MDGMessage.addNodeAddedCallback(self.forget, "skinCluster"),
+            om.MDGMessage.addNodeRemovedCallback(self.forget, "skinCluster"),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self.forget),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self.forget),
+        ]
+
+    def resolve(self, meshes: list) -> dict:
+        """skinCluster of every mesh, None where there isn't one.
+
+        Args:
+            meshes (list): Mesh shape node names.
+
+        Raises:
+            ValueError: If more than one skinCluster connects straight into a mesh.
+
+        Returns:
+            dict: Mesh name to skinCluster name (or None), in the order given.
+        """
+        self._watch()
+        unknown = [mesh for mesh in dict.fromkeys(meshes) if mesh not in self._clusters]
+
+        if unknown:
+            pairs = (
+                cmds.listConnections(
+                    unknown, source=True, destination=False, type="skinCluster", connections=True
+                )
+                or []
+            )
+            connected = {}
+            for plug, cluster in zip(pairs[::2], pairs[1::2]):
+                connected.setdefault(plug.split(".")[0], set()).add(cluster)
+
+            for mesh in unknown:
+                found = connected.get(mesh, connected.get(mesh.split("|")[-1], set()))
+                if len(found) > 1:
+                    raise ValueError(f"There are multiple skinclusters connected to {mesh}")
+                elif len(found) == 1:
+                    self._clusters[mesh] = next(iter(found))
+                else:
+                    # The cluster might not exist, or there are nodes between it and our mesh.
+                    self._clusters[mesh] = _history_cluster(mesh)
+
+        return {mesh: self._clusters[mesh] for mesh in meshes}
+
+
+def _history_cluster(mesh: str) -> str:
+    """First skinCluster upstream of a mesh, or None.  Walks the graph through the API with a
+    skinCluster filter, so nothing else in the deformer stack comes back to python.
+    """
+    try:
+        import maya.api.OpenMaya as om
+    except ImportError:
+        clusters = cmds.ls(cmds.listHistory(mesh, pruneDagObjects=True) or [], type="skinCluster")
+        return clusters[0] if clusters else None
+
+    sel = om.MSelectionList()
+    sel.add(mesh)
+    history = om.MItDependencyGraph(
+        sel.getDependNode(0),
+        om.MFn.kSkinClusterFilter,
+        om.MItDependencyGraph.kUpstream,
+        om.MItDependencyGraph.kDepthFirst,
+        om.MItDependencyGraph.kNodeLevel,
+    )
+    if history.isDone():
+        return None
+    return om.MFnDependencyNode(history.currentNode()).name()
+
+
+_resolver = ClusterResolver()
 
 
 def find_cluster_node(node: str) -> str:
@@ -27,43 +128,40 @@ def find_cluster_node(node: str) -> str:
     Returns:
         str: Name of the skinCluster node.
     """
+    return find_cluster_nodes([node])[node]
 
-    # Guard against the wrong node name or type.
-    if cmds.objExists(node) == False:
-        raise ValueError(f"{node} is not in the scene or is not unique.")
-    elif cmds.objectType(node) != "mesh":
-        raise TypeError(f"{node} was not a mesh.")
 
-    # Find the connections of the skinCluster type.
-    clusters = cmds.listConnections(
-        node, source=True, destination=False, type="skinCluster"
-    )
+def find_cluster_nodes(nodes: list) -> dict:
+    """Finds the skin cluster nodes of many meshes at once, see find_cluster_node().  Results are
+    cached until a skinCluster is added to or removed from the scene.
+
+    Args:
+        nodes (list): Names of nodes of type 'mesh' in the scene.
+
+    Raises:
+        ValueError: A given node name can't find a node.
+        TypeError: A given node name isn't a mesh.
+        AttributeError: A given mesh doesn't have a skin cluster attached.
+        ValueError: There are more than one incoming skin cluster node attached to a mesh.
+
+    Returns:
+        dict: Mesh node name to skinCluster node name, in the order given.
+    """
+    # Guard against the wrong node names or types.
+    scene_nodes = nodecache.current()
+    scene_nodes.prefetch(nodes)
+    for node in nodes:
+        if scene_nodes.exists(node) == False:
+            raise ValueError(f"{node} is not in the scene or is not unique.")
+        elif scene_nodes.type(node) != "mesh":
+            raise TypeError(f"{node} was not a mesh.")
 
-    print(f"Clusters found are: {clusters}")
-    # Guard against no clusters or not enough clusters being found.
-    if clusters is None:
-        # The cluster might not exist, or there are nodes between it and out mesh.  Falling back to
-        # the slower type of check:
-        # List all nodes in the history of the mesh
-        history_nodes = cmds.listHistory(node)
-
-        # Initialize a variable to store the skin cluster node name
-        skin_cluster_node = None
-
-        # Loop through the history nodes and find the skin cluster
-        for node in history_nodes:
-            node_type = cmds.nodeType(node)
-            if node_type == "skinCluster":
-                skin_cluster_node = node
-                break
-        if skin_cluster_node is None:
+    clusters = _resolver.resolve(nodes)
+    for node, cluster in clusters.items():
+        if cluster is None:
             raise AttributeError(f"There are no skinclusters attached to {node}")
-        else:
-            clusters = [skin_cluster_node]
-    elif len(clusters) != 1:
-        raise ValueError(f"There are multiple skinclusters connected to {node}")
 
-    return clusters[0]
+    return clusters
 
 
 def bind_skin(mesh: str, inf_list: list):
@@ -81,48 +179,174 @@ def bind_skin(mesh: str, inf_list: list):
     """
 
     # Guard against the mesh node not being found or being the right type.
-    if cmds.objExists(mesh) == False:
+    nodes = nodecache.current()
+    nodes.prefetch([mesh] + list(inf_list))
+    if nodes.exists(mesh) == False:
         raise ValueError(f"{mesh} doesn't exist or is not unique.")
-    if cmds.listRelatives(mesh, s=True) is None:
-        mesh_shape = mesh
-    if cmds.objectType(mesh_shape) != "mesh":
+    mesh_shape = mesh
+    if nodes.type(mesh) == "transform" and len(nodes.shapes(mesh)) > 0:
+        mesh_shape = nodes.shapes(mesh)[0]
+    if nodes.type(mesh_shape) != "mesh":
         raise TypeError(f"{mesh_shape} isn't a mesh node.  Can't bind a skin to it.")
 
     # Guard against inf list being empty or containing non-joints.
     if len(inf_list) == 0:
         raise ValueError(f"Influence list doesn't contain anything to bind.")
-    for joint in inf_list:
-        if cmds.objectType(joint) != "joint":
+    for joint, joint_type in zip(inf_list, nodes.types(inf_list)):
+        if joint_type != "joint":
             raise TypeError(f"{joint} is in the influences list and it's not a joint.")
 
     # Clear the selection and then select the influences.
     cmds.select(cl=True)
 
-    return cmds.skinCluster(mesh_shape, inf_list, bm=0)[0]
+    cluster = cmds.skinCluster(mesh_shape, inf_list, bm=0)[0]
+    tasks.created([cluster])
+    return cluster
+
+
+def copy_skinning(
+    old_mesh: str,
+    new_mesh: str,
+    backend: weights.WeightBackend = None,
+    name_map=weights.inf_name,
+) -> SkinWeights:
+    """Copies skin weights between a mesh and its export duplicate, moving every influence's
+    weight onto its "_INF" counterpart.  The whole weight table is read once, remapped by column
+    and written back once.
 
+    Args:
+        old_mesh (str): Mesh shape node with the original skinCluster.
+        new_mesh (str): Mesh shape node of the duplicate, bound to the "_INF" influences.
+        backend (weights.WeightBackend, optional): Where the weight tables live.  Defaults to
+        weights.default_backend().
+        name_map (fn, optional): Source influence to export influence, see
+        reduction.Reduction.export_name().  Defaults to weights.inf_name().
 
-def copy_skinning(old_mesh: str, new_mesh: str):
+    Returns:
+        SkinWeights: The weights written to the duplicate.
+    """
     print(f"Copying {old_mesh} skin influence to {new_mesh} skin influence.")
 
     old_cluster = find_cluster_node(old_mesh)
     new_cluster = find_cluster_node(new_mesh)
 
-    verts = cmds.ls(f"{old_mesh}.vtx[*]", flatten=True)
+    return weights.transfer_weights(old_cluster, new_cluster, backend=backend, name_map=name_map)
+
+
+def closest_point_skinning(
+    old_mesh: str,
+    new_meshes: list,
+    mode: str = transfer.BARYCENTRIC,
+    k: int = 4,
+    backend: weights.WeightBackend = None,
+    name_map=weights.inf_name,
+) -> dict:
+    """Transfers skin weights from a mesh onto meshes of any topology by closest point, in place
+    of cmds.copySkinWeights(sa="closestPoint").  The source mesh is indexed once and reused for
+    every destination.  Influences are paired by the "_INF" naming convention.
+
+    Args:
+        old_mesh (str): Mesh shape node with the original skinCluster.
+        new_meshes (list): Mesh shape nodes already bound to the "_INF" influences.
+        mode (str, optional): One of transfer.MODES.  Defaults to transfer.BARYCENTRIC.
+        k (int, optional): Vertex count when mode is transfer.K_NEAREST.  Defaults to 4.
+        backend (weights.WeightBackend, optional): Defaults to weights.default_backend().
+        name_map (fn, optional): Source influence to destination influence.  Defaults to
+        weights.inf_name().
+
+    Returns:
+        dict: The new skinCluster of each destination mesh.
+    """
+    return tasks.drain(
+        iter_closest_point_skinning(old_mesh, new_meshes, mode, k, backend, name_map=name_map)
+    )
+
+
+def iter_closest_point_skinning(
+    old_mesh: str,
+    new_meshes: list,
+    mode: str = transfer.BARYCENTRIC,
+    k: int = 4,
+    backend: weights.WeightBackend = None,
+    block: int = None,
+    name_map=weights.inf_name,
+):
+    """closest_point_skinning() as steps of a block of destination vertices each, see tasks.py.
+    Each destination is still written in one go once all of its blocks are done.
+
+    Args:
+        block (int, optional): Destination vertices per step.  Defaults to all of them in one.
+    """
+    if backend is None:
+        backend = weights.default_backend()
+
+    old_cluster = find_cluster_node(old_mesh)
+    src_weights = backend.read_sparse(old_cluster)
+    index = transfer.SurfaceIndex(*backend.geometry(old_mesh))
+    print(f"Indexed {len(index.points)} points of {old_mesh} for weight transfer.")
+
+    new_clusters = {}
+    for new_mesh in new_meshes:
+        new_cluster = find_cluster_node(new_mesh)
+        dst_infs = backend.influences(new_cluster)
+        remapped = src_weights.remap(dst_infs, name_map)
+
+        dst_points, _ = backend.geometry(new_mesh)
+        step = block or max(len(dst_points), 1)
+        blocks = []
+        for start in range(0, len(dst_points), step):
+            queries = dst_points[start : start + step]
+            ids, factors = index.factors(queries, mode=mode, k=k)
+            blocks.append(remapped.blend(ids, factors).normalized())
+            yield (f"Transferring weights to {new_mesh}", start + len(queries), len(dst_points))
+
+        backend.write_sparse(new_cluster, weights.SkinWeights.stack(blocks, dst_infs))
+        new_clusters[new_mesh] = new_cluster
+
+    return new_clusters
+
+
+def condition_skin(
+    mesh: str,
+    max_influences: int = None,
+    prune_below: float = 0.0,
+    backend: weights.WeightBackend = None,
+) -> dict:
+    """Limits and prunes the weights of a skinned mesh in one read and one write, and locks the
+    skinCluster to the same influence limit so later edits respect it.
+
+    Args:
+        mesh (str): Mesh shape node with a skinCluster.
+        max_influences (int, optional): Most influences a vertex may have.  Defaults to no limit.
+        prune_below (float, optional): Weights under this are removed.  Defaults to 0.
+        backend (weights.WeightBackend, optional): Defaults to weights.default_backend().
+
+    Returns:
+        dict: Stats from weights.condition_sparse().
+    """
+    if backend is None:
+        backend = weights.default_backend()
+
+    cluster = find_cluster_node(mesh)
+    skin_weights = backend.read_sparse(cluster)
+    conditioned, stats = weights.condition_sparse(skin_weights, max_influences, prune_below)
+    backend.write_sparse(cluster, conditioned)
+    lock_max_influences(cluster, max_influences)
+
     print(
-        f"Copying skin weights from {old_mesh} to {new_mesh}, this may take some time..."
+        f"Conditioned {mesh}: influences per vertex {stats['histogram_before']} -> "
+        f"{stats['histogram_after']}, max error {stats['max_error']:.5f}."
     )
-    inf_data = cmds.skinCluster(old_cluster, q=True, inf=True)
-    total_verts = len(verts)
-    current_vert = 0
-    for vert in verts:
-        print(f"{current_vert / total_verts}% complete.")
-        dest_vert = vert.replace(".vtx", "_EXP.vtx")
-
-        vertex_data = cmds.skinPercent(old_cluster, vert, q=True, value=True)
-
-        for joint, weight in zip(inf_data, vertex_data):
-            dest_joint = joint + "_INF"
-            cmds.skinPercent(
-                new_cluster, dest_vert, transformValue=(dest_joint, weight)
-            )
-        current_vert += 1
+    return stats
+
+
+def lock_max_influences(cluster: str, max_influences: int = None):
+    """Makes a skinCluster keep to an influence limit from now on.  Nothing happens without one.
+
+    Args:
+        cluster (str): The skinCluster.
+        max_influences (int, optional): Most influences a vertex may have.  Defaults to no limit.
+    """
+    if max_influences is not None:
+        cmds.setAttr(f"{cluster}.maxInfluences", max_influences)
+        cmds.setAttr(f"{cluster}.maintainMaxInfluences", True)
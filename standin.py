@@ -0,0 +1,1317 @@
+"""
+standin.py
+Created: Sunday, 18th October 2026 7:15:21 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 7:15:25 pm
+Modified By: Matthew Riche
+"""
+
+# An in-memory stand-in for the parts of maya.cmds febex uses, so the pipeline can be run and
+# measured where there is no Maya.  It models transforms, joints (with jointOrient, rotateAxis and
+# rotate order), meshes, skinClusters, parentConstraints and animCurves, and nothing else.  Node
+# names are unique, as febex assumes.
+#
+#   from febex import batch, standin
+#   batch.install_cmds(standin)
+#   cmds.file("synthetic:joints=250,verts=60000", open=True, force=True)
+#
+# Opening a "synthetic:" path builds a generated rig (see Scene.build_rig), any other path is an
+# error.  Source joints of a synthetic rig swing on a sine per joint so there's something to bake.
+# The commands here only ever call into the scene, never into each other, so profiling counts
+# each of them once.
+
+import copy
+
+import numpy as np
+
+from . import bake
+from . import weights
+
+
+DAG_TYPES = ("transform", "joint", "mesh", "parentConstraint")
+VECTORS = ("translate", "rotate", "scale", "jointOrient", "rotateAxis")
+
+
+class Node:
+    def __init__(self, name: str, node_type: str, parent: str = None):
+        """One node of the stand-in scene.  Transform channels live in attrs as 3-tuples."""
+        self.name = name
+        self.type = node_type
+        self.parent = parent
+        self.children = []
+        self.attrs = {}
+        if node_type in ("transform", "joint"):
+            self.attrs.update(
+                translate=(0.0, 0.0, 0.0),
+                rotate=(0.0, 0.0, 0.0),
+                scale=(1.0, 1.0, 1.0),
+                jointOrient=(0.0, 0.0, 0.0),
+                rotateAxis=(0.0, 0.0, 0.0),
+                rotateOrder=0,
+            )
+        # (amplitude (3,), phase, period) added to rotate over time, for source joints.
+        self.motion = None
+        # mesh: points, triangles.  skinCluster: mesh, influences, weights.
+        # parentConstraint: driver.  animCurve: node, attribute (both None when unconnected),
+        # times, values, tangent.
+        self.data = {}
+
+
+class Scene:
+    def __init__(self):
+        """Every node of the stand-in scene by name, plus time, selection and playback range."""
+        self.nodes = {}
+        self.time = 1.0
+        self.playback = [1.0, 120.0]
+        self.selection = []
+        self.curves = {}
+        self.path = None
+        self.written = []
+        # Undo only steps back over whole undo chunks, each kept as a snapshot of the scene.
+        self.undo_depth = 0
+        self.undo_snapshots = []
+        self.undo_names = []
+        self._chunk_snapshot = None
+        self._chunk_name = ""
+        # What an undo queue holds, for measuring it.  Nothing is undone from it.
+        self.undo_enabled = True
+        self.undo_queue = []
+        self.undo_bytes = 0
+        # Scene settings execution profiles change.  Only refresh costs anything here.
+        self.refresh_suspended = False
+        self.evaluation = "parallel"
+        self.cached_playback = True
+        self.auto_key = False
+        self.redraws = 0
+
+    def journal(self, names: list):
+        """Copies nodes onto the undo queue, as Maya keeps what each command changed."""
+        if not self.undo_enabled:
+            return
+        entry = [copy.deepcopy(self.nodes[name]) for name in names if name in self.nodes]
+        self.undo_queue.append(entry)
+        for node in entry:
+            arrays = [value for value in node.data.values() if isinstance(value, np.ndarray)]
+            self.undo_bytes += 256 + sum(array.nbytes for array in arrays)
+
+    def redraw(self):
+        """What a viewport refresh costs: every skinned mesh deformed at the current time."""
+        self.redraws += 1
+        for cluster in [node for node in self.nodes.values() if node.type == "skinCluster"]:
+            data = cluster.data
+            matrices = self.world_matrices(data["influences"], [self.time])[0]
+            matrices = data["bind_inverse"] @ matrices
+            blended = data["weights"].astype(np.float32) @ matrices[:, :, :3].reshape(-1, 12)
+            points = self.nodes[data["mesh"]].data["points"]
+            np.einsum("vi,vij->vj", points, blended.reshape(-1, 4, 3)[:, :3]) + blended[:, 9:]
+
+    def deformed_points(self, mesh: str, frames: list) -> np.ndarray:
+        """(frames, vertices, 3) points of a mesh as its skinCluster deforms them, the stand-in
+        for verify.maya_deformed_points()."""
+        shape = self.shape_of(mesh)
+        points = shape.data["points"]
+        cluster = self.cluster_of(shape.name)
+        if cluster is None:
+            return np.broadcast_to(points, (len(frames),) + points.shape).copy()
+
+        data = cluster.data
+        matrices = data["bind_inverse"] @ self.world_matrices(data["influences"], frames)
+        blended = data["weights"] @ matrices[..., :3].reshape(len(frames), -1, 12)
+        blended = blended.reshape(len(frames), -1, 4, 3)
+        return np.einsum("vk,fvkl->fvl", points, blended[:, :, :3]) + blended[:, :, 3]
+
+    def bind_inverse(self, influences: list) -> np.ndarray:
+        return np.linalg.inv(self.world_matrices(influences, [self.time])[0])
+
+    def snapshot(self) -> dict:
+        state = ("nodes", "curves", "selection", "time", "playback")
+        return copy.deepcopy({key: getattr(self, key) for key in state})
+
+    def restore(self, snapshot: dict):
+        for key, value in snapshot.items():
+            setattr(self, key, value)
+
+    # Nodes ---------------------------------------------------------------------------------------
+
+    def unique_name(self, name: str) -> str:
+        if name not in self.nodes:
+            return name
+        base = name.rstrip("0123456789")
+        number = 1
+        while f"{base}{number}" in self.nodes:
+            number += 1
+        return f"{base}{number}"
+
+    def add(self, name: str, node_type: str, parent: str = None) -> Node:
+        node = Node(self.unique_name(name), node_type, parent)
+        self.nodes[node.name] = node
+        if parent is not None:
+            self.nodes[parent].children.append(node.name)
+        return node
+
+    def get(self, name: str) -> Node:
+        node = self.nodes.get(name.rsplit("|", 1)[-1])
+        if node is None:
+            raise ValueError(f"No object matches name: {name}")
+        return node
+
+    def find(self, name: str) -> Node:
+        return self.nodes.get(name.rsplit("|", 1)[-1])
+
+    def long_name(self, name: str) -> str:
+        node = self.get(name)
+        if node.type not in DAG_TYPES:
+            return node.name
+        path = [node.name]
+        while node.parent is not None:
+            node = self.nodes[node.parent]
+            path.append(node.name)
+        return "|" + "|".join(reversed(path))
+
+    def descendants(self, name: str) -> list:
+        """Every node below a DAG node, parents before children."""
+        found = []
+        stack = list(reversed(self.nodes[name].children))
+        while stack:
+            child = stack.pop()
+            found.append(child)
+            stack.extend(reversed(self.nodes[child].children))
+        return found
+
+    def reparent(self, name: str, parent: str):
+        """Moves a node under another, keeping its world transform like cmds.parent() does."""
+        node = self.nodes[name]
+        world = self.world_matrices([name], [self.time])[0, 0]
+        parent_world = self.world_matrices([parent], [self.time])[0, 0] if parent else np.eye(4)
+        if node.parent is not None:
+            self.nodes[node.parent].children.remove(name)
+        node.parent = parent
+        if parent is not None:
+            self.nodes[parent].children.append(name)
+
+        if node.type in ("transform", "joint"):
+            local = world @ np.linalg.inv(parent_world)
+            scale = np.linalg.norm(local[:3, :3], axis=1)
+            basis = local[:3, :3] / scale[:, None]
+            node.attrs.update(translate=tuple(local[3, :3]), scale=tuple(scale))
+            node.attrs.update(rotateAxis=(0.0, 0.0, 0.0))
+            if node.type == "joint":
+                # Joints take the change on their orient.
+                orient = bake.matrix_to_euler(basis, "xyz")
+                node.attrs.update(rotate=(0.0, 0.0, 0.0), jointOrient=tuple(orient))
+            else:
+                order = bake.ROTATE_ORDERS[node.attrs["rotateOrder"]]
+                rotate = bake.matrix_to_euler(basis, order)
+                node.attrs.update(rotate=tuple(rotate), jointOrient=(0.0, 0.0, 0.0))
+
+    def delete(self, name: str):
+        if name not in self.nodes:
+            return
+        if self.nodes[name].type.startswith("animCurve"):
+            # Nothing hangs off a curve, no need to look through the scene.
+            curve = self.nodes.pop(name)
+            self.curves.pop((curve.data["node"], curve.data["attribute"]), None)
+            return
+        doomed = set([name] + self.descendants(name))
+        for other in list(self.nodes.values()):
+            if other.type == "skinCluster" and other.data["mesh"] in doomed:
+                doomed.add(other.name)
+            elif other.type == "parentConstraint" and other.data["driver"] in doomed:
+                doomed.add(other.name)
+            elif other.type.startswith("animCurve") and other.data["node"] in doomed:
+                doomed.add(other.name)
+        for other in self.nodes.values():
+            inputs = other.data.get("inputs") if other.name not in doomed else None
+            for element, plug in list((inputs or {}).items()):
+                if isinstance(plug, str) and plug.partition(".")[0] in doomed:
+                    del inputs[element]
+        for doomed_name in doomed:
+            node = self.nodes.pop(doomed_name)
+            if node.parent in self.nodes and doomed_name in self.nodes[node.parent].children:
+                self.nodes[node.parent].children.remove(doomed_name)
+            if node.type.startswith("animCurve"):
+                self.curves.pop((node.data["node"], node.data["attribute"]), None)
+
+    def duplicate(self, name: str, parent_only: bool) -> str:
+        source = self.nodes[name]
+        copy = self.add(name, source.type, source.parent)
+        copy.attrs = dict(source.attrs)
+        if source.type in ("transform", "joint"):
+            # Incoming connections aren't copied, the channels keep their current values.
+            t, r, _ = self._channels([name], np.array([self.time]))
+            copy.attrs.update(translate=tuple(t[0, 0]), rotate=tuple(r[0, 0]))
+        if source.type == "mesh":
+            copy.data = {key: value.copy() for key, value in source.data.items()}
+        if not parent_only:
+            for child in list(source.children):
+                if self.nodes[child].type in ("transform", "joint", "mesh"):
+                    self.reparent_copy(self.duplicate(child, False), copy.name)
+        return copy.name
+
+    def reparent_copy(self, name: str, parent: str):
+        node = self.nodes[name]
+        if node.parent is not None:
+            self.nodes[node.parent].children.remove(name)
+        node.parent = parent
+        self.nodes[parent].children.append(name)
+
+    def shape_of(self, name: str) -> Node:
+        node = self.get(name)
+        if node.type == "transform":
+            shapes = [self.nodes[child] for child in node.children]
+            shapes = [shape for shape in shapes if shape.type == "mesh"]
+            if shapes:
+                return shapes[0]
+        return node
+
+    def cluster_of(self, mesh: str) -> Node:
+        for node in self.nodes.values():
+            if node.type == "skinCluster" and node.data["mesh"] == mesh:
+                return node
+        return None
+
+    def constraint_of(self, name: str) -> Node:
+        for child in self.nodes[name].children:
+            if self.nodes[child].type == "parentConstraint":
+                return self.nodes[child]
+        return None
+
+    def _keyed(self, name: str) -> bool:
+        return any(
+            (name, f"{channel}{axis}") in self.curves
+            for channel in ("translate", "rotate", "scale")
+            for axis in "XYZ"
+        )
+
+    def driving_constraint(self, name: str, live: bool = False) -> Node:
+        """The constraint moving a node, unless a bake has keyed its channels since and it isn't
+        live."""
+        return self.constraint_of(name) if live or not self._keyed(name) else None
+
+    # Animation -----------------------------------------------------------------------------------
+
+    def set_curve(
+        self, name: str, attribute: str, times, values, curve_type: str, keep_outside: bool = False
+    ):
+        """Replaces the keys of one attribute, or with keep_outside only those within the new
+        keys' time range."""
+        key = (name, attribute)
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if key in self.curves:
+            old = self.nodes[self.curves[key]].data
+            if keep_outside:
+                outside = (old["times"] < times.min()) | (old["times"] > times.max())
+                order = np.argsort(np.concatenate([old["times"][outside], times]), kind="stable")
+                times = np.concatenate([old["times"][outside], times])[order]
+                values = np.concatenate([old["values"][outside], values])[order]
+            self.delete(self.curves[key])
+        curve = self.add(f"{name}_{attribute}", curve_type)
+        curve.data = {
+            "node": name,
+            "attribute": attribute,
+            "times": np.asarray(times, dtype=np.float64),
+            "values": np.asarray(values, dtype=np.float64),
+            "tangent": "auto",
+        }
+        self.curves[key] = curve.name
+
+    def write_curves(self, joints: list, frames: list, channels: dict, keep_outside=False):
+        """Stand-in for bake.maya_write_curves(), one curve per channel and axis."""
+        for j, joint in enumerate(joints):
+            for channel, values in channels.items():
+                for axis_index, axis in enumerate("XYZ"):
+                    self.detach_take(joint, f"{channel}{axis}")
+                    self.set_curve(
+                        joint,
+                        f"{channel}{axis}",
+                        frames,
+                        values[:, j, axis_index],
+                        bake.CURVE_TYPES[channel],
+                        keep_outside,
+                    )
+
+    def write_take_curves(self, joints: list, frames: list, channels: dict, take: str):
+        """Stand-in for bake.maya_write_take_curves(), unconnected curves named per take."""
+        for j, joint in enumerate(joints):
+            for channel, values in channels.items():
+                for axis_index, axis in enumerate("XYZ"):
+                    name = bake.take_curve_name(joint, f"{channel}{axis}", take)
+                    self.delete(name)
+                    curve = self.add(name, bake.CURVE_TYPES[channel])
+                    curve.data = {
+                        "node": None,
+                        "attribute": None,
+                        "times": np.asarray(frames, dtype=np.float64),
+                        "values": np.array(values[:, j, axis_index], dtype=np.float64),
+                        "tangent": "auto",
+                    }
+
+    def detach_take(self, name: str, attribute: str):
+        """Stand-in for bake.maya_detach_takes() on one attribute."""
+        curve = self.curves.get((name, attribute))
+        if curve is not None and bake.is_take_curve(curve, name, attribute):
+            self.disconnect_curve(curve)
+
+    def disconnect_curve(self, curve: str):
+        """Leaves a curve in the scene, driving nothing."""
+        data = self.nodes[curve].data
+        self.curves.pop((data["node"], data["attribute"]), None)
+        data.update(node=None, attribute=None)
+
+    def connect_curve(self, curve: str, name: str, attribute: str):
+        """Drives an attribute with a curve, in place of whatever curve drove it before."""
+        data = self.nodes[curve].data
+        self.curves.pop((data["node"], data["attribute"]), None)
+        previous = self.curves.get((name, attribute))
+        if previous is not None:
+            self.nodes[previous].data.update(node=None, attribute=None)
+        data.update(node=name, attribute=attribute)
+        self.curves[(name, attribute)] = curve
+
+    def _channels(self, names: list, frames: np.ndarray) -> tuple:
+        """Translate, rotate and scale of nodes over frames, (frames, nodes, 3) each."""
+        result = []
+        for channel in ("translate", "rotate", "scale"):
+            base = np.array([self.nodes[name].attrs[channel] for name in names], dtype=np.float64)
+            result.append(np.broadcast_to(base, (len(frames),) + base.shape).copy())
+
+        for i, name in enumerate(names):
+            motion = self.nodes[name].motion
+            if motion is not None:
+                amplitude, phase, period = motion
+                wave = np.sin(2.0 * np.pi * frames / period + phase)
+                result[1][:, i] += wave[:, None] * amplitude[None, :]
+            for c, channel in enumerate(("translate", "rotate", "scale")):
+                for axis_index, axis in enumerate("XYZ"):
+                    curve = self.curves.get((name, f"{channel}{axis}"))
+                    if curve is not None:
+                        result[c][:, i, axis_index] = self.evaluate_curve(curve, frames)
+        return tuple(result)
+
+    def evaluate_curve(self, curve: str, frames) -> np.ndarray:
+        """Values of a curve over frames.  Keys are joined by straight lines, or by Hermite
+        segments once write_reduced_keys() gave them fixed slopes."""
+        data = self.nodes[curve].data
+        times, values = data["times"], data["values"]
+        frames = np.asarray(frames, dtype=np.float64)
+        slopes = data.get("slopes")
+        if data["tangent"] != "fixed" or slopes is None or len(times) < 2:
+            return np.interp(frames, times, values)
+
+        frames = np.clip(frames, times[0], times[-1])
+        i = np.clip(np.searchsorted(times, frames, side="right") - 1, 0, len(times) - 2)
+        span = times[i + 1] - times[i]
+        u = (frames - times[i]) / span
+        u2 = u * u
+        u3 = u2 * u
+        return (
+            (2 * u3 - 3 * u2 + 1) * values[i]
+            + (u3 - 2 * u2 + u) * slopes[i] * span
+            + (-2 * u3 + 3 * u2) * values[i + 1]
+            + (u3 - u2) * slopes[i + 1] * span
+        )
+
+    def local_matrices(self, names: list, frames: np.ndarray) -> np.ndarray:
+        """(frames, nodes, 4, 4) local matrices: scale, rotateAxis, rotate, jointOrient, then
+        translate, in Maya's row vector order."""
+        return self._compose(names, *self._channels(names, frames))
+
+    def _compose(self, names: list, translate, rotate, scale) -> np.ndarray:
+        joint_orients = np.array([self.nodes[name].attrs["jointOrient"] for name in names])
+        rotate_axes = np.array([self.nodes[name].attrs["rotateAxis"] for name in names])
+        orders = [bake.ROTATE_ORDERS[self.nodes[name].attrs["rotateOrder"]] for name in names]
+
+        rotation = np.empty(rotate.shape[:2] + (3, 3))
+        for order in set(orders):
+            columns = [i for i, node_order in enumerate(orders) if node_order == order]
+            rotation[:, columns] = bake.euler_to_matrix(rotate[:, columns], order)
+        rotation = bake.euler_to_matrix(rotate_axes) @ rotation
+        rotation = rotation @ bake.euler_to_matrix(joint_orients)
+
+        local = np.zeros(rotate.shape[:2] + (4, 4))
+        local[..., :3, :3] = scale[..., :, None] * rotation
+        local[..., 3, :3] = translate
+        local[..., 3, 3] = 1.0
+        return local
+
+    # Matrix nodes --------------------------------------------------------------------------------
+
+    def _source(self, plug) -> tuple:
+        """Node and attribute of a connection's source plug, None for a static value."""
+        if not isinstance(plug, str):
+            return None, None
+        name, _, attribute = plug.partition(".")
+        return self.nodes.get(name), attribute
+
+    def matrix_drivers(self, name: str, live: bool = False) -> dict:
+        """Channels of a node driven by decomposeMatrix nodes, as channel to decomposeMatrix.
+        Empty once a bake has keyed the node, unless live."""
+        node = self.nodes[name]
+        if node.type not in ("transform", "joint") or not node.data.get("inputs"):
+            return {}
+        if not live and self._keyed(name):
+            return {}
+        drivers = {}
+        for channel in ("translate", "rotate", "scale"):
+            source, _ = self._source(node.data["inputs"].get(channel))
+            if source is not None and source.type == "decomposeMatrix":
+                drivers[channel] = source
+        return drivers
+
+    def _matrix_terms(self, node: Node) -> list:
+        """What a multMatrix multiplies, in order, nested multMatrix nodes expanded: plugs of
+        other nodes' matrices and static (4, 4) arrays."""
+        inputs = node.data.get("inputs", {})
+        if node.type == "decomposeMatrix":
+            source, _ = self._source(inputs.get("inputMatrix"))
+            return self._matrix_terms(source) if source is not None else []
+        terms = []
+        for key in sorted((key for key in inputs if key.startswith("matrixIn[")), key=_index):
+            source, _ = self._source(inputs[key])
+            if source is not None and source.type == "multMatrix":
+                terms.extend(self._matrix_terms(source))
+            else:
+                terms.append(inputs[key])
+        return terms
+
+    def _term_dependency(self, term) -> str:
+        """The node whose world matrix a term needs."""
+        source, attribute = self._source(term)
+        if source is None:
+            return None
+        if attribute.startswith("parentInverseMatrix"):
+            return source.parent
+        return source.name
+
+    def _driven_local(self, name: str, world: dict, frames: np.ndarray, live: bool):
+        """Local matrices of a node whose channels come out of decomposeMatrix nodes."""
+        translate, rotate, scale = [values[:, 0] for values in self._channels([name], frames)]
+        order = bake.ROTATE_ORDERS[self.nodes[name].attrs["rotateOrder"]]
+        identity = np.broadcast_to(np.eye(4), (len(frames), 4, 4))
+        for channel, decompose in self.matrix_drivers(name, live).items():
+            matrix = identity
+            for term in self._matrix_terms(decompose):
+                source, attribute = self._source(term)
+                if source is None:
+                    matrix = matrix @ np.asarray(term)
+                elif attribute.startswith("parentInverseMatrix"):
+                    parent = self._term_dependency(term)
+                    if parent is not None:
+                        matrix = matrix @ np.linalg.inv(world[parent])
+                else:
+                    matrix = matrix @ world[source.name]
+            if channel == "translate":
+                translate = matrix[:, 3, :3]
+            elif channel == "scale":
+                scale = np.linalg.norm(matrix[:, :3, :3], axis=-1)
+            else:
+                basis = matrix[:, :3, :3]
+                norms = np.linalg.norm(basis, axis=-1)[..., None]
+                rotate = bake.matrix_to_euler(basis / np.where(norms > 1e-12, norms, 1.0), order)
+        return self._compose([name], translate[:, None], rotate[:, None], scale[:, None])[:, 0]
+
+    def world_matrices(self, names: list, frames: list, live: bool = False) -> np.ndarray:
+        """(frames, nodes, 4, 4) world matrices, the stand-in for bake.maya_world_matrices().
+        A parent-constrained node follows its driver and matrix node chains are evaluated.  Live
+        evaluates them even on nodes a bake has keyed since, as bakeResults sees them mid-bake."""
+        frames = np.asarray(frames, dtype=np.float64)
+
+        # Everything the requested nodes depend on: ancestors, constraint drivers and the
+        # sources of matrix chains.
+        dependencies = {}
+        stack = [self.get(name).name for name in names]
+        while stack:
+            name = stack.pop()
+            if name in dependencies:
+                continue
+            node = self.nodes[name]
+            depends = [node.parent]
+            if node.type in ("transform", "joint"):
+                constraint = self.driving_constraint(name, live)
+                if constraint is not None:
+                    depends = [constraint.data["driver"]]
+                for decompose in self.matrix_drivers(name, live).values():
+                    terms = self._matrix_terms(decompose)
+                    depends += [self._term_dependency(term) for term in terms]
+            dependencies[name] = [depend for depend in depends if depend is not None]
+            stack.extend(dependencies[name])
+
+        moving = [name for name in dependencies if self.nodes[name].type in ("transform", "joint")]
+        local = dict(zip(moving, np.swapaxes(self.local_matrices(moving, frames), 0, 1)))
+        identity = np.broadcast_to(np.eye(4), (len(frames), 4, 4))
+
+        world = {}
+        for name in dependencies:
+            pending = [name]
+            while pending:
+                current = pending[-1]
+                if current in world:
+                    pending.pop()
+                    continue
+                waiting = [depend for depend in dependencies[current] if depend not in world]
+                if waiting:
+                    pending.extend(waiting)
+                    continue
+                pending.pop()
+                node = self.nodes[current]
+                constraint = self.driving_constraint(current, live) if current in local else None
+                if constraint is not None:
+                    world[current] = world[constraint.data["driver"]]
+                    continue
+                if current in local and self.matrix_drivers(current, live):
+                    local[current] = self._driven_local(current, world, frames, live)
+                if node.parent is None:
+                    world[current] = local.get(current, identity)
+                elif current in local:
+                    world[current] = local[current] @ world[node.parent]
+                else:
+                    world[current] = world[node.parent]
+
+        return np.stack([world[self.get(name).name] for name in names], axis=1)
+
+    # Generators ----------------------------------------------------------------------------------
+
+    def build_rig(
+        self,
+        joints: int = 50,
+        verts: int = 1000,
+        meshes: int = 1,
+        unused: float = 0.15,
+        seed: int = 0,
+    ) -> dict:
+        """Generates an animated skeleton and skinned meshes.
+
+        The skeleton is a random tree under a "rig" group, mostly chains.  Each mesh is a tube
+        around the skeleton weighted to the four closest influences, a share of the joints isn't
+        an influence of any mesh.
+
+        Args:
+            joints (int, optional): Joint count.  Defaults to 50.
+            verts (int, optional): Vertices per mesh, roughly.  Defaults to 1000.
+            meshes (int, optional): Skinned meshes.  Defaults to 1.
+            unused (float, optional): Share of the joints that aren't influences.  Defaults to
+            0.15.
+            seed (int, optional): Random seed.  Defaults to 0.
+
+        Returns:
+            dict: "top_joint", "joints", "influences" and "meshes" (transform names).
+        """
+        rng = np.random.default_rng(seed)
+        rig = self.add("rig", "transform")
+
+        names = []
+        for i in range(joints):
+            if i == 0:
+                parent = rig.name
+            elif rng.random() < 0.75:
+                parent = names[-1]
+            else:
+                parent = names[rng.integers(len(names))]
+            joint = self.add(f"joint{i}", "joint", parent)
+            joint.attrs["translate"] = tuple(rng.uniform([-1.0, 0.5, -1.0], [1.0, 1.5, 1.0]))
+            joint.attrs["jointOrient"] = tuple(rng.uniform(-20.0, 20.0, 3))
+            joint.attrs["rotateOrder"] = int(rng.integers(6)) if rng.random() < 0.2 else 0
+            joint.motion = (rng.uniform(5.0, 30.0, 3), rng.uniform(0.0, 2.0 * np.pi), 48.0)
+            names.append(joint.name)
+
+        # The top joint always stays, the rest are dropped at random.
+        influences = [names[0]] + [name for name in names[1:] if rng.random() >= unused]
+        positions = self.world_matrices(influences, [self.time])[0, :, 3, :3]
+
+        mesh_names = []
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        for m in range(meshes):
+            points, triangles = _tube(low, high, verts, offset=0.1 * m)
+            transform = self.add(f"mesh{m}", "transform")
+            shape = self.add(f"mesh{m}Shape", "mesh", transform.name)
+            shape.data = {"points": points, "triangles": triangles}
+            cluster = self.add("skinCluster1", "skinCluster")
+            cluster.data = {
+                "mesh": shape.name,
+                "influences": list(influences),
+                "weights": _closest_weights(points, positions),
+                "bind_inverse": self.bind_inverse(influences),
+            }
+            mesh_names.append(transform.name)
+
+        return {
+            "top_joint": names[0],
+            "joints": names,
+            "influences": influences,
+            "meshes": mesh_names,
+        }
+
+
+def _tube(low: np.ndarray, high: np.ndarray, verts: int, offset: float = 0.0) -> tuple:
+    """Points and triangles of an open cylinder along y spanning a bounding box."""
+    columns = max(int(np.sqrt(verts / 4.0)), 3)
+    rows = max(verts // columns, 2)
+    centre = 0.5 * (low + high)
+    radius = 0.5 * max(high[0] - low[0], high[2] - low[2]) + 0.5 + offset
+
+    angle = np.linspace(0.0, 2.0 * np.pi, columns, endpoint=False)
+    height = np.linspace(low[1], high[1], rows)
+    points = np.empty((rows, columns, 3))
+    points[..., 0] = centre[0] + radius * np.cos(angle)[None, :]
+    points[..., 1] = height[:, None]
+    points[..., 2] = centre[2] + radius * np.sin(angle)[None, :]
+
+    row, column = np.meshgrid(np.arange(rows - 1), np.arange(columns), indexing="ij")
+    a = row * columns + column
+    b = row * columns + (column + 1) % columns
+    c = a + columns
+    d = b + columns
+    triangles = np.concatenate(
+        [np.stack([a, b, c], -1).reshape(-1, 3), np.stack([b, d, c], -1).reshape(-1, 3)]
+    )
+    return points.reshape(-1, 3), triangles.astype(np.int64)
+
+
+def _closest_weights(points: np.ndarray, joints: np.ndarray, count: int = 4) -> np.ndarray:
+    """Inverse distance weights of each point to its closest joints, in chunks of points."""
+    count = min(count, len(joints))
+    table = np.zeros((len(points), len(joints)))
+    for start in range(0, len(points), 50000):
+        chunk = points[start : start + 50000]
+        dist = np.linalg.norm(chunk[:, None, :] - joints[None, :, :], axis=-1)
+        closest = np.argpartition(dist, count - 1, axis=1)[:, :count]
+        inverse = 1.0 / np.maximum(np.take_along_axis(dist, closest, axis=1), 1e-6) ** 2
+        inverse /= inverse.sum(axis=1, keepdims=True)
+        np.put_along_axis(table[start : start + 50000], closest, inverse, axis=1)
+    return table
+
+
+class SceneWeightBackend(weights.WeightBackend):
+    def __init__(self, scene: Scene = None):
+        """Weight tables of the stand-in's skinClusters, in the given scene or whichever scene is
+        open at the time of each call."""
+        self._scene = scene
+
+    @property
+    def scene(self) -> Scene:
+        return self._scene if self._scene is not None else globals()["scene"]
+
+    def read(self, cluster: str) -> tuple:
+        data = self.scene.get(cluster).data
+        return data["weights"].copy(), list(data["influences"])
+
+    def influences(self, cluster: str) -> list:
+        return list(self.scene.get(cluster).data["influences"])
+
+    def vertex_count(self, cluster: str) -> int:
+        return len(self.scene.get(cluster).data["weights"])
+
+    def write(self, cluster: str, weights: np.ndarray, influences: list):
+        data = self.scene.get(cluster).data
+        columns = [data["influences"].index(influence) for influence in influences]
+        table = np.zeros((len(weights), len(data["influences"])))
+        table[:, columns] = weights
+        data["weights"] = table
+
+    def geometry(self, mesh: str) -> tuple:
+        data = self.scene.shape_of(mesh).data
+        return data["points"], data["triangles"]
+
+    def bind_matrices(self, cluster: str) -> dict:
+        data = self.scene.get(cluster).data
+        return dict(zip(data["influences"], data["bind_inverse"]))
+
+
+scene = Scene()
+# batch.install_cmds() makes this the default weight backend along with the commands.
+weight_backend = SceneWeightBackend()
+
+
+def world_matrices(joints: list, frames: list) -> np.ndarray:
+    """bake.maya_world_matrices() for the current scene, the sampler bake shard workers use
+    (see shard.py)."""
+    return scene.world_matrices(joints, frames)
+
+
+def deformed_points(mesh: str, frames: list) -> np.ndarray:
+    """verify.maya_deformed_points() for the current scene."""
+    return scene.deformed_points(mesh, frames)
+
+
+# Commands ----------------------------------------------------------------------------------------
+
+
+def _flat(items) -> list:
+    if items is None:
+        return []
+    if isinstance(items, str):
+        return [items]
+    flat = []
+    for item in items:
+        flat.extend(_flat(item))
+    return flat
+
+
+def _index(key: str) -> int:
+    """The index of a multi attribute element, "matrixIn[2]" is 2."""
+    return int(key[key.index("[") + 1 : -1])
+
+
+def _flag(kwargs: dict, *names, default=None):
+    for name in names:
+        if name in kwargs:
+            return kwargs[name]
+    return default
+
+
+def _plug(plug: str) -> tuple:
+    name, _, attribute = plug.partition(".")
+    return scene.get(name), attribute.split("[")[0]
+
+
+def ls(*args, **kwargs):
+    names = _flat(args) if args else list(scene.nodes)
+    long = _flag(kwargs, "long", "l", default=False)
+    show_type = _flag(kwargs, "showType", "st", default=False)
+    node_type = _flag(kwargs, "type", "typ")
+    result = []
+    for name in dict.fromkeys(names):
+        node = scene.find(name)
+        if node is None or (node_type is not None and not node.type.startswith(node_type)):
+            continue
+        result.append(scene.long_name(node.name) if long else node.name)
+        if show_type:
+            result.append(node.type)
+    return result
+
+
+def objExists(name: str) -> bool:
+    node_name, _, attribute = name.partition(".")
+    node = scene.find(node_name)
+    if node is None:
+        return False
+    return not attribute or attribute in node.attrs
+
+
+def objectType(name: str) -> str:
+    return scene.get(name).type
+
+
+def listRelatives(*args, **kwargs):
+    full_path = _flag(kwargs, "fullPath", "f", default=False)
+    node_type = _flag(kwargs, "type", "typ")
+    result = []
+    for name in _flat(args):
+        node = scene.get(name)
+        if _flag(kwargs, "allDescendents", "ad", default=False):
+            # Maya lists the deepest first.
+            found = list(reversed(scene.descendants(node.name)))
+        elif _flag(kwargs, "parent", "p", default=False):
+            found = [node.parent] if node.parent else []
+        else:
+            found = list(node.children)
+        if _flag(kwargs, "shapes", "s", default=False):
+            found = [child for child in found if scene.nodes[child].type == "mesh"]
+        if node_type is not None:
+            found = [child for child in found if scene.nodes[child].type == node_type]
+        result.extend(scene.long_name(child) if full_path else child for child in found)
+    return result or None
+
+
+def listConnections(*args, **kwargs):
+    node_type = _flag(kwargs, "type", "t")
+    connections = _flag(kwargs, "connections", "c", default=False)
+    result = []
+    for name in _flat(args):
+        node = scene.get(name)
+        found = []
+        if node_type in (None, "skinCluster"):
+            cluster = scene.cluster_of(node.name)
+            if cluster is not None:
+                found.append((f"{node.name}.inMesh", cluster.name))
+        if node_type is None or node_type.startswith("animCurve"):
+            for (curve_node, attribute), curve in scene.curves.items():
+                if curve_node == node.name:
+                    found.append((f"{node.name}.{attribute}", curve))
+        for plug, other in found:
+            result.extend([plug, other] if connections else [other])
+    return result or None
+
+
+def listHistory(*args, **kwargs):
+    result = []
+    for name in _flat(args):
+        cluster = scene.cluster_of(scene.shape_of(name).name)
+        if cluster is not None:
+            result.append(cluster.name)
+    return result
+
+
+def createNode(node_type: str, name: str = None, n: str = None, parent: str = None, p=None):
+    parent = parent or p
+    node = scene.add(name or n or f"{node_type}1", node_type, parent)
+    scene.journal([node.name])
+    return node.name
+
+
+def duplicate(*args, **kwargs):
+    parent_only = _flag(kwargs, "parentOnly", "po", default=False)
+    copies = [scene.duplicate(scene.get(name).name, parent_only) for name in _flat(args)]
+    scene.journal([name for made in copies for name in [made] + scene.descendants(made)])
+    return copies
+
+
+def rename(name: str, new_name: str) -> str:
+    node = scene.get(name)
+    new_name = scene.unique_name(new_name)
+    scene.nodes[new_name] = scene.nodes.pop(node.name)
+    if node.parent is not None:
+        siblings = scene.nodes[node.parent].children
+        siblings[siblings.index(node.name)] = new_name
+    for child in node.children:
+        scene.nodes[child].parent = new_name
+    for other in scene.nodes.values():
+        if other.data.get("mesh") == node.name:
+            other.data["mesh"] = new_name
+        if other.data.get("driver") == node.name:
+            other.data["driver"] = new_name
+        if other.data.get("node") == node.name:
+            other.data["node"] = new_name
+            scene.curves[(new_name, other.data["attribute"])] = scene.curves.pop(
+                (node.name, other.data["attribute"])
+            )
+    node.name = new_name
+    scene.journal([new_name])
+    return new_name
+
+
+def parent(*args, **kwargs):
+    names = _flat(args)
+    if _flag(kwargs, "world", "w", default=False):
+        children, new_parent = names, None
+    else:
+        children, new_parent = names[:-1], scene.get(names[-1]).name
+    for child in children:
+        scene.reparent(scene.get(child).name, new_parent)
+    scene.journal([scene.get(child).name for child in children])
+    return [scene.get(child).name for child in children]
+
+
+def connectAttr(source: str, destination: str, **kwargs):
+    """Curves drive channels, anything else is only recorded for the matrix nodes to follow."""
+    source_node, output = _plug(source)
+    node, attribute = _plug(destination)
+    force = _flag(kwargs, "force", "f", default=False)
+    if source_node.type.startswith("animCurve") and output == "output":
+        if (node.name, attribute) in scene.curves and not force:
+            raise RuntimeError(f"{destination} is already connected.")
+        scene.journal([source_node.name])
+        scene.connect_curve(source_node.name, node.name, attribute)
+        return
+
+    element = destination.partition(".")[2]
+    inputs = node.data.setdefault("inputs", {})
+    if element in inputs and not force:
+        raise RuntimeError(f"{destination} is already connected.")
+    scene.journal([node.name])
+    inputs[element] = f"{source_node.name}.{source.partition('.')[2]}"
+
+
+def disconnectAttr(source: str, destination: str):
+    source_node, output = _plug(source)
+    node, attribute = _plug(destination)
+    if source_node.type.startswith("animCurve") and output == "output":
+        if scene.curves.get((node.name, attribute)) != source_node.name:
+            raise RuntimeError(f"{source} isn't connected to {destination}.")
+        scene.journal([source_node.name])
+        scene.disconnect_curve(source_node.name)
+        return
+    inputs = node.data.get("inputs", {})
+    element = destination.partition(".")[2]
+    if element not in inputs:
+        raise RuntimeError(f"{source} isn't connected to {destination}.")
+    scene.journal([node.name])
+    del inputs[element]
+
+
+def delete(*args, **kwargs):
+    # Everything is resolved first, some names may go with the deletion of their parents.
+    names = [scene.get(name).name for name in _flat(args)]
+    scene.journal([doomed for name in names for doomed in [name] + scene.descendants(name)])
+    for name in names:
+        scene.delete(name)
+
+
+def sets(*args, **kwargs):
+    """Only makes sets, members are kept as given (components included)."""
+    node = scene.add(_flag(kwargs, "name", "n", default="set1"), "objectSet")
+    node.data = {"members": _flat(args)}
+    scene.journal([node.name])
+    return node.name
+
+
+def select(*args, **kwargs):
+    if _flag(kwargs, "clear", "cl", default=False):
+        scene.selection = []
+        return
+    names = [scene.get(name).name for name in _flat(args)]
+    if _flag(kwargs, "add", default=False):
+        scene.selection.extend(names)
+    else:
+        scene.selection = names
+
+
+def getAttr(plug: str, **kwargs):
+    node, attribute = _plug(plug)
+    if attribute == "worldMatrix":
+        return scene.world_matrices([node.name], [scene.time])[0, 0].ravel().tolist()
+    if attribute in VECTORS:
+        return [tuple(node.attrs[attribute])]
+    for channel in ("translate", "rotate", "scale"):
+        if attribute in (f"{channel}X", f"{channel}Y", f"{channel}Z"):
+            values = scene._channels([node.name], np.array([scene.time]))
+            channel_index = ("translate", "rotate", "scale").index(channel)
+            return float(values[channel_index][0, 0, "XYZ".index(attribute[-1])])
+    if attribute not in node.attrs:
+        raise ValueError(f"No attribute matches {plug}")
+    return node.attrs[attribute]
+
+
+def read_attributes(nodes: list, attributes: list) -> tuple:
+    """bake.maya_read_attributes() on the stand-in.  Attributes it doesn't model read as 0."""
+    names = [scene.get(name).name for name in nodes]
+    current = scene._channels(names, np.array([scene.time]))
+    channels = dict(zip(("translate", "rotate", "scale"), current))
+    values, driven = {}, {}
+    for attribute in attributes:
+        if attribute in channels:
+            values[attribute] = channels[attribute][0]
+        else:
+            values[attribute] = np.array(
+                [scene.nodes[name].attrs.get(attribute) or 0.0 for name in names], dtype=np.float64
+            )
+        driven[attribute] = np.array(
+            [
+                any((name, f"{attribute}{axis}") in scene.curves for axis in ("", "X", "Y", "Z"))
+                or attribute in scene.nodes[name].data.get("inputs", {})
+                or (attribute in ("translate", "rotate") and scene.constraint_of(name) is not None)
+                for name in names
+            ]
+        )
+    return values, driven
+
+
+def setAttr(plug: str, *values, **kwargs):
+    node, attribute = _plug(plug)
+    if kwargs.get("type") == "matrix":
+        element = plug.partition(".")[2]
+        node.data.setdefault("inputs", {})[element] = np.reshape(values, (4, 4)).astype(np.float64)
+    elif attribute in VECTORS:
+        node.attrs[attribute] = tuple(float(value) for value in values)
+    elif attribute[:-1] in VECTORS and attribute[-1] in "XYZ":
+        vector = list(node.attrs[attribute[:-1]])
+        vector["XYZ".index(attribute[-1])] = float(values[0])
+        node.attrs[attribute[:-1]] = tuple(vector)
+    else:
+        node.attrs[attribute] = values[0] if len(values) == 1 else values
+    scene.journal([node.name])
+
+
+def addAttr(name: str, **kwargs):
+    node = scene.get(name)
+    node.attrs[_flag(kwargs, "longName", "ln")] = None
+
+
+def xform(name: str, **kwargs):
+    if not _flag(kwargs, "query", "q", default=False):
+        raise NotImplementedError("The stand-in only queries xform.")
+    world = scene.world_matrices([scene.get(name).name], [scene.time])[0, 0]
+    if _flag(kwargs, "matrix", "m", default=False):
+        return world.ravel().tolist()
+    return world[3, :3].tolist()
+
+
+def skinCluster(*args, **kwargs):
+    if _flag(kwargs, "query", "q", default=False):
+        node = scene.get(args[0])
+        if _flag(kwargs, "influence", "inf", default=False):
+            return list(node.data["influences"])
+        raise NotImplementedError("The stand-in only queries skinCluster influences.")
+
+    names = _flat(args)
+    influences = [scene.get(name).name for name in names if scene.get(name).type == "joint"]
+    geometry = [name for name in names if scene.get(name).type != "joint"]
+    shape = scene.shape_of(geometry[0])
+    if scene.cluster_of(shape.name) is not None:
+        raise RuntimeError(f"{shape.name} is already connected to a skinCluster.")
+
+    cluster = scene.add(_flag(kwargs, "name", "n", default="skinCluster1"), "skinCluster")
+    table = np.zeros((len(shape.data["points"]), len(influences)))
+    table[:, 0] = 1.0
+    cluster.data = {
+        "mesh": shape.name,
+        "influences": influences,
+        "weights": table,
+        "bind_inverse": scene.bind_inverse(influences),
+    }
+    cluster.attrs.update(maxInfluences=5, maintainMaxInfluences=False)
+    scene.journal([cluster.name])
+    return [cluster.name]
+
+
+def copySkinWeights(*args, **kwargs):
+    """Copies by vertex index and pairs influences by name, with or without the "_INF" suffix.
+    Only meshes of the same topology are supported."""
+    source = scene.get(_flag(kwargs, "sourceSkin", "ss")).data
+    destination = scene.get(_flag(kwargs, "destinationSkin", "ds")).data
+    if len(source["weights"]) != len(destination["weights"]):
+        raise NotImplementedError("The stand-in only copies weights between equal vertex counts.")
+    scene.journal([_flag(kwargs, "destinationSkin", "ds")])
+    destination["weights"] = weights.normalize_rows(
+        weights.remap_columns(source["weights"], source["influences"], destination["influences"])
+    )
+
+
+def parentConstraint(driver: str, driven: str, **kwargs):
+    constraint = scene.add(f"{driven}_parentConstraint1", "parentConstraint", driven)
+    constraint.data = {"driver": scene.get(driver).name}
+    constraint.attrs["interpType"] = 1
+    scene.journal([constraint.name])
+    return [constraint.name]
+
+
+def bakeResults(*args, **kwargs):
+    names = [scene.get(name).name for name in _flat(args)] or list(scene.selection)
+    start, end = _flag(kwargs, "time", "t")
+    step = _flag(kwargs, "sampleBy", "sb", default=1)
+    frames = np.arange(start, end + step * 0.5, step)
+
+    # Constrained and matrix driven nodes are sampled from their drivers, whatever was keyed on
+    # them before.
+    world = scene.world_matrices(names, frames, live=True)
+    index = {name: i for i, name in enumerate(names)}
+    parents = []
+    static_parents = np.broadcast_to(np.eye(4), (len(names), 4, 4)).copy()
+    for i, name in enumerate(names):
+        parent_name = scene.nodes[name].parent
+        parents.append(index.get(parent_name, -1))
+        if parent_name is not None and parent_name not in index:
+            static_parents[i] = scene.world_matrices([parent_name], [scene.time])[0, 0]
+
+    attrs = [scene.nodes[name].attrs for name in names]
+    translate, rotate, scale = bake.local_trs(
+        world,
+        parents,
+        static_parents=static_parents,
+        joint_orients=np.array([node_attrs["jointOrient"] for node_attrs in attrs]),
+        rotate_axes=np.array([node_attrs["rotateAxis"] for node_attrs in attrs]),
+        rotate_orders=[bake.ROTATE_ORDERS[node_attrs["rotateOrder"]] for node_attrs in attrs],
+        minimize_rotation=_flag(kwargs, "minimizeRotation", "mr", default=False),
+    )
+    # Once keyed, the channels stop following the constraint.
+    scene.write_curves(
+        names,
+        frames,
+        {"translate": translate, "rotate": rotate, "scale": scale},
+        keep_outside=_flag(kwargs, "preserveOutsideKeys", "pok", default=False),
+    )
+    scene.journal([curve for (node, _), curve in scene.curves.items() if node in index])
+
+    # A simulation bake steps the time, redrawing on every frame unless refresh is suspended.
+    if not scene.refresh_suspended:
+        time = scene.time
+        for frame in frames:
+            scene.time = float(frame)
+            scene.redraw()
+        scene.time = time
+    return len(names) * 9
+
+
+def keyframe(curves, **kwargs):
+    data = [scene.get(curve).data for curve in _flat([curves])]
+    if _flag(kwargs, "indexValue", "iv", default=False):
+        return [i for curve in data for i in range(len(curve["times"]))]
+    if _flag(kwargs, "timeChange", "tc", default=False):
+        return [t for curve in data for t in curve["times"].tolist()]
+    if _flag(kwargs, "valueChange", "vc", default=False):
+        return [v for curve in data for v in curve["values"].tolist()]
+    return sum(len(curve["times"]) for curve in data)
+
+
+def cutKey(*args, **kwargs):
+    attributes = _flag(kwargs, "attribute", "at")
+    keys = _flag(kwargs, "index", "index")
+    for name in _flat(args):
+        node = scene.get(name)
+        scene.journal([node.name])
+        if node.type.startswith("animCurve"):
+            if keys is None:
+                scene.delete(node.name)
+                continue
+            drop = np.concatenate([np.arange(first, last + 1) for first, last in keys])
+            keep = np.ones(len(node.data["times"]), dtype=bool)
+            keep[drop] = False
+            for field in ("times", "values", "slopes"):
+                if field in node.data:
+                    node.data[field] = node.data[field][keep]
+            continue
+        for (curve_node, attribute), curve in list(scene.curves.items()):
+            if curve_node == node.name and (attributes is None or attribute in attributes):
+                scene.delete(curve)
+
+
+def filterCurve(*args, **kwargs):
+    """Euler filtering, done as a plain unwrap of each rotation curve."""
+    for curve in _flat(args):
+        scene.journal([scene.get(curve).name])
+        data = scene.get(curve).data
+        data["values"] = np.degrees(np.unwrap(np.radians(data["values"])))
+
+
+def keyTangent(curve: str, **kwargs):
+    scene.journal([scene.get(curve).name])
+    scene.get(curve).data["tangent"] = _flag(kwargs, "outTangentType", "ott")
+
+
+def write_reduced_keys(
+    curves: list,
+    times: np.ndarray,
+    values: np.ndarray,
+    keep: np.ndarray,
+    tolerances: np.ndarray,
+    interpolation: str = bake.LINEAR,
+) -> tuple:
+    """bake.maya_write_reduced_keys() on the stand-in's curves, slopes kept per frame."""
+    times = np.asarray(times, dtype=np.float64)
+    keep = np.array(keep, dtype=bool)
+    errors = np.zeros(len(curves))
+    for column, curve in enumerate(curves):
+        name = scene.get(curve).name
+        scene.journal([name])
+        data = scene.nodes[name].data
+        data.pop("slopes", None)
+        if interpolation == bake.LINEAR:
+            data["times"], data["values"] = times[keep[:, column]], values[keep[:, column], column]
+            data["tangent"] = "linear"
+            continue
+
+        kept = keep[:, column]
+        data["tangent"] = "fixed"
+        while True:
+            data["times"], data["values"] = times[kept], values[kept, column]
+            if kept.sum() > 1:
+                slopes = bake.key_slopes(times, values[:, [column]], kept[:, None])
+                data["slopes"] = slopes[kept, 0]
+            error = np.abs(scene.evaluate_curve(name, times) - values[:, column])
+            missing = np.flatnonzero((error > tolerances[column]) & ~kept)
+            if not missing.size:
+                errors[column] = error.max() if error.size else 0.0
+                break
+            kept[missing] = True
+    return keep, errors
+
+
+def currentUnit(**kwargs):
+    if _flag(kwargs, "time", "t", default=False):
+        return "film"
+    return "cm"
+
+
+def playbackOptions(**kwargs):
+    if _flag(kwargs, "query", "q", default=False):
+        if _flag(kwargs, "minTime", "min", default=False):
+            return scene.playback[0]
+        return scene.playback[1]
+    if _flag(kwargs, "minTime", "min") is not None:
+        scene.playback[0] = float(_flag(kwargs, "minTime", "min"))
+    if _flag(kwargs, "maxTime", "max") is not None:
+        scene.playback[1] = float(_flag(kwargs, "maxTime", "max"))
+
+
+def currentTime(*args, **kwargs):
+    if _flag(kwargs, "query", "q", default=False):
+        return scene.time
+    scene.time = float(args[0])
+    return scene.time
+
+
+def file(*args, **kwargs):
+    global scene
+    path = args[0] if args else None
+    if _flag(kwargs, "new", default=False):
+        scene = Scene()
+    elif _flag(kwargs, "open", "o", default=False):
+        if not path.startswith("synthetic:"):
+            raise RuntimeError(f"The stand-in can only open synthetic scenes, not {path}.")
+        settings = dict(item.split("=") for item in path[len("synthetic:") :].split(",") if item)
+        scene = Scene()
+        scene.build_rig(**{key: int(value) for key, value in settings.items()})
+        scene.path = path
+    elif _flag(kwargs, "rename", "rn") is not None:
+        scene.path = _flag(kwargs, "rename", "rn")
+    elif _flag(kwargs, "save", "s", default=False):
+        scene.written.append(scene.path)
+    elif _flag(kwargs, "exportSelected", "es", default=False):
+        scene.written.append(path)
+    return scene.path
+
+
+def undoInfo(**kwargs):
+    if _flag(kwargs, "openChunk", "ock", default=False):
+        if scene.undo_depth == 0:
+            scene._chunk_snapshot = scene.snapshot()
+            scene._chunk_name = _flag(kwargs, "chunkName", "cn", default="")
+        scene.undo_depth += 1
+    elif _flag(kwargs, "closeChunk", "cck", default=False):
+        scene.undo_depth = max(scene.undo_depth - 1, 0)
+        if scene.undo_depth == 0 and scene._chunk_snapshot is not None:
+            scene.undo_snapshots.append(scene._chunk_snapshot)
+            scene.undo_names.append(scene._chunk_name)
+            scene._chunk_snapshot = None
+    elif _flag(kwargs, "stateWithoutFlush", "swf") is not None:
+        scene.undo_enabled = bool(_flag(kwargs, "stateWithoutFlush", "swf"))
+    elif _flag(kwargs, "query", "q", default=False):
+        if _flag(kwargs, "undoName", "un", default=False):
+            return scene.undo_names[-1] if scene.undo_names else ""
+        return scene.undo_enabled
+    elif _flag(kwargs, "state", "st") is not None:
+        scene.undo_enabled = bool(_flag(kwargs, "state", "st"))
+        scene.undo_queue = []
+
+
+def refresh(*args, **kwargs):
+    if _flag(kwargs, "suspend", "su") is not None:
+        scene.refresh_suspended = bool(_flag(kwargs, "suspend", "su"))
+    elif not scene.refresh_suspended:
+        scene.redraw()
+
+
+def evaluationManager(**kwargs):
+    if _flag(kwargs, "query", "q", default=False):
+        return [scene.evaluation]
+    scene.evaluation = _flag(kwargs, "mode", "m")
+    return [scene.evaluation]
+
+
+def evaluator(**kwargs):
+    if kwargs.get("name", kwargs.get("n")) != "cache":
+        raise RuntimeError("Only the cache evaluator is modelled.")
+    if _flag(kwargs, "query", "q", default=False):
+        return scene.cached_playback
+    scene.cached_playback = bool(_flag(kwargs, "enable", "en"))
+
+
+def autoKeyframe(**kwargs):
+    if _flag(kwargs, "query", "q", default=False):
+        return scene.auto_key
+    scene.auto_key = bool(_flag(kwargs, "state", "st"))
+
+
+def undo(*args, **kwargs):
+    if scene.undo_snapshots:
+        scene.restore(scene.undo_snapshots.pop())
+        scene.undo_names.pop()
+
+
+def loadPlugin(*args, **kwargs):
+    return list(args)
+
+
+def inViewMessage(**kwargs):
+    print(kwargs.get("amg", ""))
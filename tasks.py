@@ -0,0 +1,283 @@
+"""
+tasks.py
+Created: Sunday, 18th October 2026 8:40:17 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 8:40:21 pm
+Modified By: Matthew Riche
+"""
+
+# Cooperative, cancellable operations.  The long operations are written as generators that do
+# one block of work (a block of joints, vertices or frames) per step and yield their progress as
+# (label, done, total).  Run straight through with drain() they behave like plain functions, and
+# that's what the usual entry points (build_export_content(), bake_direct()...) do.  Wrapped in a
+# Task they can be stepped a few milliseconds at a time from a UI timer, cancelled and rolled back:
+#
+#   task = tasks.Task("Build", operations.iter_build_multi_export_content(["body"], "root"))
+#   while task.step():
+#       print(task.status())
+#   old_influences, new_influences = task.result
+#
+# Every time slice is an undo chunk of its own, so nothing the user does in Maya between slices
+# ends up inside the task's undo.  Rollback runs whatever restores the steps registered with
+# on_rollback(), undoes the task's chunks from the top of the undo queue (stopping at anything the
+# user did since, which stays) and deletes what's left of the nodes the steps registered with
+# created(), those made through the API included.
+#
+# Settings a generator wants while it works (an execution profile, see execution.py) are handed
+# to its task with hold(), and the task applies them around each time slice only, so nothing
+# stays switched while control is back with Maya.
+
+import contextlib
+import time
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# Block sizes the UI runs with, small enough to keep Maya responsive between steps.
+BLOCKS = {"joints": 50, "vertices": 20000, "frames": 10}
+
+_running = []
+
+
+def drain(steps):
+    """Runs a step generator to the end and hands back its return value."""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def running() -> bool:
+    """True while a task is stepping."""
+    return len(_running) > 0
+
+
+def current():
+    """The task stepping right now, or None."""
+    return _running[-1] if _running else None
+
+
+def created(nodes: list):
+    """Registers nodes the running task made, deleted if it's rolled back.  Does nothing when no
+    task is running.
+
+    Args:
+        nodes (list): Node names, as they'll be when the task is done with them.
+    """
+    if _running:
+        _running[-1].created.extend(nodes)
+
+
+def on_rollback(restore):
+    """Registers a function that puts back something the running task is about to change outside
+    of the undo queue.  Does nothing when no task is running.
+
+    Args:
+        restore (fn): Called with no arguments if the task is rolled back.
+    """
+    if _running:
+        _running[-1].restores.append(restore)
+
+
+class Task:
+    def __init__(self, label: str, steps, rollback: bool = True):
+        """A step generator run in time slices.
+
+        Args:
+            label (str): Name of the operation, for messages and the undo chunk.
+            steps (generator): Yields (label, done, total) and returns the result.
+            rollback (bool, optional): Undo everything the task did when it's cancelled or fails.
+            Defaults to True.
+        """
+        self.label = label
+        self.steps = steps
+        self.rollback = rollback
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.restores = []
+        self.created = []
+        self.held = None
+        self._scope = None
+
+        self.stage = label
+        self.done = 0
+        self.total = 0
+        self._stage_start = None
+        self._chunks = []
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, CANCELLED, FAILED)
+
+    @property
+    def fraction(self) -> float:
+        """Progress through the current stage, 0 to 1."""
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def eta(self) -> float:
+        """Estimated seconds left in the current stage, None until there's a rate to go by."""
+        if not self.done or self._stage_start is None:
+            return None
+        elapsed = time.perf_counter() - self._stage_start
+        return elapsed / self.done * max(self.total - self.done, 0)
+
+    def status(self) -> str:
+        """One line for a progress label."""
+        eta = self.eta
+        left = f", about {eta:.0f}s left" if eta is not None and eta >= 1.0 else ""
+        return f"{self.stage}: {self.done}/{self.total}{left}"
+
+    def _start(self):
+        self.state = RUNNING
+        self._stage_start = time.perf_counter()
+
+    def hold(self, scope):
+        """Keeps a context manager entered while the task's steps run and exited between time
+        slices, from now on.  Entered straight away when called from a step.
+
+        Args:
+            scope (fn): Makes the context manager, called again for every slice.  None drops the
+            one held, exiting it.
+        """
+        self._leave()
+        self.held = scope
+        if self in _running:
+            self._enter()
+
+    def _enter(self):
+        if self.held is not None and self._scope is None:
+            scope = contextlib.ExitStack()
+            scope.enter_context(self.held())
+            self._scope = scope
+
+    def _leave(self):
+        if self._scope is not None:
+            scope, self._scope = self._scope, None
+            scope.close()
+
+    def _open_chunk(self) -> str:
+        """Opens the undo chunk of a time slice, named uniquely among the task's chunks."""
+        import maya.cmds as cmds
+
+        if not self.rollback:
+            return None
+        name = f"febex {self.label} {len(self._chunks) + 1}"
+        cmds.undoInfo(openChunk=True, chunkName=name)
+        return name
+
+    def _close_chunk(self, name: str):
+        """Closes a slice's chunk and remembers it, unless nothing was recorded in it."""
+        import maya.cmds as cmds
+
+        if name is None:
+            return
+        cmds.undoInfo(closeChunk=True)
+        if cmds.undoInfo(query=True, undoName=True) == name:
+            self._chunks.append(name)
+
+    def step(self, budget: float = 0.05) -> bool:
+        """Runs steps for about budget seconds.
+
+        Args:
+            budget (float, optional): Seconds to work before handing control back.  A step that
+            takes longer isn't interrupted.  Defaults to 0.05.
+
+        Returns:
+            bool: True while there's more to do.
+        """
+        if self.finished:
+            return False
+        if self.state == PENDING:
+            self._start()
+
+        deadline = time.perf_counter() + budget
+        _running.append(self)
+        chunk = self._open_chunk()
+        try:
+            self._enter()
+            # At least one step per call, however small the budget.
+            while True:
+                stage, done, total = next(self.steps)
+                if stage != self.stage:
+                    self.stage = stage
+                    self._stage_start = time.perf_counter()
+                self.done, self.total = done, total
+                if time.perf_counter() >= deadline:
+                    break
+        except StopIteration as stop:
+            self.result = stop.value
+            self.state = DONE
+        except Exception as error:
+            self.error = error
+            self.state = FAILED
+        finally:
+            self._leave()
+            _running.pop()
+            self._close_chunk(chunk)
+
+        if self.state == FAILED:
+            self._undo()
+        return not self.finished
+
+    def run(self, verbose: bool = False):
+        """Runs the task to the end, for scripts.
+
+        Args:
+            verbose (bool, optional): Print the status about once a second.  Defaults to False.
+
+        Raises:
+            Exception: Whatever stopped the task, after it has been rolled back.
+
+        Returns:
+            Whatever the step generator returns.
+        """
+        last = time.perf_counter()
+        while self.step():
+            if verbose and time.perf_counter() - last >= 1.0:
+                last = time.perf_counter()
+                print(self.status())
+        if self.state == FAILED:
+            raise self.error
+        return self.result
+
+    def cancel(self):
+        """Stops the task and puts the scene back the way it was before it started."""
+        if self.finished:
+            return
+        started = self.state == RUNNING
+        self.state = CANCELLED
+        if started:
+            self._undo()
+        print(f"{self.label} cancelled.")
+
+    def _undo(self):
+        import maya.cmds as cmds
+
+        self.steps.close()
+        if not self.rollback:
+            return
+
+        for restore in reversed(self.restores):
+            restore()
+
+        # Only ever the task's own chunks, newest first, while they're on top of the queue.
+        while self._chunks and cmds.undoInfo(query=True, undoName=True) == self._chunks[-1]:
+            cmds.undo()
+            self._chunks.pop()
+        if self._chunks:
+            print(
+                f"{len(self._chunks)} steps of {self.label} are under later edits in the undo "
+                f"queue and weren't undone, their nodes are deleted instead."
+            )
+
+        # Nodes made through the API aren't in the undo queue, nor those of the chunks left.
+        leftovers = cmds.ls(list(reversed(self.created))) if self.created else []
+        if leftovers:
+            cmds.delete(leftovers)
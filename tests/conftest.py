@@ -0,0 +1,21 @@
+"""
+conftest.py
+Created: Sunday, 18th October 2026 4:12:40 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 4:12:40 pm
+Modified By: Matthew Riche
+"""
+
+# Makes the checkout importable as febex, which means it has to be checked out in a folder named
+# febex, as the batch workers import it by that name too.  Tests run on the stand-in maya.cmds,
+# registered here before any test module imports febex modules that need it.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from febex import batch  # noqa: E402
+from febex import standin  # noqa: E402
+
+batch.install_cmds(standin)
@@ -0,0 +1,76 @@
+"""
+test_batch.py
+Created: Sunday, 18th October 2026 4:12:40 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 4:12:40 pm
+Modified By: Matthew Riche
+"""
+
+# run_batch() end to end: every job runs in a real worker process on the stand-in maya.cmds.
+
+import json
+import sys
+
+from febex import batch
+
+SCENE = "synthetic:joints=10,verts=200,meshes=1"
+
+
+def _job(name: str = "small", **kwargs) -> batch.Job:
+    return batch.Job(name, SCENE, "mesh0", "joint0", **kwargs)
+
+
+def _runner() -> batch.SubprocessRunner:
+    return batch.SubprocessRunner(sys.executable, "febex.standin")
+
+
+def test_passing_job():
+    summary = batch.run_batch([_job()], runner=_runner(), timeout=120)
+
+    assert summary["totals"] == {batch.OK: 1}
+    result = summary["jobs"][0]
+    assert result["name"] == "small"
+    assert result["attempts"] == 1
+    assert result["details"]["exported_influences"] > 0
+    assert result["details"]["verify"]["passed"]
+
+
+def test_job_that_times_out():
+    summary = batch.run_batch([_job()], runner=_runner(), timeout=0.01, retries=1)
+
+    assert summary["totals"] == {batch.TIMEOUT: 1}
+    assert summary["jobs"][0]["attempts"] == 2
+
+
+def test_job_that_is_retried():
+    runner = _runner()
+    calls = []
+
+    def flaky(job: batch.Job, timeout: float) -> dict:
+        calls.append(job.name)
+        if len(calls) == 1:
+            raise RuntimeError("Lost the worker.")
+        return runner(job, timeout)
+
+    summary = batch.run_batch([_job()], runner=flaky, timeout=120, retries=1)
+
+    assert summary["totals"] == {batch.OK: 1}
+    assert summary["jobs"][0]["attempts"] == 2
+    assert calls == ["small", "small"]
+
+
+def test_summary_file(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    summary = tmp_path / "summary.json"
+    jobs = [_job().to_dict(), dict(_job("broken").to_dict(), mesh="missing_mesh")]
+    manifest.write_text(json.dumps({"workers": 2, "timeout": 120, "jobs": jobs}))
+
+    argv = [str(manifest), "--summary", str(summary), "--mayapy", sys.executable]
+    assert batch.main(argv + ["--standin", "febex.standin"]) == 1
+
+    written = json.loads(summary.read_text())
+    assert written["totals"] == {batch.OK: 1, batch.FAILED: 1}
+    results = {result["name"]: result for result in written["jobs"]}
+    assert results["small"]["status"] == batch.OK
+    assert results["broken"]["status"] == batch.FAILED
+    assert "missing_mesh" in results["broken"]["error"]
@@ -0,0 +1,86 @@
+"""
+test_weights.py
+Created: Sunday, 18th October 2026 4:40:02 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 4:40:02 pm
+Modified By: Matthew Riche
+"""
+
+# Weight tables and fingerprints through MemoryWeightBackend, no scene needed for the weights.
+
+import numpy as np
+
+from febex import benchmark
+from febex import fingerprint
+from febex import weights
+from febex.skeleton import HierarchyIndex
+
+INFLUENCES = ["joint0", "joint1", "joint2", "joint3"]
+
+
+def _backend(seed: int = 0) -> weights.MemoryWeightBackend:
+    rng = np.random.default_rng(seed)
+    table = rng.random((30, len(INFLUENCES))) * (rng.random((30, len(INFLUENCES))) > 0.4)
+    table[:, 0] += 0.01
+    backend = weights.MemoryWeightBackend()
+    backend.add_cluster("skinCluster1", INFLUENCES, weights.normalize_rows(table))
+    backend.add_mesh("mesh0", rng.random((30, 3)), np.array([[0, 1, 2], [2, 1, 3]]))
+    return backend
+
+
+def test_sparse_round_trip():
+    backend = _backend()
+    dense, _ = backend.read("skinCluster1")
+
+    skin_weights = weights.SkinWeights.read("skinCluster1", backend=backend)
+    np.testing.assert_allclose(skin_weights.to_dense(), dense)
+
+    conditioned, _ = weights.condition_sparse(skin_weights, max_influences=2)
+    conditioned.store("skinCluster1", backend=backend)
+    assert backend.writes == 1
+    assert (backend.read("skinCluster1")[0] > 0.0).sum(axis=1).max() <= 2
+
+
+def test_condition_sparse_matches_dense():
+    skin_weights = weights.SkinWeights.read("skinCluster1", backend=_backend(1))
+
+    dense, dense_stats = weights.condition_weights(
+        skin_weights.to_dense(), max_influences=2, prune_below=0.2
+    )
+    sparse, sparse_stats = weights.condition_sparse(skin_weights, max_influences=2, prune_below=0.2)
+
+    np.testing.assert_allclose(sparse.to_dense(), dense)
+    assert sparse_stats["histogram_after"] == dense_stats["histogram_after"]
+    assert np.isclose(sparse_stats["max_vertex_error"], dense_stats["max_vertex_error"])
+
+
+def test_mesh_prints_follow_the_weights():
+    backend = _backend()
+    prints = fingerprint.mesh_prints("mesh0", "skinCluster1", INFLUENCES, {}, backend=backend)
+    assert prints == fingerprint.mesh_prints(
+        "mesh0", "skinCluster1", INFLUENCES, {}, backend=backend
+    )
+
+    table, _ = backend.read("skinCluster1")
+    backend.write("skinCluster1", table[:, ::-1], INFLUENCES)
+    changed = fingerprint.mesh_prints("mesh0", "skinCluster1", INFLUENCES, {}, backend=backend)
+    assert changed["weights"] != prints["weights"]
+    assert changed["geometry"] == prints["geometry"]
+
+
+def test_skeleton_prints_follow_the_bind_matrices():
+    made = benchmark._open({"joints": 6, "verts": 50, "meshes": 1})
+    influences = made["influences"]
+    index = HierarchyIndex(made["top_joint"], influences)
+    table = np.full((4, len(influences)), 1.0 / len(influences))
+
+    backend = weights.MemoryWeightBackend()
+    backend.add_cluster("skinCluster1", influences, table)
+    prints = fingerprint.skeleton_prints(index, ["skinCluster1"], backend=backend)
+
+    moved = np.identity(4)
+    moved[3, :3] = (0.0, 2.0, 0.0)
+    backend.add_cluster("skinCluster1", influences, table, {influences[-1]: moved})
+    changed = fingerprint.skeleton_prints(index, ["skinCluster1"], backend=backend)
+
+    assert [joint for joint in prints if prints[joint] != changed[joint]] == [influences[-1]]
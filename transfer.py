@@ -0,0 +1,384 @@
+"""
+transfer.py
+Created: Sunday, 18th October 2026 10:02:17 am
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 10:02:21 am
+Modified By: Matthew Riche
+"""
+
+# Closest-point weight transfer between meshes that don't share topology (LODs, cleaned up export
+# meshes).  A uniform grid is built once over the source points and triangles, then every
+# destination vertex is resolved in batches with numpy.
+#
+# Like weights.py, Maya is only imported by the function that reads meshes out of the scene.
+
+import numpy as np
+
+
+CLOSEST_VERTEX = "closestVertex"
+BARYCENTRIC = "barycentric"
+K_NEAREST = "kNearest"
+MODES = (CLOSEST_VERTEX, BARYCENTRIC, K_NEAREST)
+
+# Upper bound on (queries x candidates) handled in one numpy pass, keeps memory flat.
+_BATCH_ELEMENTS = 1 << 20
+
+
+class _Grid:
+    def __init__(self, box_lo: np.ndarray, box_hi: np.ndarray, per_cell: float = 4.0):
+        """Uniform grid over a set of axis-aligned boxes (points are boxes with no size).  Every
+        item is listed in each cell its box touches, cell contents stored CSR style.
+
+        Args:
+            box_lo (np.ndarray): (n, 3) lower corners.
+            box_hi (np.ndarray): (n, 3) upper corners.
+            per_cell (float, optional): Rough number of items wanted per cell.  Defaults to 4.
+        """
+        self.count = len(box_lo)
+        lo = box_lo.min(axis=0)
+        hi = box_hi.max(axis=0)
+        extent = np.maximum(hi - lo, 1e-9)
+        flat_floor = extent.max() * 1e-3
+        volume = np.prod(np.maximum(extent, flat_floor))
+
+        cell = np.cbrt(volume * per_cell / max(self.count, 1))
+        # Cells smaller than the average item would list every item many times over.
+        cell = max(cell, float((box_hi - box_lo).max(axis=1).mean()), 1e-9)
+
+        self.origin = lo
+        self.cell = cell
+        self.dims = np.maximum(np.ceil(extent / cell).astype(np.int64), 1)
+        self.cell_total = int(np.prod(self.dims))
+
+        c0 = self._clipped(box_lo)
+        spans = self._clipped(box_hi) - c0 + 1
+        per_item = np.prod(spans, axis=1)
+        item = np.repeat(np.arange(self.count), per_item)
+        local = np.arange(item.size) - np.repeat(np.cumsum(per_item) - per_item, per_item)
+        sx = spans[item, 0]
+        sy = spans[item, 1]
+        coords = np.stack(
+            (
+                c0[item, 0] + local % sx,
+                c0[item, 1] + (local // sx) % sy,
+                c0[item, 2] + local // (sx * sy),
+            ),
+            axis=1,
+        )
+        keys = self._key(coords)
+        order = np.argsort(keys, kind="stable")
+        self.items = item[order]
+        self.starts = np.searchsorted(keys[order], np.arange(self.cell_total + 1))
+
+    def _coords(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell).astype(np.int64)
+
+    def _clipped(self, points: np.ndarray) -> np.ndarray:
+        return np.clip(self._coords(points), 0, self.dims - 1)
+
+    def _key(self, coords: np.ndarray) -> np.ndarray:
+        return (coords[..., 2] * self.dims[1] + coords[..., 1]) * self.dims[0] + coords[..., 0]
+
+    def covers(self, ring: int) -> bool:
+        """True once a ring is big enough that gathering cells costs more than listing it all."""
+        return (2 * ring + 1) ** 3 >= self.cell_total
+
+    def gather(self, points: np.ndarray, ring: int) -> np.ndarray:
+        """Candidates for each point from the cube of cells ring cells out from its own.
+
+        Returns:
+            np.ndarray: (points, max candidates) item ids, padded with -1.
+        """
+        if self.covers(ring):
+            return np.broadcast_to(np.arange(self.count), (len(points), self.count))
+
+        steps = np.arange(-ring, ring + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        cells = self._clipped(points)[:, None, :] + offsets[None, :, :]
+        valid = np.all((cells >= 0) & (cells < self.dims), axis=2)
+        keys = np.where(valid, self._key(np.clip(cells, 0, self.dims - 1)), 0)
+
+        starts = self.starts[keys]
+        counts = np.where(valid, self.starts[keys + 1] - starts, 0)
+
+        lengths = counts.ravel()
+        per_point = counts.sum(axis=1)
+        width = max(int(per_point.max()) if len(per_point) else 0, 1)
+        owner = np.repeat(np.arange(len(points)), per_point)
+        first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        flat = np.arange(lengths.sum())
+        source = np.repeat(starts.ravel(), lengths) + flat - first
+        column = flat - np.repeat(np.cumsum(per_point) - per_point, per_point)
+
+        candidates = np.full((len(points), width), -1, dtype=np.int64)
+        candidates[owner, column] = self.items[source]
+        return candidates
+
+    def guarantee(self, points: np.ndarray, ring: int) -> np.ndarray:
+        """Distance within which a ring search is known to have seen every item."""
+        if self.covers(ring):
+            return np.full(len(points), np.inf)
+        cells = self._clipped(points)
+        lower = self.origin + (cells - ring) * self.cell
+        upper = self.origin + (cells + ring + 1) * self.cell
+        below = np.where(cells - ring > 0, points - lower, np.inf)
+        above = np.where(cells + ring < self.dims - 1, upper - points, np.inf)
+        return np.minimum(below, above).min(axis=1)
+
+    def nearest(self, points: np.ndarray, sqdist, k: int = 1) -> tuple:
+        """The k nearest items to every point, by an item distance function.
+
+        Args:
+            points (np.ndarray): (q, 3) query points.
+            sqdist (fn): Takes (p, 3) points and (p, c) candidate ids, returns (p, c) squared
+            distances.
+            k (int, optional): Number of items to find per point.  Defaults to 1.
+
+        Returns:
+            tuple: ((q, k) item ids, (q, k) squared distances), closest first.
+        """
+        k = min(k, self.count)
+        found = np.full((len(points), k), -1, dtype=np.int64)
+        found_sq = np.full((len(points), k), np.inf)
+
+        pending = np.arange(len(points))
+        ring = 1
+        while pending.size:
+            width = self.count if self.covers(ring) else (2 * ring + 1) ** 3 * 4
+            batch = max(_BATCH_ELEMENTS // max(width, 1), 1)
+            still = []
+            for start in range(0, pending.size, batch):
+                rows = pending[start : start + batch]
+                candidates = self.gather(points[rows], ring)
+                if candidates.shape[1] < k:
+                    pad = np.full((len(rows), k - candidates.shape[1]), -1, dtype=np.int64)
+                    candidates = np.concatenate((candidates, pad), axis=1)
+
+                dist = np.where(candidates >= 0, sqdist(points[rows], candidates), np.inf)
+                best = np.argpartition(dist, k - 1, axis=1)[:, :k]
+                best_sq = np.take_along_axis(dist, best, axis=1)
+                order = np.argsort(best_sq, axis=1)
+                best = np.take_along_axis(best, order, axis=1)
+                best_sq = np.take_along_axis(best_sq, order, axis=1)
+
+                reach = self.guarantee(points[rows], ring)
+                done = best_sq[:, -1] <= reach**2
+                if self.covers(ring):
+                    done[:] = True
+                found[rows[done]] = np.take_along_axis(candidates, best, axis=1)[done]
+                found_sq[rows[done]] = best_sq[done]
+                still.append(rows[~done])
+
+            pending = np.concatenate(still)
+            ring *= 2
+
+        return found, found_sq
+
+
+def closest_point_on_triangles(
+    points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray
+) -> tuple:
+    """Closest point on triangles (a, b, c) to points, all arrays broadcast together.  This is the
+    region test from Ericson's Real-Time Collision Detection, vectorized with np.select.
+
+    Returns:
+        tuple: (squared distances, barycentric coordinates with a trailing axis of 3).
+    """
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    bp = points - b
+    cp = points - c
+    d1 = np.einsum("...i,...i", ab, ap)
+    d2 = np.einsum("...i,...i", ac, ap)
+    d3 = np.einsum("...i,...i", ab, bp)
+    d4 = np.einsum("...i,...i", ac, bp)
+    d5 = np.einsum("...i,...i", ab, cp)
+    d6 = np.einsum("...i,...i", ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_ab = d1 / (d1 - d3)
+        t_ac = d2 / (d2 - d6)
+        t_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        denom = 1.0 / (va + vb + vc)
+        v_in = vb * denom
+        w_in = vc * denom
+
+    regions = [
+        (d1 <= 0) & (d2 <= 0),
+        (d3 >= 0) & (d4 <= d3),
+        (vc <= 0) & (d1 >= 0) & (d3 <= 0),
+        (d6 >= 0) & (d5 <= d6),
+        (vb <= 0) & (d2 >= 0) & (d6 <= 0),
+        (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0),
+    ]
+    zero = np.zeros_like(d1)
+    one = np.ones_like(d1)
+    v = np.select(regions, [zero, one, t_ab, zero, zero, 1.0 - t_bc], v_in)
+    w = np.select(regions, [zero, zero, zero, one, t_ac, t_bc], w_in)
+
+    # Zero-area triangles can fall through every region with a 0/0, snap those to the first corner.
+    broken = ~(np.isfinite(v) & np.isfinite(w))
+    v = np.where(broken, 0.0, v)
+    w = np.where(broken, 0.0, w)
+    bary = np.stack((1.0 - v - w, v, w), axis=-1)
+
+    closest = a + ab * v[..., None] + ac * w[..., None]
+    offset = points - closest
+    return np.einsum("...i,...i", offset, offset), bary
+
+
+class SurfaceIndex:
+    def __init__(self, points: np.ndarray, triangles: np.ndarray):
+        """Spatial index over a source mesh.  Build it once and reuse it for as many destination
+        meshes as needed, the point and triangle grids are built the first time a mode needs them.
+
+        Args:
+            points (np.ndarray): (n, 3) world space vertex positions.
+            triangles (np.ndarray): (t, 3) vertex indices per triangle.
+        """
+        self.points = np.asarray(points, dtype=np.float64)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self._point_grid = None
+        self._triangle_grid = None
+
+    @property
+    def point_grid(self) -> _Grid:
+        if self._point_grid is None:
+            self._point_grid = _Grid(self.points, self.points)
+        return self._point_grid
+
+    @property
+    def triangle_grid(self) -> _Grid:
+        if self._triangle_grid is None:
+            corners = self.points[self.triangles]
+            self._triangle_grid = _Grid(corners.min(axis=1), corners.max(axis=1), per_cell=2.0)
+        return self._triangle_grid
+
+    def _point_sqdist(self, queries: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        offset = self.points[candidates] - queries[:, None, :]
+        return np.einsum("...i,...i", offset, offset)
+
+    def _triangle_sqdist(self, queries: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        corners = self.points[self.triangles[candidates]]
+        sq, _ = closest_point_on_triangles(
+            queries[:, None, :], corners[..., 0, :], corners[..., 1, :], corners[..., 2, :]
+        )
+        return sq
+
+    def closest_vertices(self, queries: np.ndarray, k: int = 1) -> tuple:
+        """Returns ((q, k) source vertex ids, (q, k) distances), closest first."""
+        queries = np.asarray(queries, dtype=np.float64)
+        ids, sq = self.point_grid.nearest(queries, self._point_sqdist, k)
+        return ids, np.sqrt(sq)
+
+    def closest_points(self, queries: np.ndarray) -> tuple:
+        """Closest point on the source surface for every query point.
+
+        Returns:
+            tuple: ((q, 3) vertex ids of the hit triangle, (q, 3) barycentric weights,
+            (q,) distances).
+        """
+        queries = np.asarray(queries, dtype=np.float64)
+        tri, sq = self.triangle_grid.nearest(queries, self._triangle_sqdist)
+        corners = self.points[self.triangles[tri[:, 0]]]
+        _, bary = closest_point_on_triangles(queries, corners[:, 0], corners[:, 1], corners[:, 2])
+        return self.triangles[tri[:, 0]], bary, np.sqrt(sq[:, 0])
+
+    def transfer(
+        self, src_weights: np.ndarray, queries: np.ndarray, mode: str = BARYCENTRIC, k: int = 4
+    ) -> np.ndarray:
+        """Samples a per-vertex weight table of the source mesh at every query point.
+
+        Args:
+            src_weights (np.ndarray): (n, influences) weights of the source vertices.
+            queries (np.ndarray): (q, 3) destination vertex positions.
+            mode (str, optional): CLOSEST_VERTEX copies the nearest vertex's weights, BARYCENTRIC
+            blends the closest triangle's corners, K_NEAREST blends the k nearest vertices by
+            inverse distance.  Defaults to BARYCENTRIC.
+            k (int, optional): Vertex count for K_NEAREST.  Defaults to 4.
+
+        Raises:
+            ValueError: Unknown mode, or weights that don't line up with the source points.
+
+        Returns:
+            np.ndarray: (q, influences) normalized weights.
+        """
+        if len(src_weights) != len(self.points):
+            raise ValueError(
+                f"Got {len(src_weights)} weight rows for {len(self.points)} source vertices."
+            )
+
+        ids, factors = self.factors(queries, mode, k)
+        blended = np.einsum("qc,qci->qi", factors, np.asarray(src_weights)[ids])
+
+        totals = blended.sum(axis=1, keepdims=True)
+        return np.divide(blended, totals, out=np.zeros_like(blended), where=totals > 0.0)
+
+    def factors(self, queries: np.ndarray, mode: str = BARYCENTRIC, k: int = 4) -> tuple:
+        """The source vertices each query point blends and by how much, see transfer().  Lets a
+        sparse table (weights.SkinWeights.blend()) be sampled without a dense copy.
+
+        Args:
+            queries (np.ndarray): (q, 3) destination vertex positions.
+            mode (str, optional): See transfer().  Defaults to BARYCENTRIC.
+            k (int, optional): Vertex count for K_NEAREST.  Defaults to 4.
+
+        Raises:
+            ValueError: Unknown mode.
+
+        Returns:
+            tuple: ((q, c) int64 source vertex ids, (q, c) float64 factors), c being 1, 3 or k.
+        """
+        if mode not in MODES:
+            raise ValueError(f"{mode} isn't a transfer mode, use one of {MODES}.")
+
+        if mode == CLOSEST_VERTEX:
+            ids, _ = self.closest_vertices(queries)
+            ids = ids[:, :1]
+            return ids, np.ones(ids.shape)
+        if mode == BARYCENTRIC:
+            corners, bary, _ = self.closest_points(queries)
+            return corners, bary
+
+        ids, dist = self.closest_vertices(queries, k)
+        # A query sitting on a vertex takes that vertex outright rather than dividing by zero.
+        inverse = 1.0 / np.maximum(dist, 1e-12)
+        inverse /= inverse.sum(axis=1, keepdims=True)
+        return ids, inverse
+
+
+def mesh_arrays(mesh: str, rest: bool = False) -> tuple:
+    """Reads world space points and triangulation of a mesh from the scene through the API.
+
+    Args:
+        mesh (str): Mesh shape or transform node.
+        rest (bool, optional): Read the undeformed points instead, those of the original shape
+        under the mesh's deformers, in object space.  They don't change with the pose or the
+        current frame.  Defaults to False.
+
+    Returns:
+        tuple: ((n, 3) float64 points, (t, 3) int64 triangle vertex ids).
+    """
+    import maya.api.OpenMaya as om
+    import maya.cmds as cmds
+
+    space = om.MSpace.kWorld
+    if rest:
+        space = om.MSpace.kObject
+        # "bodyShapeOrig.outMesh", or nothing when the mesh isn't deformed.
+        original = (cmds.deformableShape(mesh, originalGeometry=True) or [""])[0]
+        mesh = original.split(".")[0] or mesh
+
+    sel = om.MSelectionList()
+    sel.add(mesh)
+    mesh_fn = om.MFnMesh(sel.getDagPath(0))
+
+    points = np.array(mesh_fn.getPoints(space), dtype=np.float64)[:, :3]
+    _, tri_verts = mesh_fn.getTriangles()
+    triangles = np.array(tri_verts, dtype=np.int64).reshape(-1, 3)
+
+    return points, triangles
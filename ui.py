@@ -14,7 +14,10 @@ import os
 from PySide2 import QtCore, QtWidgets as qtw, QtGui, QtUiTools
 from shiboken2 import wrapInstance
 
+from . import nodecache
 from . import operations as ops
+from . import session
+from . import tasks
 
 
 def maya_main_window():
@@ -34,6 +37,9 @@ class Febex_Ui(qtw.QDialog):
         self.setWindowTitle(f"FeBeX v{1.0}")
 
         self.state = UiState()
+        self._task = None
+        self._task_done = None
+        self._task_timer = None
 
         self.setWindowFlags(self.windowFlags() ^ QtCore.Qt.WindowContextHelpButtonHint)
 
@@ -84,6 +90,14 @@ class Febex_Ui(qtw.QDialog):
             qtw.QWidget, "verticalLayoutWidget"
         )
 
+        self.Task_QProgressBar_QProgressBar = self.findChild(
+            qtw.QProgressBar, "Task_QProgressBar"
+        )
+        self.TaskStatus_QLabel_QLabel = self.findChild(qtw.QLabel, "TaskStatus_QLabel")
+        self.Cancel_QPushButton_QPushButton = self.findChild(
+            qtw.QPushButton, "Cancel_QPushButton"
+        )
+
         self.Version_QLabel_QLabel = self.findChild(qtw.QLabel, "Version_QLabel")
         self.Authorship_QLabel_QLabel = self.findChild(qtw.QLabel, "Authorship_QLabel")
 
@@ -112,27 +126,114 @@ class Febex_Ui(qtw.QDialog):
             lambda: self._bake_skeleton()
         )
 
+        self.Cancel_QPushButton_QPushButton.clicked.connect(
+            lambda: self._cancel_task()
+        )
+
+        self._load_session()
+
         self.show()
         self._validate_bake_button()
         self._validate_export_rig_button()
 
+    def _load_session(self):
+        """Picks up where the last build in this scene left off, if it stored a session."""
+        stored = session.find(ops.EXPORT_GROUP)
+        if stored is None:
+            return
+        self.state.load_session(stored)
+        if stored.meshes:
+            self.SelectedMesh_QLineEdit_QLineEdit.setText(list(stored.meshes)[0])
+        self.SelectedJoint_QLineEdit_QLineEdit.setText(stored.top_joint)
+        print(f"Loaded the export rig of {stored.top_joint} from the scene.")
+
     def _build_export_rig(self):
-        """Wraps the operations.build_export_content() function.
+        """Wraps the operations.build_export_content() function, run as a task so Maya stays
+        responsive.
         """        
-        infs = ops.build_export_content(
-            self.state.selected_mesh, self.state.selected_joint
+        steps = ops.iter_build_multi_export_content(
+            [self.state.selected_mesh], self.state.selected_joint, blocks=tasks.BLOCKS
         )
+        self._start_task(tasks.Task("Build Export Rig", steps), self._export_rig_built)
+
+    def _export_rig_built(self, infs: tuple):
         self.state.old_influence_list = infs[0]
         self.state.new_influence_list = infs[1]
-        self._validate_bake_button()
 
     def _bake_skeleton(self):
-        """Wraps the operations.bake_animated_skeleton() function.
+        """Wraps the operations.bake_animated_skeleton() function, run as a task in blocks of
+        frames.
         """        
         print(f"Reviewing state:\n{self.state.old_influence_list}\n{self.state.new_influence_list}")
-        ops.bake_animated_skeleton(
-            self.state.old_influence_list, self.state.new_influence_list
+        steps = ops.iter_bake_animated_skeleton(
+            self.state.old_influence_list,
+            self.state.new_influence_list,
+            block=tasks.BLOCKS["frames"],
         )
+        self._start_task(tasks.Task("Bake", steps), None)
+
+    def _start_task(self, task: tasks.Task, on_done):
+        """Steps a task from a timer, a slice at a time between UI events.
+
+        Args:
+            task (tasks.Task): What to run.
+            on_done (fn): Called with the task's result if it finishes, or None.
+        """
+        self._task = task
+        self._task_done = on_done
+        self.BuildExportRig_QPushButton_QPushButton.setEnabled(False)
+        self.BakeAnim_QPushButton_QPushButton.setEnabled(False)
+        self.Cancel_QPushButton_QPushButton.setEnabled(True)
+        self.Task_QProgressBar_QProgressBar.setValue(0)
+        self.TaskStatus_QLabel_QLabel.setText(task.label)
+
+        self._task_timer = QtCore.QTimer(self)
+        self._task_timer.timeout.connect(self._step_task)
+        self._task_timer.start(0)
+
+    def _step_task(self):
+        task = self._task
+        if task is None:
+            return
+        if task.step():
+            self.Task_QProgressBar_QProgressBar.setValue(int(task.fraction * 1000))
+            self.TaskStatus_QLabel_QLabel.setText(task.status())
+            return
+
+        if task.state == tasks.DONE:
+            if self._task_done is not None:
+                self._task_done(task.result)
+            message = f"{task.label} finished."
+        else:
+            message = f"{task.label} failed and was undone: {task.error}"
+            print(message)
+        self._finish_task(message)
+
+    def _cancel_task(self):
+        """Stops the running task and rolls the scene back."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._finish_task(f"{self._task.label} cancelled.")
+
+    def closeEvent(self, event):
+        """Closing the window mid-task cancels the task rather than leaving it half done."""
+        self._cancel_task()
+        super(Febex_Ui, self).closeEvent(event)
+
+    def _finish_task(self, message: str):
+        self._task_timer.stop()
+        self._task_timer = None
+        self._task = None
+        self._task_done = None
+
+        self.Cancel_QPushButton_QPushButton.setEnabled(False)
+        self.Task_QProgressBar_QProgressBar.setValue(0)
+        self.TaskStatus_QLabel_QLabel.setText("")
+        cmds.inViewMessage(amg=f"<hl>{message}</hl>", pos="midCenter", fade=True)
+
+        self._validate_bake_button()
+        self._validate_export_rig_button()
 
     def _get_selection(self, type: int):
         """Populates a lineedit field with something selected from the scene.
@@ -158,8 +259,9 @@ class Febex_Ui(qtw.QDialog):
                 )
                 return
 
+        selection_type = nodecache.current().type(selection[0])
         if type == 0:
-            if cmds.objectType(selection[0]) not in ["mesh", "transform"]:
+            if selection_type not in ["mesh", "transform"]:
                 cmds.inViewMessage(
                     amg="<hl>Selection must be geo or a transform node.</hl>",
                     pos="midCenter",
@@ -167,7 +269,7 @@ class Febex_Ui(qtw.QDialog):
                 )
                 return
         elif type == 1:
-            if cmds.objectType(selection[0]) != "joint":
+            if selection_type != "joint":
                 cmds.inViewMessage(
                     amg="<hl>Selection must be a joint.</hl>",
                     pos="midCenter",
@@ -186,7 +288,7 @@ class Febex_Ui(qtw.QDialog):
         """Based on context, determine if the bake button should be usable.
         """        
         valid = True
-        if cmds.objExists("export_group") == False:
+        if nodecache.current().exists(ops.EXPORT_GROUP) == False:
             valid = False
 
         self.BakeAnim_QPushButton_QPushButton.setEnabled(valid)
@@ -201,10 +303,10 @@ class Febex_Ui(qtw.QDialog):
         joint_object = self.SelectedJoint_QLineEdit_QLineEdit.text()
 
         if mesh_object not in [None, ""] and joint_object not in [None, ""]:
-            if (
-                cmds.objExists(mesh_object) == False
-                or cmds.objExists(joint_object) == False
-            ):
+            # Both fields are checked with one scene query.
+            nodes = nodecache.current()
+            nodes.prefetch([mesh_object, joint_object])
+            if nodes.exists(mesh_object) == False or nodes.exists(joint_object) == False:
                 valid = False
                 cmds.inViewMessage(
                     amg="<hl>Specified Objects not found in scene.</hl>",
@@ -213,7 +315,7 @@ class Febex_Ui(qtw.QDialog):
                 )
 
             else:
-                if cmds.objectType(mesh_object) not in ["mesh", "transform"]:
+                if nodes.type(mesh_object) not in ["mesh", "transform"]:
                     cmds.inViewMessage(
                         amg=f"<hl>{mesh_object} isn't a mesh.</hl>",
                         pos="midCenter",
@@ -221,7 +323,7 @@ class Febex_Ui(qtw.QDialog):
                     )
                     valid = False
 
-                if cmds.objectType(joint_object) != "joint":
+                if nodes.type(joint_object) != "joint":
                     cmds.inViewMessage(
                         amg=f"<hl>{joint_object} isn't a joint.</hl>",
                         pos="midCenter",
@@ -300,3 +402,12 @@ class UiState:
     @old_influence_list.setter
     def old_influence_list(self, value):
         self._old_inf_list = value
+
+    def load_session(self, stored: session.Session):
+        """Takes the influence lists of a stored session.
+
+        Args:
+            stored (session.Session): From session.load().
+        """
+        self._old_inf_list = list(stored.old_influences)
+        self._new_inf_list = list(stored.new_influences)
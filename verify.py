@@ -0,0 +1,605 @@
+"""
+verify.py
+Created: Monday, 19th October 2026 12:48:10 am
+Matthew Riche
+Last Modified: Monday, 19th October 2026 12:48:15 am
+Modified By: Matthew Riche
+"""
+
+# Checks a bake.  The world matrices of the source joints and their export copies are sampled over
+# the frame range, a block of frames at a time, and compared all at once: per joint and frame, the
+# distance between the two positions and the angle between the two orientations.  Flips from
+# rotation filtering, constraint offsets and joints that moved under a new parent all show up as a
+# joint off its source, long before the engine.
+#
+#   report = verify.verify_bake(old_influences)
+#   if not report["passed"]:
+#       print(report["worst"][0])
+#
+# By default checking stops after the first block of frames with an error over tolerance, the
+# worst offenders so far are enough to see what went wrong.  Batch jobs check every STRIDE-th
+# frame (and the last), a baked frame is keyed on its own so a bad one rarely comes alone.
+#
+# The export meshes are checked the same way, deformed against their source meshes: weights from a
+# closest-point transfer or a skeleton with merged joints (see reduction.py) deform a little
+# differently.  Frames are picked adaptively, a few spread over the range first, then more where
+# the deviation is large, so long takes cost no more than short ones.  Vertices off by more than
+# the tolerance are grouped into connected regions, optionally as Maya sets:
+#
+#   report = verify.diff_meshes(["body", "head"], make_sets=True)
+
+import json
+
+import numpy as np
+
+from . import bake
+from . import execution
+from . import profiling
+from . import tasks
+from . import weights
+from .mesh import MeshData
+
+
+# Largest errors a bake passes with: scene units and degrees.  Loose enough for reduced keys.
+POSITION_TOLERANCE = 0.1
+ROTATION_TOLERANCE = 0.5
+
+# Frames sampled per block, so checking can stop early.
+BLOCK = 50
+
+# Every how many frames batch jobs check.
+STRIDE = 4
+
+# Joints listed in a report.
+WORST = 10
+
+# Largest distance an export mesh's vertex may be from the source's, in scene units.
+MESH_TOLERANCE = 0.1
+
+# Frames a mesh diff samples first, at most in all, and per refinement step.
+INITIAL_FRAMES = 9
+MAX_FRAMES = 48
+REFINE_FRAMES = 8
+
+# Percentiles of the per vertex deviation in a mesh diff report, and problem regions listed.
+PERCENTILES = (50, 90, 99)
+REGIONS = 10
+
+
+def matrix_errors(source: np.ndarray, export: np.ndarray) -> tuple:
+    """Position and orientation differences between matching world matrices.  Scale is divided
+    out of the orientations first.
+
+    Args:
+        source (np.ndarray): (..., 4, 4) world matrices, row-vector convention.
+        export (np.ndarray): Matrices of the same shape to compare them with.
+
+    Returns:
+        tuple: (position, rotation) arrays of the leading shape, in scene units and degrees.
+    """
+    position = np.linalg.norm(source[..., 3, :3] - export[..., 3, :3], axis=-1)
+
+    def _orientation(mats: np.ndarray) -> np.ndarray:
+        basis = mats[..., :3, :3]
+        norms = np.linalg.norm(basis, axis=-1, keepdims=True)
+        return basis / np.where(norms > 1e-12, norms, 1.0)
+
+    # |A - B| (Frobenius) of two rotations is 2 * sqrt(2) * sin(angle / 2), exact near 0 where
+    # arccos of the trace isn't.
+    distance = np.linalg.norm(_orientation(source) - _orientation(export), axis=(-2, -1))
+    rotation = np.degrees(2.0 * np.arcsin(np.clip(distance / (2.0 * np.sqrt(2.0)), 0.0, 1.0)))
+    return position, rotation
+
+
+def default_sampler():
+    """bake.maya_world_matrices(), or the sampler of a stand-in registered as maya.cmds."""
+    import maya.cmds as cmds
+
+    if cmds.__name__ == "maya.cmds":
+        return bake.maya_world_matrices
+    return cmds.world_matrices
+
+
+def verify_bake(
+    old_influences: list,
+    new_influences: list = None,
+    frames: list = None,
+    position_tolerance: float = POSITION_TOLERANCE,
+    rotation_tolerance: float = ROTATION_TOLERANCE,
+    stop_early: bool = True,
+    sampler=None,
+    report: str = None,
+    stride: int = 1,
+    influence_map: dict = None,
+) -> dict:
+    """Compares a baked export skeleton with the source joints over a frame range.
+
+    Runs under the execution profile of the bake stage, see execution.py.
+
+    Args:
+        old_influences (list): Influences of the original rig.
+        new_influences (list, optional): Their baked copies, in the same order.  Defaults to
+        those of influence_map.
+        frames (list, optional): Frames to check.  Defaults to every frame of the playback range.
+        position_tolerance (float, optional): Largest distance allowed, in scene units.  Defaults
+        to POSITION_TOLERANCE.
+        rotation_tolerance (float, optional): Largest angle allowed, in degrees.  Defaults to
+        ROTATION_TOLERANCE.
+        stop_early (bool, optional): Stop after the first block of frames with an error over
+        tolerance.  Defaults to True.
+        sampler (fn, optional): As for bake.bake_direct().  Defaults to default_sampler().
+        report (str, optional): Where to write the report as JSON.  Defaults to nowhere.
+        stride (int, optional): Check every stride-th frame only, the last one always.  Defaults
+        to 1 (every frame).
+        influence_map (dict, optional): Source joint to export joint, as a session stores it
+        (see session.py).  Joints not in it go by the "_INF" name.  Defaults to going by name.
+
+    Returns:
+        dict: The report, see make_report().
+    """
+    return tasks.drain(
+        iter_verify_bake(
+            old_influences,
+            new_influences,
+            frames,
+            position_tolerance,
+            rotation_tolerance,
+            stop_early,
+            sampler,
+            report,
+            stride=stride,
+            influence_map=influence_map,
+        )
+    )
+
+
+def iter_verify_bake(
+    old_influences: list,
+    new_influences: list = None,
+    frames: list = None,
+    position_tolerance: float = POSITION_TOLERANCE,
+    rotation_tolerance: float = ROTATION_TOLERANCE,
+    stop_early: bool = True,
+    sampler=None,
+    report: str = None,
+    block: int = BLOCK,
+    stride: int = 1,
+    influence_map: dict = None,
+):
+    """verify_bake() as steps of a block of frames each, see tasks.py.
+
+    Args:
+        block (int, optional): Frames sampled per step, and per early stop check.  Defaults to
+        BLOCK.
+    """
+    import maya.cmds as cmds
+
+    if new_influences is None:
+        new_influences = weights.export_joints(old_influences, influence_map)
+    if len(new_influences) != len(old_influences):
+        raise ValueError(
+            f"{len(old_influences)} source joints can't be checked against "
+            f"{len(new_influences)} export joints."
+        )
+    if frames is None:
+        start_time = cmds.playbackOptions(query=True, minTime=True)
+        end_time = cmds.playbackOptions(query=True, maxTime=True)
+        frames = list(np.arange(start_time, end_time + 1.0))
+    frame_count = len(frames)
+    if stride > 1 and frame_count:
+        frames = list(frames[::stride]) + ([frames[-1]] if (frame_count - 1) % stride else [])
+    sampler = sampler or default_sampler()
+
+    count = len(old_influences)
+    # Per joint: largest errors and the frames they're on, and samples over tolerance.
+    position = np.zeros(count)
+    rotation = np.zeros(count)
+    position_frame = np.zeros(count)
+    rotation_frame = np.zeros(count)
+    failures = np.zeros(count, dtype=np.int64)
+    checked = 0
+    stopped_at = None
+
+    with execution.applied(execution.BAKE), profiling.span("verify"):
+        step = block or max(len(frames), 1)
+        for start in range(0, len(frames), step):
+            chunk = np.asarray(frames[start : start + step], dtype=np.float64)
+            # One evaluation per frame for both skeletons.
+            world = sampler(list(old_influences) + list(new_influences), list(chunk))
+            block_position, block_rotation = matrix_errors(world[:, :count], world[:, count:])
+
+            worst_position = block_position.argmax(axis=0)
+            worst_rotation = block_rotation.argmax(axis=0)
+            joints = np.arange(count)
+            better = block_position[worst_position, joints] > position
+            position = np.where(better, block_position[worst_position, joints], position)
+            position_frame = np.where(better, chunk[worst_position], position_frame)
+            better = block_rotation[worst_rotation, joints] > rotation
+            rotation = np.where(better, block_rotation[worst_rotation, joints], rotation)
+            rotation_frame = np.where(better, chunk[worst_rotation], rotation_frame)
+
+            over = (block_position > position_tolerance) | (block_rotation > rotation_tolerance)
+            failures += over.sum(axis=0)
+            checked += len(chunk)
+            yield ("Verifying frames", checked, len(frames))
+
+            if stop_early and over.any():
+                stopped_at = float(chunk[np.flatnonzero(over.any(axis=1))[0]])
+                break
+
+    result = make_report(
+        old_influences,
+        new_influences,
+        {
+            "position": position,
+            "rotation": rotation,
+            "position_frame": position_frame,
+            "rotation_frame": rotation_frame,
+            "failures": failures,
+        },
+        position_tolerance,
+        rotation_tolerance,
+    )
+    result.update(frames=frame_count, frames_checked=checked, stopped_at=stopped_at)
+    if report is not None:
+        with open(report, "w") as report_file:
+            json.dump(result, report_file, indent=2)
+
+    if result["passed"]:
+        print(
+            f"Bake verified on {checked} frames, max error {result['max_position_error']:.5f} "
+            f"units, {result['max_rotation_error']:.5f} degrees."
+        )
+    else:
+        worst = result["worst"][0]
+        print(
+            f"Bake verification failed: {result['failing_joints']} joints off their source, "
+            f"worst {worst['joint']} by {worst['position_error']:.5f} units (frame "
+            f"{worst['position_frame']:g}), {worst['rotation_error']:.5f} degrees (frame "
+            f"{worst['rotation_frame']:g})."
+        )
+    return result
+
+
+def make_report(
+    old_influences: list,
+    new_influences: list,
+    errors: dict,
+    position_tolerance: float,
+    rotation_tolerance: float,
+    worst: int = WORST,
+) -> dict:
+    """Summarizes per joint errors, worst offenders first.
+
+    Args:
+        old_influences (list): Source joints.
+        new_influences (list): Their export copies.
+        errors (dict): Per joint arrays: "position", "rotation", the frames they were at
+        ("position_frame", "rotation_frame") and "failures", samples over tolerance.
+        position_tolerance (float): Largest distance allowed.
+        rotation_tolerance (float): Largest angle allowed.
+        worst (int, optional): Joints to list.  Defaults to WORST.
+
+    Returns:
+        dict: "passed", the largest errors, "failing_joints", "failures" and "worst", a list of
+        joints by how far over tolerance they are.
+    """
+    position, rotation = errors["position"], errors["rotation"]
+    # How far over tolerance, in tolerances, so both kinds of error rank together.
+    score = np.maximum(position / position_tolerance, rotation / rotation_tolerance)
+    order = np.argsort(-score, kind="stable")[:worst]
+
+    return {
+        "passed": bool(not errors["failures"].any()),
+        "joints": len(old_influences),
+        "max_position_error": float(position.max()) if len(position) else 0.0,
+        "max_rotation_error": float(rotation.max()) if len(rotation) else 0.0,
+        "failing_joints": int(np.count_nonzero(errors["failures"])),
+        "failures": int(errors["failures"].sum()),
+        "tolerance": {"position": position_tolerance, "rotation": rotation_tolerance},
+        "worst": [
+            {
+                "joint": old_influences[i],
+                "export_joint": new_influences[i],
+                "position_error": float(position[i]),
+                "position_frame": float(errors["position_frame"][i]),
+                "rotation_error": float(rotation[i]),
+                "rotation_frame": float(errors["rotation_frame"][i]),
+                "failures": int(errors["failures"][i]),
+            }
+            for i in order
+        ],
+    }
+
+
+def maya_deformed_points(mesh: str, frames: list) -> np.ndarray:
+    """Samples the world space points of a mesh over frames by evaluating its worldMesh plug in a
+    DG context per frame, as bake.maya_world_matrices() does for joints.
+
+    Args:
+        mesh (str): Mesh shape node.
+        frames (list): Frames, in the scene's time unit.
+
+    Returns:
+        np.ndarray: (frames, vertices, 3) points.
+    """
+    import maya.api.OpenMaya as om
+
+    sel = om.MSelectionList()
+    sel.add(mesh)
+    node_fn = om.MFnDependencyNode(sel.getDependNode(0))
+    plug = node_fn.findPlug("worldMesh", False).elementByLogicalIndex(0)
+
+    samples = []
+    unit = om.MTime.uiUnit()
+    for frame in frames:
+        context = om.MDGContext(om.MTime(frame, unit))
+        previous = context.makeCurrent()
+        try:
+            points = om.MFnMesh(plug.asMObject()).getPoints(om.MSpace.kObject)
+        finally:
+            previous.makeCurrent()
+        samples.append(np.array(points)[:, :3])
+
+    return np.array(samples)
+
+
+def default_point_sampler():
+    """maya_deformed_points(), or the one of a stand-in registered as maya.cmds."""
+    import maya.cmds as cmds
+
+    if cmds.__name__ == "maya.cmds":
+        return maya_deformed_points
+    return cmds.deformed_points
+
+
+def refine_frames(sampled: dict, count: int, tolerance: float) -> list:
+    """Picks the next frames of an adaptive sampling: the midpoints of the gaps between sampled
+    frames with the most deviation at their ends, scaled by their length so long stretches that
+    haven't been looked at get their turn.
+
+    Args:
+        sampled (dict): Frame index to the largest deviation found on that frame.
+        count (int): Most frames to pick.
+        tolerance (float): Deviation allowed, a tenth of it is added to every gap's ends.
+
+    Returns:
+        list: Frame indices, none already sampled.
+    """
+    done = np.array(sorted(sampled))
+    errors = np.array([sampled[index] for index in done])
+    lengths = np.diff(done)
+    open_gaps = np.flatnonzero(lengths > 1)
+    if not len(open_gaps) or count < 1:
+        return []
+
+    ends = np.maximum(errors[:-1], errors[1:])[open_gaps]
+    priority = (ends + 0.1 * tolerance) * lengths[open_gaps]
+    picked = open_gaps[np.argsort(-priority, kind="stable")[:count]]
+    return sorted(int(index) for index in (done[picked] + done[picked + 1]) // 2)
+
+
+def vertex_regions(flagged: np.ndarray, triangles: np.ndarray) -> list:
+    """Splits flagged vertices into regions connected by the edges of a mesh.
+
+    Args:
+        flagged (np.ndarray): Bool per vertex.
+        triangles (np.ndarray): (triangles, 3) vertex ids.
+
+    Returns:
+        list: Arrays of vertex ids, one per region.
+    """
+    if not flagged.any():
+        return []
+
+    triangles = np.asarray(triangles)
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    edges = edges[flagged[edges].all(axis=1)]
+
+    # Every vertex takes the lowest label across its edges until nothing changes, jumping to the
+    # label's own label each time so long strips settle in a few passes.
+    labels = np.arange(len(flagged))
+    while True:
+        lowest = np.minimum(labels[edges[:, 0]], labels[edges[:, 1]])
+        updated = labels.copy()
+        np.minimum.at(updated, edges[:, 0], lowest)
+        np.minimum.at(updated, edges[:, 1], lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+
+    ids = np.flatnonzero(flagged)
+    order = np.argsort(labels[ids], kind="stable")
+    ids, region_labels = ids[order], labels[ids][order]
+    return np.split(ids, np.flatnonzero(np.diff(region_labels)) + 1)
+
+
+def vertex_components(mesh: str, ids: np.ndarray) -> list:
+    """Vertex ids as Maya component names, runs of ids as ranges ("body.vtx[10:24]")."""
+    ids = np.sort(np.asarray(ids))
+    runs = np.split(ids, np.flatnonzero(np.diff(ids) != 1) + 1) if len(ids) else []
+    return [
+        f"{mesh}.vtx[{run[0]}]" if len(run) == 1 else f"{mesh}.vtx[{run[0]}:{run[-1]}]"
+        for run in runs
+    ]
+
+
+def diff_meshes(
+    meshes: list,
+    export_meshes: list = None,
+    frames: list = None,
+    tolerance: float = MESH_TOLERANCE,
+    max_frames: int = MAX_FRAMES,
+    make_sets: bool = False,
+    sampler=None,
+    report: str = None,
+) -> dict:
+    """Compares the deformation of export meshes with their source meshes, vertex by vertex, over
+    adaptively sampled frames.
+
+    Runs under the execution profile of the bake stage, see execution.py.
+
+    Args:
+        meshes (list): Source meshes, transforms or shapes.
+        export_meshes (list, optional): Their export copies, in the same order and with the same
+        topology.  Defaults to the "_EXP" meshes a build makes.
+        frames (list, optional): Frames to pick from.  Defaults to every frame of the playback
+        range.
+        tolerance (float, optional): Largest deviation allowed, in scene units.  Defaults to
+        MESH_TOLERANCE.
+        max_frames (int, optional): Most frames sampled per mesh.  Defaults to MAX_FRAMES.
+        make_sets (bool, optional): Put each problem region in an objectSet named after the
+        export mesh.  Defaults to False.
+        sampler (fn, optional): Called as sampler(mesh shape, frames), returns (frames, vertices,
+        3) deformed points.  Defaults to default_point_sampler().
+        report (str, optional): Where to write the report as JSON.  Defaults to nowhere.
+
+    Returns:
+        dict: "passed", "tolerance" and per source mesh transform, a report with the largest and
+        mean deviation, percentiles of the per vertex largest deviation, the frames sampled and
+        the problem regions, worst first.
+    """
+    return tasks.drain(
+        iter_diff_meshes(
+            meshes, export_meshes, frames, tolerance, max_frames, make_sets, sampler, report
+        )
+    )
+
+
+def iter_diff_meshes(
+    meshes: list,
+    export_meshes: list = None,
+    frames: list = None,
+    tolerance: float = MESH_TOLERANCE,
+    max_frames: int = MAX_FRAMES,
+    make_sets: bool = False,
+    sampler=None,
+    report: str = None,
+    block: int = REFINE_FRAMES,
+):
+    """diff_meshes() as steps of a block of sampled frames each, see tasks.py.
+
+    Args:
+        block (int, optional): Frames added per refinement step.  Defaults to REFINE_FRAMES.
+    """
+    import maya.cmds as cmds
+
+    sources = [MeshData(mesh) for mesh in meshes]
+    if export_meshes is None:
+        export_meshes = [f"{source.trans_node}_EXP" for source in sources]
+    exports = [MeshData(mesh) for mesh in export_meshes]
+    if frames is None:
+        start_time = cmds.playbackOptions(query=True, minTime=True)
+        end_time = cmds.playbackOptions(query=True, maxTime=True)
+        frames = list(np.arange(start_time, end_time + 1.0))
+    frames = np.asarray(frames, dtype=np.float64)
+    sampler = sampler or default_point_sampler()
+    backend = weights.default_backend()
+
+    result = {"passed": True, "tolerance": tolerance, "meshes": {}}
+    with execution.applied(execution.BAKE), profiling.span("mesh diff"):
+        for source, export in zip(sources, exports):
+            triangles = backend.geometry(export.mesh_node)[1]
+            vertex_max = vertex_sum = vertex_frame = None
+            sampled = {}
+
+            pending = sorted(
+                set(np.linspace(0, len(frames) - 1, min(INITIAL_FRAMES, max_frames)).astype(int))
+            )
+            while pending:
+                chunk = list(frames[pending])
+                source_points = sampler(source.mesh_node, chunk)
+                export_points = sampler(export.mesh_node, chunk)
+                if source_points.shape != export_points.shape:
+                    raise ValueError(
+                        f"{export.trans_node} doesn't have the vertices of {source.trans_node}."
+                    )
+                deviation = np.linalg.norm(source_points - export_points, axis=-1)
+
+                worst = deviation.argmax(axis=0)
+                if vertex_max is None:
+                    vertex_max = np.zeros(deviation.shape[1])
+                    vertex_sum = np.zeros(deviation.shape[1])
+                    vertex_frame = np.zeros(deviation.shape[1])
+                better = deviation[worst, np.arange(deviation.shape[1])] > vertex_max
+                vertex_max = np.where(better, deviation.max(axis=0), vertex_max)
+                vertex_frame = np.where(better, np.asarray(chunk)[worst], vertex_frame)
+                vertex_sum += deviation.sum(axis=0)
+                sampled.update(zip(pending, deviation.max(axis=1).tolist()))
+                yield (f"Comparing {export.trans_node}", len(sampled), max_frames)
+
+                pending = refine_frames(
+                    sampled, min(block or REFINE_FRAMES, max_frames - len(sampled)), tolerance
+                )
+
+            mesh_report = _mesh_report(
+                export.trans_node,
+                vertex_max,
+                vertex_sum / len(sampled),
+                vertex_frame,
+                triangles,
+                tolerance,
+            )
+            mesh_report.update(
+                export_mesh=export.trans_node,
+                frames=[float(frames[index]) for index in sorted(sampled)],
+            )
+            if make_sets:
+                for number, region in enumerate(mesh_report["regions"]):
+                    region["set"] = cmds.sets(
+                        region["components"], name=f"{export.trans_node}_deviation{number + 1}"
+                    )
+            result["meshes"][source.trans_node] = mesh_report
+            result["passed"] = result["passed"] and mesh_report["passed"]
+
+            print(
+                f"{export.trans_node} deviates up to {mesh_report['max_error']:.5f} units "
+                f"(mean {mesh_report['mean_error']:.5f}) over {len(sampled)} frames, "
+                f"{mesh_report['problem_vertices']} vertices in {mesh_report['problem_regions']} "
+                f"regions over tolerance."
+            )
+
+    if report is not None:
+        with open(report, "w") as report_file:
+            json.dump(result, report_file, indent=2)
+    return result
+
+
+def _mesh_report(
+    mesh: str,
+    vertex_max: np.ndarray,
+    vertex_mean: np.ndarray,
+    vertex_frame: np.ndarray,
+    triangles: np.ndarray,
+    tolerance: float,
+) -> dict:
+    flagged = vertex_max > tolerance
+    regions = [
+        {
+            "vertices": int(len(ids)),
+            "max_error": float(vertex_max[ids].max()),
+            "worst_vertex": int(ids[vertex_max[ids].argmax()]),
+            "worst_frame": float(vertex_frame[ids[vertex_max[ids].argmax()]]),
+            "components": vertex_components(mesh, ids),
+        }
+        for ids in vertex_regions(flagged, triangles)
+    ]
+    regions.sort(key=lambda region: -region["max_error"])
+
+    worst = int(vertex_max.argmax())
+    return {
+        "passed": bool(not flagged.any()),
+        "vertices": int(len(vertex_max)),
+        "max_error": float(vertex_max[worst]),
+        "mean_error": float(vertex_mean.mean()),
+        "percentiles": {
+            str(percentile): float(value)
+            for percentile, value in zip(PERCENTILES, np.percentile(vertex_max, PERCENTILES))
+        },
+        "worst_vertex": worst,
+        "worst_frame": float(vertex_frame[worst]),
+        "problem_vertices": int(flagged.sum()),
+        "problem_regions": len(regions),
+        "regions": regions[:REGIONS],
+    }
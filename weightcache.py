@@ -0,0 +1,232 @@
+"""
+weightcache.py
+Created: Sunday, 18th October 2026 11:58:36 pm
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 11:58:41 pm
+Modified By: Matthew Riche
+"""
+
+# On-disk cache of transferred skin weights.  A build that finds the weights of an export mesh in
+# here binds them straight away instead of transferring (and conditioning) them again, so a
+# nightly batch only pays for the meshes that changed since the night before.
+#
+# An entry is a folder named by a key made of the source mesh's fingerprints (topology, weights and
+# export settings, see fingerprint.mesh_prints()) and the export mesh's influences.  It holds
+# generations, folders of .npy files of a weights.SkinWeights loaded memory-mapped, and a CURRENT
+# file naming the one to load.  Storing writes a new generation and swaps CURRENT, so an entry is
+# never overwritten while someone still has it mapped (which Windows wouldn't allow):
+#
+#   cache = weightcache.WeightCache("D:/febex_cache", max_bytes=4e9)
+#   operations.build_multi_export_content(["body"], "root", weight_cache=cache)
+#
+# Entries are evicted least recently used first once the folder is over max_bytes.  With validate
+# on, hits are transferred anyway and compared, a stale entry is reported and replaced.
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from .weights import SkinWeights
+
+
+VERSION = 2
+ARRAYS = ("indptr", "indices", "values")
+META = "meta.json"
+CURRENT = "CURRENT"
+
+# Largest difference between a cached and a fresh weight that validation lets through.
+TOLERANCE = 1e-6
+
+
+def default_folder() -> str:
+    """$FEBEX_WEIGHT_CACHE, or a folder in the user's home."""
+    return os.environ.get("FEBEX_WEIGHT_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".febex", "weight_cache"
+    )
+
+
+def cache_key(mesh_print: dict, influences: list) -> str:
+    """Key of an export mesh's weights.
+
+    Args:
+        mesh_print (dict): The source mesh's fingerprints, from fingerprint.mesh_prints().
+        influences (list): Influences of the export mesh's skinCluster.
+
+    Returns:
+        str: A hex digest.
+    """
+    hasher = hashlib.sha1()
+    # The topology, not the geometry: weights don't depend on where the points are.
+    parts = [VERSION, mesh_print["topology"], mesh_print["weights"], mesh_print["settings"]]
+    hasher.update(json.dumps(parts + [sorted(influences)]).encode())
+    return hasher.hexdigest()
+
+
+class WeightCache:
+    def __init__(self, folder: str = None, max_bytes: float = 2e9, validate: bool = False):
+        """A folder of cached weight tables.
+
+        Args:
+            folder (str, optional): Where the entries go, made when needed.  Defaults to
+            default_folder().
+            max_bytes (float, optional): Size the folder is trimmed to after each put().
+            Defaults to 2GB.
+            validate (bool, optional): Tell builds to transfer weights even on a hit and check
+            the entry against them.  Defaults to False.
+        """
+        self.folder = folder or default_folder()
+        self.max_bytes = max_bytes
+        self.validate = validate
+        self.stats = {"hits": 0, "misses": 0, "mismatches": 0, "evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key)
+
+    def get(self, key: str) -> SkinWeights:
+        """The cached weights under a key, memory-mapped, or None.  Counts as a use for eviction.
+
+        Args:
+            key (str): From cache_key().
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, CURRENT), "r") as current_file:
+                generation = os.path.join(path, current_file.read().strip())
+            with open(os.path.join(generation, META), "r") as meta_file:
+                meta = json.load(meta_file)
+            if meta.get("version") != VERSION:
+                raise ValueError(f"Cache entry {key} is from another version.")
+            arrays = [
+                np.load(os.path.join(generation, f"{name}.npy"), mmap_mode="r") for name in ARRAYS
+            ]
+            os.utime(path)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return SkinWeights(*arrays, meta["influences"])
+
+    def put(self, key: str, skin_weights: SkinWeights):
+        """Stores weights under a key, replacing what was there, then trims the cache.  The weights
+        go in a new generation of the entry and CURRENT is swapped to it in one move, so other
+        processes never see half of it and arrays mapped from the old one stay valid.
+
+        Args:
+            key (str): From cache_key().
+            skin_weights (SkinWeights): What to store.
+
+        Raises:
+            OSError: If the entry can't be written.
+        """
+        path = self._path(key)
+        generation = f"{time.time_ns():020d}-{os.getpid()}"
+        folder = os.path.join(path, generation)
+        os.makedirs(folder)
+        for name in ARRAYS:
+            np.save(os.path.join(folder, f"{name}.npy"), getattr(skin_weights, name))
+        with open(os.path.join(folder, META), "w") as meta_file:
+            json.dump({"version": VERSION, "influences": skin_weights.influences}, meta_file)
+
+        pointer = os.path.join(path, f".{CURRENT}.{generation}")
+        with open(pointer, "w") as pointer_file:
+            pointer_file.write(generation)
+        os.replace(pointer, os.path.join(path, CURRENT))
+
+        self._collect(path, generation)
+        self.trim()
+
+    @staticmethod
+    def _collect(path: str, generation: str):
+        """Removes what an entry holds besides CURRENT and the generations from generation on
+        (another process may be writing a newer one)."""
+        for name in os.listdir(path):
+            if name == CURRENT or (name[:20].isdigit() and name >= generation):
+                continue
+            target = os.path.join(path, name)
+            try:
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                else:
+                    os.remove(target)
+            except OSError:
+                # An old generation still mapped by someone, it isn't current any more and goes
+                # with the next put() or eviction.
+                continue
+
+    def check(self, key: str, cached: SkinWeights, fresh: SkinWeights) -> bool:
+        """Validates a cached entry against a fresh transfer, replacing it if they differ.  They
+        have to hold the same non-zero weights, within TOLERANCE.
+
+        Args:
+            key (str): The entry's key.
+            cached (SkinWeights): What get() returned.
+            fresh (SkinWeights): The weights as transferred now.
+
+        Returns:
+            bool: True if the entry was right.
+        """
+        same = (
+            cached.shape == fresh.shape
+            and cached.influences == fresh.influences
+            and np.array_equal(cached.indptr, fresh.indptr)
+            and np.array_equal(cached.indices, fresh.indices)
+            and np.allclose(cached.values, fresh.values, rtol=0.0, atol=TOLERANCE)
+        )
+        if not same:
+            self.stats["mismatches"] += 1
+            print(f"Weight cache entry {key} doesn't match a fresh transfer, replacing it.")
+            self.put(key, fresh)
+        return same
+
+    def entries(self) -> list:
+        """(key, bytes, last use time) of every entry, least recently used first."""
+        if not os.path.isdir(self.folder):
+            return []
+        found = []
+        for key in os.listdir(self.folder):
+            path = self._path(key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(path)
+                    for name in names
+                )
+                found.append((key, size, os.stat(path).st_mtime))
+            except OSError:
+                continue
+        return sorted(found, key=lambda entry: entry[2])
+
+    def size(self) -> int:
+        """Bytes taken by every entry."""
+        return sum(size for _, size, _ in self.entries())
+
+    def trim(self, max_bytes: float = None):
+        """Evicts the least recently used entries until the cache fits.
+
+        Args:
+            max_bytes (float, optional): Defaults to the cache's max_bytes.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                shutil.rmtree(self._path(key))
+            except OSError:
+                # Still mapped by someone (Windows won't delete it), it goes next time.
+                continue
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        """Removes every entry."""
+        self.trim(0)
@@ -0,0 +1,840 @@
+"""
+weights.py
+Created: Sunday, 18th October 2026 9:12:40 am
+Matthew Riche
+Last Modified: Sunday, 18th October 2026 9:12:44 am
+Modified By: Matthew Riche
+"""
+
+# Bulk skin weight tables.  Weights move in and out of the scene as one (verts x influences) array
+# instead of one skinPercent call per vertex per influence.  A vertex rarely has more than four
+# non-zero weights though, so SkinWeights keeps only those, as a compressed sparse row table that
+# Maya reads and writes a block of influence columns at a time.
+#
+# Nothing in here imports Maya at module level, so the array side (and the MemoryWeightBackend
+# stand-in) can be used from a plain python interpreter.  The Maya backend pulls in the API when
+# it's actually used.
+
+import numpy as np
+
+from .transfer import mesh_arrays
+
+
+# Influence columns per getWeights/setWeights call on the sparse path, so a dense block of
+# (verts x COLUMN_BLOCK) is the most that's ever held at once.
+COLUMN_BLOCK = 32
+
+
+def inf_name(joint: str) -> str:
+    """The naming convention used to pair an original influence with its export copy.
+
+    Args:
+        joint (str): Name of the original influence.
+
+    Returns:
+        str: Name of the export influence.
+    """
+    return f"{joint}_INF"
+
+
+def export_joints(joints: list, influence_map: dict = None) -> list:
+    """The export copies of source joints.
+
+    Args:
+        joints (list): Source joints.
+        influence_map (dict, optional): Source joint to export joint, as a session stores it
+        (see session.py).  Joints not in it go by the "_INF" name.  Defaults to going by name.
+
+    Returns:
+        list: One export joint per source joint.
+    """
+    influence_map = influence_map or {}
+    return [influence_map.get(joint) or inf_name(joint) for joint in joints]
+
+
+class WeightBackend:
+    """Reads and writes whole weight tables for a skinCluster.  Subclasses do the scene work."""
+
+    def read(self, cluster: str) -> tuple:
+        """Reads every weight of a skinCluster in one go.
+
+        Args:
+            cluster (str): Name of the skinCluster.
+
+        Returns:
+            tuple: (weights, influences) where weights is a float64 array shaped
+            (vertex count, influence count) and influences is the list of influence names in
+            column order.
+        """
+        raise NotImplementedError
+
+    def influences(self, cluster: str) -> list:
+        """Influence names of a skinCluster in column order, without reading any weights.
+
+        Args:
+            cluster (str): Name of the skinCluster.
+
+        Returns:
+            list: Influence names.
+        """
+        return self.read(cluster)[1]
+
+    def vertex_count(self, cluster: str) -> int:
+        """Vertices deformed by a skinCluster, without reading any weights."""
+        return self.read(cluster)[0].shape[0]
+
+    def read_sparse(self, cluster: str):
+        """read() as a SkinWeights.  Backends that can read part of a table override this so the
+        dense table never exists whole.
+
+        Args:
+            cluster (str): Name of the skinCluster.
+
+        Returns:
+            SkinWeights: The non-zero weights and the influence names.
+        """
+        return SkinWeights.from_dense(*self.read(cluster))
+
+    def write_sparse(self, cluster: str, skin_weights):
+        """write() from a SkinWeights.
+
+        Args:
+            cluster (str): Name of the skinCluster.
+            skin_weights (SkinWeights): Weights to write, its influences must be bound to the
+            cluster.
+        """
+        self.write(cluster, skin_weights.to_dense(), skin_weights.influences)
+
+    def write(self, cluster: str, weights: np.ndarray, influences: list):
+        """Writes a whole weight table to a skinCluster in one go.
+
+        Args:
+            cluster (str): Name of the skinCluster.
+            weights (np.ndarray): Array shaped (vertex count, influence count).
+            influences (list): Influence names in column order, all must be bound to the cluster.
+        """
+        raise NotImplementedError
+
+    def geometry(self, mesh: str) -> tuple:
+        """World space points and triangles of a mesh, for transfers between topologies.
+
+        Args:
+            mesh (str): Mesh shape or transform node.
+
+        Returns:
+            tuple: ((n, 3) float64 points, (t, 3) int64 triangle vertex ids).
+        """
+        raise NotImplementedError
+
+    def rest_geometry(self, mesh: str) -> tuple:
+        """geometry() before deformation, the same whatever the pose or the current frame.
+
+        Args:
+            mesh (str): Mesh shape or transform node.
+
+        Returns:
+            tuple: ((n, 3) float64 points, (t, 3) int64 triangle vertex ids).
+        """
+        return self.geometry(mesh)
+
+    def bind_matrices(self, cluster: str) -> dict:
+        """The bindPreMatrix of each influence of a skinCluster, the inverse of its world matrix
+        when the mesh was bound.
+
+        Args:
+            cluster (str): Name of the skinCluster.
+
+        Returns:
+            dict: Influence name to (4, 4) matrix.
+        """
+        raise NotImplementedError
+
+
+class MayaWeightBackend(WeightBackend):
+    """Weight tables through MFnSkinCluster.getWeights/setWeights, one API call each way."""
+
+    @staticmethod
+    def _cluster_fn(cluster: str):
+        import maya.api.OpenMaya as om
+        import maya.api.OpenMayaAnim as oma
+
+        sel = om.MSelectionList()
+        sel.add(cluster)
+        skin_fn = oma.MFnSkinCluster(sel.getDependNode(0))
+
+        # Assume one output geometry, the same assumption find_cluster_node() makes.
+        geo_path = skin_fn.getPathAtIndex(0)
+        vert_count = om.MFnMesh(geo_path).numVertices
+        comp_fn = om.MFnSingleIndexedComponent()
+        components = comp_fn.create(om.MFn.kMeshVertComponent)
+        comp_fn.setCompleteData(vert_count)
+
+        return skin_fn, geo_path, components, vert_count
+
+    def influences(self, cluster: str) -> list:
+        import maya.api.OpenMaya as om
+        import maya.api.OpenMayaAnim as oma
+
+        sel = om.MSelectionList()
+        sel.add(cluster)
+        skin_fn = oma.MFnSkinCluster(sel.getDependNode(0))
+        return [path.partialPathName() for path in skin_fn.influenceObjects()]
+
+    def read(self, cluster: str) -> tuple:
+        skin_fn, geo_path, components, vert_count = self._cluster_fn(cluster)
+        influences = [path.partialPathName() for path in skin_fn.influenceObjects()]
+
+        flat, inf_count = skin_fn.getWeights(geo_path, components)
+        weights = np.array(flat, dtype=np.float64).reshape(vert_count, inf_count)
+
+        return weights, influences
+
+    def vertex_count(self, cluster: str) -> int:
+        return self._cluster_fn(cluster)[3]
+
+    def read_sparse(self, cluster: str):
+        import maya.api.OpenMaya as om
+
+        skin_fn, geo_path, components, vert_count = self._cluster_fn(cluster)
+        influences = [path.partialPathName() for path in skin_fn.influenceObjects()]
+
+        rows, columns, values = [], [], []
+        for start in range(0, len(influences), COLUMN_BLOCK):
+            block = list(range(start, min(start + COLUMN_BLOCK, len(influences))))
+            flat = skin_fn.getWeights(geo_path, components, om.MIntArray(block))
+            table = np.array(flat, dtype=np.float64).reshape(vert_count, len(block))
+            vert_ids, block_columns = np.nonzero(table)
+            rows.append(vert_ids)
+            columns.append(block_columns + start)
+            values.append(table[vert_ids, block_columns])
+
+        if not influences:
+            return SkinWeights.from_dense(np.zeros((vert_count, 0)), influences)
+        return SkinWeights.from_coo(
+            np.concatenate(rows),
+            np.concatenate(columns),
+            np.concatenate(values),
+            vert_count,
+            influences,
+        )
+
+    def write_sparse(self, cluster: str, skin_weights):
+        import maya.api.OpenMaya as om
+
+        skin_fn, geo_path, components, vert_count = self._cluster_fn(cluster)
+        bound = [path.partialPathName() for path in skin_fn.influenceObjects()]
+        columns = _column_indices(skin_weights.influences, bound, cluster)
+        if skin_weights.shape[0] != vert_count:
+            raise ValueError(
+                f"Weight table has {skin_weights.shape[0]} vertices, {cluster} has {vert_count}."
+            )
+
+        for start in range(0, len(columns), COLUMN_BLOCK):
+            stop = min(start + COLUMN_BLOCK, len(columns))
+            skin_fn.setWeights(
+                geo_path,
+                components,
+                om.MIntArray(columns[start:stop].tolist()),
+                om.MDoubleArray(skin_weights._dense_columns(start, stop).ravel().tolist()),
+                normalize=False,
+                returnOldWeights=False,
+            )
+
+    def geometry(self, mesh: str) -> tuple:
+        return mesh_arrays(mesh)
+
+    def rest_geometry(self, mesh: str) -> tuple:
+        return mesh_arrays(mesh, rest=True)
+
+    def bind_matrices(self, cluster: str) -> dict:
+        import maya.api.OpenMaya as om
+        import maya.api.OpenMayaAnim as oma
+
+        sel = om.MSelectionList()
+        sel.add(cluster)
+        skin_fn = oma.MFnSkinCluster(sel.getDependNode(0))
+        plug = skin_fn.findPlug("bindPreMatrix", False)
+
+        matrices = {}
+        for path in skin_fn.influenceObjects():
+            element = plug.elementByLogicalIndex(skin_fn.indexForInfluenceObject(path))
+            matrix = om.MFnMatrixData(element.asMObject()).matrix()
+            matrices[path.partialPathName()] = np.array(list(matrix)).reshape(4, 4)
+        return matrices
+
+    def write(self, cluster: str, weights: np.ndarray, influences: list):
+        import maya.api.OpenMaya as om
+
+        skin_fn, geo_path, components, vert_count = self._cluster_fn(cluster)
+        bound = [path.partialPathName() for path in skin_fn.influenceObjects()]
+        columns = _column_indices(influences, bound, cluster)
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (vert_count, len(influences)):
+            raise ValueError(
+                f"Weight table is {weights.shape}, {cluster} needs "
+                f"({vert_count}, {len(influences)})."
+            )
+
+        skin_fn.setWeights(
+            geo_path,
+            components,
+            om.MIntArray(columns.tolist()),
+            om.MDoubleArray(weights.ravel().tolist()),
+            normalize=False,
+            returnOldWeights=False,
+        )
+
+
+class MemoryWeightBackend(WeightBackend):
+    """Stand-in backend holding weight tables in a dict, for testing and benchmarking outside of
+    Maya.  Clusters are registered with add_cluster() first.
+    """
+
+    def __init__(self):
+        self.clusters = {}
+        self.binds = {}
+        self.meshes = {}
+        self.reads = 0
+        self.writes = 0
+
+    def add_mesh(self, mesh: str, points: np.ndarray, triangles: np.ndarray):
+        """Registers fake geometry for geometry().
+
+        Args:
+            mesh (str): Name to register the mesh under.
+            points (np.ndarray): (n, 3) points.
+            triangles (np.ndarray): (t, 3) vertex ids.
+        """
+        self.meshes[mesh] = (np.asarray(points, dtype=np.float64), np.asarray(triangles))
+
+    def geometry(self, mesh: str) -> tuple:
+        if mesh not in self.meshes:
+            raise ValueError(f"{mesh} can't be found in scene.")
+        return self.meshes[mesh]
+
+    def rest_geometry(self, mesh: str) -> tuple:
+        # Nothing deforms the registered points.
+        return self.geometry(mesh)
+
+    def add_cluster(
+        self, cluster: str, influences: list, weights: np.ndarray, bind_matrices: dict = None
+    ):
+        """Registers a fake skinCluster.
+
+        Args:
+            cluster (str): Name to register the cluster under.
+            influences (list): Influence names in column order.
+            weights (np.ndarray): Array shaped (vertex count, influence count).
+            bind_matrices (dict, optional): Influence name to (4, 4) bindPreMatrix.  Defaults to
+            identity matrices, every influence bound at the origin.
+        """
+        weights = np.array(weights, dtype=np.float64)
+        if weights.ndim != 2 or weights.shape[1] != len(influences):
+            raise ValueError(f"Weights for {cluster} don't match its {len(influences)} influences.")
+        bind_matrices = bind_matrices or {}
+        self.clusters[cluster] = (list(influences), weights)
+        self.binds[cluster] = {
+            influence: np.array(bind_matrices.get(influence, np.identity(4)), dtype=np.float64)
+            for influence in influences
+        }
+
+    def bind_matrices(self, cluster: str) -> dict:
+        if cluster not in self.clusters:
+            raise ValueError(f"No cluster node called {cluster} exists in the scene.")
+        return {influence: matrix.copy() for influence, matrix in self.binds[cluster].items()}
+
+    def influences(self, cluster: str) -> list:
+        if cluster not in self.clusters:
+            raise ValueError(f"No cluster node called {cluster} exists in the scene.")
+        return list(self.clusters[cluster][0])
+
+    def vertex_count(self, cluster: str) -> int:
+        if cluster not in self.clusters:
+            raise ValueError(f"No cluster node called {cluster} exists in the scene.")
+        return self.clusters[cluster][1].shape[0]
+
+    def read(self, cluster: str) -> tuple:
+        if cluster not in self.clusters:
+            raise ValueError(f"No cluster node called {cluster} exists in the scene.")
+        self.reads += 1
+        influences, weights = self.clusters[cluster]
+
+        return weights.copy(), list(influences)
+
+    def write(self, cluster: str, weights: np.ndarray, influences: list):
+        if cluster not in self.clusters:
+            raise ValueError(f"No cluster node called {cluster} exists in the scene.")
+        self.writes += 1
+        bound, table = self.clusters[cluster]
+        columns = _column_indices(influences, bound, cluster)
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (table.shape[0], len(influences)):
+            raise ValueError(
+                f"Weight table is {weights.shape}, {cluster} needs "
+                f"({table.shape[0]}, {len(influences)})."
+            )
+        table[:, columns] = weights
+
+
+_default_backend = None
+
+
+def default_backend() -> WeightBackend:
+    """The backend used when a function isn't handed one, a MayaWeightBackend unless
+    set_default_backend() says otherwise.
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = MayaWeightBackend()
+    return _default_backend
+
+
+def set_default_backend(backend: WeightBackend):
+    """Makes every febex weight read and write go through another backend, e.g. a stand-in scene.
+
+    Args:
+        backend (WeightBackend): The new default, or None to go back to Maya.
+    """
+    global _default_backend
+    _default_backend = backend
+
+
+def _column_indices(names: list, bound: list, cluster: str) -> np.ndarray:
+    """Index of each name within a bound influence list."""
+    lookup = {name: i for i, name in enumerate(bound)}
+    missing = [name for name in names if name not in lookup]
+    if missing:
+        raise ValueError(f"{missing} are not influences of {cluster}.")
+
+    return np.array([lookup[name] for name in names], dtype=np.int64)
+
+
+def remap_columns(
+    weights: np.ndarray, src_influences: list, dst_influences: list, name_map=inf_name
+) -> np.ndarray:
+    """Reorders the columns of a weight table from one influence list to another.  Each source
+    influence lands in the column of name_map(source) in dst_influences.  Weight on source
+    influences without a destination counterpart is dropped, so rows may need normalizing after.
+
+    Args:
+        weights (np.ndarray): Array shaped (vertex count, len(src_influences)).
+        src_influences (list): Influence names of the source columns.
+        dst_influences (list): Influence names of the destination columns.
+        name_map (fn, optional): Maps a source name to a destination name, or a dict doing the
+        same.  Defaults to inf_name().
+
+    Returns:
+        np.ndarray: Array shaped (vertex count, len(dst_influences)).
+    """
+    if isinstance(name_map, dict):
+        name_map = name_map.get
+
+    dst_lookup = {name: i for i, name in enumerate(dst_influences)}
+    src_cols = []
+    dst_cols = []
+    for i, name in enumerate(src_influences):
+        j = dst_lookup.get(name_map(name))
+        if j is not None:
+            src_cols.append(i)
+            dst_cols.append(j)
+
+    remapped = np.zeros((weights.shape[0], len(dst_influences)), dtype=np.float64)
+    # np.add.at so two sources mapping onto one destination accumulate rather than overwrite.
+    np.add.at(remapped.T, np.array(dst_cols, dtype=np.int64), weights.T[src_cols])
+
+    return remapped
+
+
+def normalize_rows(weights: np.ndarray) -> np.ndarray:
+    """Scales every row of a weight table to sum to 1.  Rows with no weight are left at 0.
+
+    Args:
+        weights (np.ndarray): Array shaped (vertex count, influence count).
+
+    Returns:
+        np.ndarray: The normalized array (a new array).
+    """
+    totals = weights.sum(axis=1, keepdims=True)
+    return np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0.0)
+
+
+class SkinWeights:
+    def __init__(
+        self, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray, influences: list
+    ):
+        """Skin weights as a compressed sparse row table over vertices x influences.  Vertex v's
+        weights are values[indptr[v]:indptr[v + 1]], on the influence columns at the same
+        positions of indices, sorted.  Only non-zero weights are stored.
+
+        Args:
+            indptr (np.ndarray): (vertex count + 1) offsets into indices and values.
+            indices (np.ndarray): Influence column of each stored weight.
+            values (np.ndarray): The stored weights.
+            influences (list): Influence names in column order.
+        """
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.influences = list(influences)
+        self.index = {name: i for i, name in enumerate(self.influences)}
+
+    @classmethod
+    def from_dense(cls, weights: np.ndarray, influences: list, threshold: float = 0.0):
+        """Keeps the weights of a (vertex count, influence count) table above threshold."""
+        weights = np.asarray(weights, dtype=np.float64)
+        rows, columns = np.nonzero(np.abs(weights) > threshold)
+        counts = np.bincount(rows, minlength=weights.shape[0])
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return cls(indptr, columns, weights[rows, columns], influences)
+
+    @classmethod
+    def from_coo(
+        cls,
+        rows: np.ndarray,
+        columns: np.ndarray,
+        values: np.ndarray,
+        vertex_count: int,
+        influences: list,
+    ):
+        """Builds the table from (vertex, influence column, weight) triplets in any order.
+        Triplets on the same vertex and column add up, and zeros are dropped.
+        """
+        width = max(len(influences), 1)
+        keys = np.asarray(rows, dtype=np.int64) * width + np.asarray(columns, dtype=np.int64)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=values, minlength=len(keys))
+        keys, summed = keys[summed != 0.0], summed[summed != 0.0]
+
+        counts = np.bincount(keys // width, minlength=vertex_count)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return cls(indptr, keys % width, summed, influences)
+
+    @classmethod
+    def stack(cls, tables: list, influences: list):
+        """Joins tables over the same influences, the vertices of each following the last.
+
+        Args:
+            tables (list): SkinWeights, possibly none.
+            influences (list): Influence names of every table.
+        """
+        indptr = [np.zeros(1, dtype=np.int64)]
+        offset = 0
+        for table in tables:
+            indptr.append(table.indptr[1:] + offset)
+            offset += table.nnz
+        return cls(
+            np.concatenate(indptr),
+            np.concatenate([table.indices for table in tables] or [np.zeros(0)]),
+            np.concatenate([table.values for table in tables] or [np.zeros(0)]),
+            influences,
+        )
+
+    @classmethod
+    def read(cls, cluster: str, backend: WeightBackend = None):
+        """Reads a skinCluster's weights, see WeightBackend.read_sparse().
+
+        Args:
+            cluster (str): Name of the skinCluster.
+            backend (WeightBackend, optional): Defaults to default_backend().
+        """
+        return (backend or default_backend()).read_sparse(cluster)
+
+    def store(self, cluster: str, backend: WeightBackend = None):
+        """Writes the weights to a skinCluster, see WeightBackend.write_sparse().
+
+        Args:
+            cluster (str): Name of the skinCluster, with every influence bound.
+            backend (WeightBackend, optional): Defaults to default_backend().
+        """
+        (backend or default_backend()).write_sparse(cluster, self)
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self.indptr) - 1, len(self.influences))
+
+    @property
+    def nnz(self) -> int:
+        """Stored weights."""
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the arrays."""
+        return self.indptr.nbytes + self.indices.nbytes + self.values.nbytes
+
+    @property
+    def dense_nbytes(self) -> int:
+        """Memory the same table takes as a dense float64 array."""
+        return self.shape[0] * self.shape[1] * 8
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __repr__(self) -> str:
+        return (
+            f"SkinWeights({self.shape[0]} vertices x {self.shape[1]} influences, {self.nnz} "
+            f"weights, {self.nbytes / 1e6:.1f}MB, {self.dense_nbytes / 1e6:.1f}MB dense)"
+        )
+
+    def _rows(self) -> np.ndarray:
+        """Vertex of each stored weight."""
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def influence_counts(self) -> np.ndarray:
+        """Non-zero influences per vertex."""
+        return np.diff(self.indptr)
+
+    def row(self, vertex: int) -> dict:
+        """One vertex's weights by influence name."""
+        start, stop = self.indptr[vertex], self.indptr[vertex + 1]
+        return {
+            self.influences[column]: float(value)
+            for column, value in zip(self.indices[start:stop], self.values[start:stop])
+        }
+
+    def __getitem__(self, vertices):
+        """The weights of some vertices, a slice or an array of vertex ids, as a new table."""
+        vertex_count = self.shape[0]
+        if isinstance(vertices, slice):
+            start, stop, step = vertices.indices(vertex_count)
+            if step == 1:
+                stop = max(start, stop)
+                first, last = self.indptr[start], self.indptr[stop]
+                return SkinWeights(
+                    self.indptr[start : stop + 1] - first,
+                    self.indices[first:last],
+                    self.values[first:last],
+                    self.influences,
+                )
+            vertices = np.arange(start, stop, step)
+
+        vertices = np.atleast_1d(np.asarray(vertices, dtype=np.int64))
+        vertices = np.where(vertices < 0, vertices + vertex_count, vertices)
+        counts = self.indptr[vertices + 1] - self.indptr[vertices]
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        positions = np.repeat(self.indptr[vertices] - indptr[:-1], counts) + np.arange(indptr[-1])
+        return SkinWeights(indptr, self.indices[positions], self.values[positions], self.influences)
+
+    def to_dense(self) -> np.ndarray:
+        """The (vertex count, influence count) float64 table."""
+        return self._dense_columns(0, self.shape[1])
+
+    def _dense_columns(self, start: int, stop: int) -> np.ndarray:
+        """Columns start to stop of the dense table."""
+        table = np.zeros((self.shape[0], stop - start))
+        inside = (self.indices >= start) & (self.indices < stop)
+        table[self._rows()[inside], self.indices[inside] - start] = self.values[inside]
+        return table
+
+    def remap(self, dst_influences: list, name_map=inf_name):
+        """remap_columns() on the stored weights only.
+
+        Args:
+            dst_influences (list): Influence names of the destination columns.
+            name_map (fn, optional): Source name to destination name, or a dict.  Defaults to
+            inf_name().
+
+        Returns:
+            SkinWeights: The weights over dst_influences.
+        """
+        if isinstance(name_map, dict):
+            name_map = name_map.get
+
+        dst_lookup = {name: i for i, name in enumerate(dst_influences)}
+        column_map = np.array(
+            [dst_lookup.get(name_map(name), -1) for name in self.influences] + [-1],
+            dtype=np.int64,
+        )
+        columns = column_map[self.indices]
+        kept = columns >= 0
+        return SkinWeights.from_coo(
+            self._rows()[kept], columns[kept], self.values[kept], self.shape[0], dst_influences
+        )
+
+    def blend(self, ids: np.ndarray, factors: np.ndarray):
+        """Weighted sums of rows: row q of the result is the sum of factors[q, c] times row
+        ids[q, c], see transfer.SurfaceIndex.factors().  Only the stored weights are touched.
+
+        Args:
+            ids (np.ndarray): (q, c) vertex ids.
+            factors (np.ndarray): (q, c) factors.
+
+        Returns:
+            SkinWeights: q rows over the same influences, not normalized.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        picked = self[ids.ravel()]
+        counts = picked.influence_counts()
+        owners = np.repeat(np.arange(ids.shape[0]), ids.shape[1] if ids.ndim > 1 else 1)
+        return SkinWeights.from_coo(
+            np.repeat(owners, counts),
+            picked.indices,
+            picked.values * np.repeat(np.asarray(factors, dtype=np.float64).ravel(), counts),
+            ids.shape[0],
+            self.influences,
+        )
+
+    def normalized(self):
+        """normalize_rows() on the stored weights, as a new table."""
+        rows = self._rows()
+        totals = np.bincount(rows, weights=self.values, minlength=self.shape[0])[rows]
+        values = np.divide(
+            self.values, totals, out=np.zeros_like(self.values), where=totals > 0.0
+        )
+        return SkinWeights(self.indptr.copy(), self.indices.copy(), values, self.influences)
+
+
+def transfer_weights(
+    src_cluster: str, dst_cluster: str, backend: WeightBackend = None, name_map=inf_name
+) -> SkinWeights:
+    """Copies a whole weight table from one skinCluster to another with matching topology (e.g. a
+    mesh and its duplicate), remapping influences by name.  One read, one write, and only the
+    non-zero weights are held in between (see SkinWeights).
+
+    Args:
+        src_cluster (str): Cluster to read weights from.
+        dst_cluster (str): Cluster to write weights to.
+        backend (WeightBackend, optional): Defaults to default_backend().
+        name_map (fn, optional): Source influence name to destination name.  Defaults to
+        inf_name().
+
+    Raises:
+        ValueError: If the two clusters don't deform the same number of vertices.
+
+    Returns:
+        SkinWeights: The weights that were written, over the destination's influences.
+    """
+    if backend is None:
+        backend = default_backend()
+
+    src_weights = backend.read_sparse(src_cluster)
+    dst_count = backend.vertex_count(dst_cluster)
+    if src_weights.shape[0] != dst_count:
+        raise ValueError(
+            f"{src_cluster} has {src_weights.shape[0]} vertices, {dst_cluster} has "
+            f"{dst_count}.  Weights can only be copied between matching topology."
+        )
+
+    remapped = src_weights.remap(backend.influences(dst_cluster), name_map).normalized()
+    backend.write_sparse(dst_cluster, remapped)
+
+    return remapped
+
+
+def influence_histogram(weights: np.ndarray, threshold: float = 0.0) -> list:
+    """How many vertices have 0, 1, 2... non-zero influences.
+
+    Args:
+        weights (np.ndarray): Array shaped (vertex count, influence count).
+        threshold (float, optional): Weights at or below this count as zero.  Defaults to 0.
+
+    Returns:
+        list: Vertex count per number of influences, index 0 being vertices with none.
+    """
+    counts = (weights > threshold).sum(axis=1)
+    return np.bincount(counts, minlength=1).tolist()
+
+
+def condition_weights(
+    weights: np.ndarray, max_influences: int = None, prune_below: float = 0.0
+) -> tuple:
+    """Cleans a weight table up for a game engine: only the strongest max_influences weights of
+    each vertex are kept, weights under prune_below are dropped and every row is renormalized.
+    A vertex never loses its strongest influence to pruning.
+
+    Args:
+        weights (np.ndarray): Array shaped (vertex count, influence count).
+        max_influences (int, optional): Most influences a vertex may have.  Defaults to no limit.
+        prune_below (float, optional): Weights under this are removed.  Defaults to 0.
+
+    Returns:
+        tuple: (conditioned weights, stats dict with influence histograms before and after and the
+        largest per-vertex change).
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    conditioned = weights.copy()
+    vert_count, inf_count = weights.shape
+
+    if prune_below > 0.0 and vert_count:
+        strongest = conditioned.argmax(axis=1)
+        pruned = conditioned < prune_below
+        pruned[np.arange(vert_count), strongest] = False
+        conditioned[pruned] = 0.0
+
+    if max_influences is not None and max_influences < inf_count and vert_count:
+        # Everything but the top max_influences columns of each row goes to zero.
+        weakest = np.argpartition(-conditioned, max_influences, axis=1)[:, max_influences:]
+        np.put_along_axis(conditioned, weakest, 0.0, axis=1)
+
+    conditioned = normalize_rows(conditioned)
+    change = np.abs(conditioned - normalize_rows(weights))
+
+    stats = {
+        "vertices": vert_count,
+        "histogram_before": influence_histogram(weights),
+        "histogram_after": influence_histogram(conditioned),
+        "max_error": float(change.max()) if change.size else 0.0,
+        "max_vertex_error": float(change.sum(axis=1).max()) if change.size else 0.0,
+    }
+    return conditioned, stats
+
+
+def condition_sparse(
+    skin_weights: SkinWeights, max_influences: int = None, prune_below: float = 0.0
+) -> tuple:
+    """condition_weights() on the stored weights of a SkinWeights, same rules and same stats.
+
+    Args:
+        skin_weights (SkinWeights): The weights to clean up.
+        max_influences (int, optional): Most influences a vertex may have.  Defaults to no limit.
+        prune_below (float, optional): Weights under this are removed.  Defaults to 0.
+
+    Returns:
+        tuple: (conditioned SkinWeights, stats dict as condition_weights()).
+    """
+    vert_count = skin_weights.shape[0]
+    rows = skin_weights._rows()
+    values = skin_weights.values
+
+    # Rank of every weight in its row, strongest first.
+    order = np.lexsort((-values, rows))
+    rank = np.empty(len(values), dtype=np.int64)
+    rank[order] = np.arange(len(values)) - skin_weights.indptr[rows[order]]
+
+    # Pruned weights are all weaker than the ones kept, so the ranks still hold after pruning.
+    kept = np.ones(len(values), dtype=bool)
+    if prune_below > 0.0:
+        kept &= (values >= prune_below) | (rank == 0)
+    if max_influences is not None:
+        kept &= rank < max_influences
+
+    counts = np.bincount(rows[kept], minlength=vert_count)
+    conditioned = SkinWeights(
+        np.concatenate([[0], np.cumsum(counts)]),
+        skin_weights.indices[kept],
+        values[kept],
+        skin_weights.influences,
+    ).normalized()
+
+    # Dropped weights change by their whole normalized value, kept ones by the rescale.
+    change = skin_weights.normalized().values
+    change[kept] = np.abs(conditioned.values - change[kept])
+    per_vertex = np.bincount(rows, weights=change, minlength=vert_count)
+
+    stats = {
+        "vertices": vert_count,
+        "histogram_before": _sparse_histogram(skin_weights),
+        "histogram_after": _sparse_histogram(conditioned),
+        "max_error": float(change.max()) if change.size else 0.0,
+        "max_vertex_error": float(per_vertex.max()) if per_vertex.size else 0.0,
+    }
+    return conditioned, stats
+
+
+def _sparse_histogram(skin_weights: SkinWeights) -> list:
+    """influence_histogram() of a SkinWeights."""
+    positive = skin_weights.values > 0.0
+    counts = np.bincount(skin_weights._rows()[positive], minlength=skin_weights.shape[0])
+    return np.bincount(counts, minlength=1).tolist()